@@ -0,0 +1,7 @@
+"""
+Command-line maintenance tools, run with ``python -m app.cli <command>``.
+
+They work directly on the configured database (DATABASE_URL), so they can
+run while the API is stopped; ``sync`` is the exception and talks to a
+running API over HTTP.
+"""
@@ -0,0 +1,143 @@
+"""
+Maintenance commands.
+
+    python -m app.cli export [-o metadata.ndjson] [--store-id 1 --store-id 2]
+    python -m app.cli import metadata.ndjson
+    python -m app.cli repair-stats [--store-id 1]
+    python -m app.cli sync ./docs --store-id 1 [--api-url http://localhost:8000] [--workers 8]
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from app.cli.directory_sync import DirectorySync, SyncError
+from app.core.config import get_settings
+from app.database import SessionLocal, engine, init_db
+from app.services.metadata_transfer import MetadataImporter, MetadataImportError, NDJSONLines, iter_export
+from app.services.search_index import ensure_search_index
+from app.services.store_stats import recompute_store_stats
+
+
+def _export(args) -> int:
+    output = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    lines = 0
+    try:
+        with SessionLocal() as db:
+            for line in iter_export(db, args.store_id, args.batch_size):
+                output.write(line)
+                lines += 1
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    logging.info(f"Exported {lines - 1} records")
+    return 0
+
+
+def _import(args) -> int:
+    source = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    started = time.perf_counter()
+    try:
+        with SessionLocal() as db:
+            importer = MetadataImporter(db, args.batch_size)
+            splitter = NDJSONLines()
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                for line in splitter.feed(chunk):
+                    importer.add(line)
+            for line in splitter.finish():
+                importer.add(line)
+            stats = importer.finish()
+    except MetadataImportError as e:
+        logging.error(str(e))
+        return 2
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(stats.__dict__, ensure_ascii=False, indent=2))
+    logging.info(f"Import finished in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def _repair_stats(args) -> int:
+    with SessionLocal() as db:
+        fixed = recompute_store_stats(db, args.store_id)
+        db.commit()
+    logging.info(f"Recomputed Store statistics, {fixed} Store(s) corrected")
+    return 0
+
+
+def _sync(args) -> int:
+    sync = DirectorySync(
+        args.directory,
+        api_url=args.api_url,
+        store_id=args.store_id,
+        manifest_path=args.manifest,
+        workers=args.workers,
+        delete=not args.no_delete,
+        include=args.include,
+        exclude=args.exclude,
+        retries=args.retries,
+        dry_run=args.dry_run,
+        allow_empty=args.allow_empty,
+    )
+    try:
+        stats = sync.run()
+    except SyncError as e:
+        logging.error(str(e))
+        return 2
+    except KeyboardInterrupt:
+        logging.warning("Interrupted; the manifest is saved, run sync again to resume")
+        return 130
+    print(json.dumps(stats.__dict__, ensure_ascii=False, indent=2))
+    return 1 if stats.failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Gemini RAG Manager maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch_size = get_settings().metadata_batch_size
+
+    export = commands.add_parser("export", help="Export Store and File metadata as NDJSON")
+    export.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export.add_argument("--store-id", type=int, action="append", help="Export only this Store (repeatable)")
+    export.add_argument("--batch-size", type=int, default=batch_size)
+    export.set_defaults(handler=_export)
+
+    import_ = commands.add_parser("import", help="Import an NDJSON metadata export")
+    import_.add_argument("input", help="Export file, or - for stdin")
+    import_.add_argument("--batch-size", type=int, default=batch_size, help="Files per transaction")
+    import_.set_defaults(handler=_import)
+
+    repair = commands.add_parser("repair-stats", help="Recompute per-Store file counts and sizes from the files")
+    repair.add_argument("--store-id", type=int, action="append", help="Repair only this Store (repeatable)")
+    repair.set_defaults(handler=_repair_stats)
+
+    sync = commands.add_parser("sync", help="Upload new and changed files of a directory to a Store (through the API)")
+    sync.add_argument("directory", help="Directory to synchronize")
+    sync.add_argument("--store-id", type=int, required=True, help="Target Store")
+    sync.add_argument("--api-url", default="http://localhost:8000", help="Base URL of the running API")
+    sync.add_argument("--manifest", help="Manifest file (default: .gfsa-sync-<store_id>.json in the directory)")
+    sync.add_argument("--workers", type=int, default=4, help="Parallel uploads")
+    sync.add_argument("--include", action="append", help="Glob of relative paths to sync (repeatable)")
+    sync.add_argument("--exclude", action="append", help="Glob of relative paths to skip (repeatable)")
+    sync.add_argument("--retries", type=int, default=5, help="Attempts per request on 503/429 and connection errors")
+    sync.add_argument("--no-delete", action="store_true", help="Keep documents of files gone from the directory")
+    sync.add_argument("--allow-empty", action="store_true", help="Delete all synced files if the directory is empty")
+    sync.add_argument("--dry-run", action="store_true", help="Only report what would be uploaded and deleted")
+    sync.set_defaults(handler=_sync, local_db=False)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s", stream=sys.stderr)
+    if getattr(args, "local_db", True):
+        init_db()
+        ensure_search_index(engine)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
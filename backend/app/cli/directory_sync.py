@@ -0,0 +1,409 @@
+"""
+Incremental synchronization of a local directory into a Store.
+
+    python -m app.cli sync ./docs --store-id 3 [--api-url http://localhost:8000] [--workers 8]
+
+Unlike the other commands, sync is a client of the running API, so it can
+push a tree from another machine. A manifest (by default
+``.gfsa-sync-<store_id>.json`` inside the directory) maps each relative
+path to its size, mtime, SHA-256 and File id:
+
+- files whose size and mtime match the manifest are skipped without being
+  read, so an unchanged tree costs one directory walk,
+- new and changed files are hashed and uploaded by a pool of workers; a
+  touched file with unchanged content only gets its mtime updated,
+- the previous version of a changed file and files gone from the directory
+  are removed with POST /stores/{id}/files/bulk-delete,
+- every upload carries an Idempotency-Key derived from the Store, path,
+  content hash and the File id it replaces, so retrying after a crash
+  replays a finished upload instead of repeating it; a replay returning a
+  File the sync already deleted (content changed A -> B -> A, or a file
+  removed and restored) is uploaded again under a fresh key,
+- the manifest is rewritten atomically every few seconds and on exit
+  (also after Ctrl+C); the next run resumes from it,
+- without a manifest, files already in the Store with the same name and
+  content hash are adopted instead of uploaded again,
+- a directory that turns out empty is not mirrored (everything deleted)
+  unless allowed, as it is most likely an unmounted share.
+
+503/429/409 responses are retried after their Retry-After; when they
+persist, the file counts as failed and is tried again on the next run.
+Files the server rejects (unsupported type, empty, too large) are
+remembered and retried only once they change.
+"""
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "gfsa-sync-manifest"
+VERSION = 1
+MANIFEST_NAME = ".gfsa-sync-{store_id}.json"
+DELETE_BATCH = 10000  # Maximum of BulkDeleteRequest
+RETRY_STATUSES = {409, 429, 502, 503, 504}  # 409: the same Idempotency-Key is still running
+# 4xx that say nothing about the file: left after the retries they count as failed, not rejected
+TRANSIENT_STATUSES = RETRY_STATUSES | {408, 499}
+HASH_CHUNK = 1024 * 1024
+# Deleted File ids are remembered longer than the server keeps Idempotency-Keys (IDEMPOTENCY_TTL_SECONDS)
+DELETED_RETENTION_SECONDS = 2 * 24 * 3600
+
+
+class SyncError(Exception):
+    """The sync cannot start or continue (bad manifest, Store not found)"""
+
+
+@dataclass
+class SyncStats:
+    """Summary of a sync run"""
+    scanned: int = 0
+    unchanged: int = 0
+    adopted: int = 0  # Already in the Store with the same content (first run only)
+    uploaded: int = 0  # New files
+    replaced: int = 0  # Changed files uploaded again
+    deleted: int = 0  # Documents removed (gone files and replaced versions)
+    rejected: int = 0  # Refused by the server (4xx); skipped until the file changes
+    failed: int = 0  # Errors left after the retries; retried on the next run
+    seconds: float = 0.0
+
+
+@dataclass
+class _Entry:
+    path: str  # Relative, with forward slashes
+    size: int
+    mtime_ns: int
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DirectorySync:
+    """
+    Synchronizes one directory with one Store through the API.
+
+    Args:
+        root: Directory to synchronize
+        api_url: Base URL of the API
+        store_id: Target Store
+        manifest_path: Manifest file (default: inside root)
+        workers: Parallel hash-and-upload workers
+        delete: Remove documents of files gone from the directory
+        include: Glob patterns of relative paths to sync (all when empty)
+        exclude: Glob patterns of relative paths to skip
+        retries: Attempts per request on 503/429/connection errors
+        timeout: HTTP timeout per request, in seconds
+        dry_run: Only report what would be done
+        allow_empty: Delete everything when the directory turns out empty
+    """
+
+    def __init__(self, root: str, api_url: str, store_id: int, manifest_path: Optional[str] = None,
+                 workers: int = 4, delete: bool = True, include: Optional[list] = None,
+                 exclude: Optional[list] = None, retries: int = 5, timeout: float = 900.0,
+                 dry_run: bool = False, allow_empty: bool = False):
+        self.root = os.path.abspath(root)
+        self.api_url = api_url.rstrip("/")
+        self.store_id = store_id
+        self.manifest_path = manifest_path or os.path.join(self.root, MANIFEST_NAME.format(store_id=store_id))
+        self.workers = max(1, workers)
+        self.delete = delete
+        self.include = include or []
+        self.exclude = exclude or []
+        self.retries = max(1, retries)
+        self.timeout = timeout
+        self.dry_run = dry_run
+        self.allow_empty = allow_empty
+        self.stats = SyncStats()
+        self._files: dict = {}  # Relative path -> manifest record
+        self._pending_deletes: set = set()  # File ids to remove from the Store
+        self._deleted: dict = {}  # File id -> time it was deleted (epoch seconds)
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        self._local = threading.local()
+        self._existing: dict = {}  # (display name, sha256) -> File id, on the first run only
+
+    # --- Manifest ----------------------------------------------------------
+
+    def _load_manifest(self) -> bool:
+        """Read the manifest; returns False when there is none yet"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            raise SyncError(f"Manifest {self.manifest_path} is damaged: {e}")
+        if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+            raise SyncError(f"{self.manifest_path} is not a sync manifest")
+        if manifest.get("store_id") != self.store_id:
+            raise SyncError(f"Manifest {self.manifest_path} belongs to Store {manifest.get('store_id')}")
+        self._files = manifest.get("files", {})
+        self._pending_deletes = set(manifest.get("pending_deletes", []))
+        self._deleted = {int(file_id): at for file_id, at in manifest.get("deleted", {}).items()}
+        return True
+
+    def _save_manifest(self, force: bool = False) -> None:
+        """Write the manifest atomically (at most every few seconds unless forced)"""
+        if self.dry_run:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._saved_at < 5.0:
+                return
+            self._saved_at = now
+            horizon = time.time() - DELETED_RETENTION_SECONDS
+            self._deleted = {file_id: at for file_id, at in self._deleted.items() if at >= horizon}
+            manifest = {
+                "format": FORMAT,
+                "version": VERSION,
+                "api_url": self.api_url,
+                "store_id": self.store_id,
+                "pending_deletes": sorted(self._pending_deletes),
+                "deleted": {str(file_id): at for file_id, at in self._deleted.items()},
+                "files": dict(self._files),
+            }
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.manifest_path)
+
+    # --- Directory walk ----------------------------------------------------
+
+    def _wanted(self, path: str) -> bool:
+        if self.include and not any(fnmatch.fnmatch(path, pattern) for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatch(path, pattern) for pattern in self.exclude)
+
+    def _walk(self, directory: str = "") -> Iterator[_Entry]:
+        """Regular files under root (hidden files and directories skipped)"""
+        with os.scandir(os.path.join(self.root, directory)) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue  # Also skips the manifest
+                path = f"{directory}/{entry.name}" if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk(path)
+                elif entry.is_file() and self._wanted(path):
+                    stat = entry.stat()
+                    yield _Entry(path, stat.st_size, stat.st_mtime_ns)
+
+    # --- API ---------------------------------------------------------------
+
+    @property
+    def _session(self) -> requests.Session:
+        # requests.Session is not thread-safe: one per worker
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _request(self, method: str, path: str, upload: Optional[tuple] = None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying overload responses and connection errors.
+
+        Args:
+            upload: (name, local path) of a file sent as the multipart ``file`` field
+        """
+        for attempt in range(1, self.retries + 1):
+            try:
+                if upload is not None:
+                    # A retried upload must send the file from the start
+                    with open(upload[1], "rb") as f:
+                        response = self._session.request(
+                            method, self.api_url + path, timeout=self.timeout,
+                            files={"file": (upload[0], f)}, **kwargs
+                        )
+                else:
+                    response = self._session.request(method, self.api_url + path, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                if attempt == self.retries:
+                    raise
+                delay = min(60.0, 2.0 ** attempt)
+                logger.info(f"{method} {path}: {e}; retrying in {delay:.0f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else min(60.0, 2.0 ** attempt)
+                logger.info(f"{method} {path}: HTTP {response.status_code}; retrying in {delay:.0f}s")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _check_store(self) -> None:
+        response = self._request("GET", f"/stores/{self.store_id}")
+        if response.status_code == 404:
+            raise SyncError(f"Store {self.store_id} not found at {self.api_url}")
+        response.raise_for_status()
+
+    def _load_existing(self) -> None:
+        """Files already in the Store, by (name, content hash), to adopt instead of uploading"""
+        response = self._request("GET", f"/stores/{self.store_id}/files/")
+        response.raise_for_status()
+        self._existing = {
+            (file["display_name"], file["content_sha256"]): file["id"]
+            for file in response.json()["files"] if file.get("content_sha256")
+        }
+
+    def _upload(self, entry: _Entry) -> None:
+        """Hash one new or changed file and upload it unless only its mtime changed"""
+        local_path = os.path.join(self.root, entry.path)
+        sha256 = _sha256(local_path)
+        previous = self._files.get(entry.path)
+        record = {"size": entry.size, "mtime_ns": entry.mtime_ns, "sha256": sha256}
+        if previous and previous.get("sha256") == sha256:
+            with self._lock:
+                self._files[entry.path] = {**previous, **record}
+                self.stats.unchanged += 1
+            return
+        adopted = self._existing.get((entry.path, sha256)) if previous is None else None
+        if adopted is not None:
+            with self._lock:
+                self._files[entry.path] = {**record, "file_id": adopted}
+                self.stats.adopted += 1
+            return
+        if self.dry_run:
+            logger.info(f"Would upload {entry.path} ({entry.size} B)")
+            with self._lock:
+                if previous:
+                    self.stats.replaced += 1
+                else:
+                    self.stats.uploaded += 1
+            return
+
+        # The replaced File id makes the key unique per version, yet stable across a resume
+        replaces = previous.get("file_id", "") if previous else ""
+        key = hashlib.sha256(f"sync:{self.store_id}:{entry.path}:{sha256}:{replaces}".encode()).hexdigest()
+        response = self._post_file(entry, local_path, key)
+        if response.status_code == 201 and self._was_deleted(response.json()["id"]):
+            # A replay of an earlier upload whose File the sync has deleted since
+            logger.info(f"Upload of {entry.path} replayed deleted file {response.json()['id']}; uploading again")
+            response = self._post_file(entry, local_path, f"{key}:{uuid.uuid4().hex}")
+        with self._lock:
+            if response.status_code == 201:
+                self._files[entry.path] = {**record, "file_id": response.json()["id"]}
+                if previous and previous.get("file_id"):
+                    self._pending_deletes.add(previous["file_id"])
+                    self.stats.replaced += 1
+                else:
+                    self.stats.uploaded += 1
+            elif 400 <= response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES:
+                detail = response.json().get("detail") if response.headers.get("content-type", "").startswith("application/json") else response.text
+                logger.warning(f"Rejected {entry.path}: HTTP {response.status_code} {detail}")
+                self._files[entry.path] = {**record, "rejected": str(detail)[:500]}
+                if previous and previous.get("file_id"):
+                    self._pending_deletes.add(previous["file_id"])  # The old content is stale
+                self.stats.rejected += 1
+            else:
+                logger.error(f"Upload of {entry.path} failed: HTTP {response.status_code} {response.text[:500]}")
+                self.stats.failed += 1
+        self._save_manifest()
+
+    def _post_file(self, entry: _Entry, local_path: str, key: str) -> requests.Response:
+        return self._request(
+            "POST", f"/stores/{self.store_id}/files/",
+            upload=(entry.path, local_path), headers={"Idempotency-Key": key},
+        )
+
+    def _was_deleted(self, file_id: int) -> bool:
+        """Whether the sync has deleted the File or queued it for deletion"""
+        with self._lock:
+            return file_id in self._deleted or file_id in self._pending_deletes
+
+    def _delete_pending(self) -> None:
+        ids = sorted(self._pending_deletes)
+        for start in range(0, len(ids), DELETE_BATCH):
+            batch = ids[start:start + DELETE_BATCH]
+            if self.dry_run:
+                logger.info(f"Would delete {len(batch)} file(s)")
+                self.stats.deleted += len(batch)
+                continue
+            response = self._request("POST", f"/stores/{self.store_id}/files/bulk-delete", json={"file_ids": batch})
+            if response.status_code != 200:
+                logger.error(f"Bulk delete failed: HTTP {response.status_code} {response.text[:500]}")
+                self.stats.failed += 1
+                return
+            result = response.json()
+            self.stats.deleted += len(result["deleted"])
+            # Files already deleted by someone else are done as well
+            done = result["deleted"] + result["not_found"]
+            self._pending_deletes.difference_update(done)
+            now = time.time()
+            self._deleted.update((file_id, now) for file_id in done)
+            self._save_manifest(force=True)
+
+    # --- Run ---------------------------------------------------------------
+
+    def run(self) -> SyncStats:
+        """
+        Synchronize the directory with the Store.
+
+        Returns:
+            SyncStats: What was uploaded, deleted and skipped
+
+        Raises:
+            SyncError: The manifest is unusable or the Store does not exist
+        """
+        started = time.perf_counter()
+        if not os.path.isdir(self.root):
+            raise SyncError(f"{self.root} is not a directory")
+        has_manifest = self._load_manifest()
+        self._check_store()
+
+        seen = set()
+        changed = []
+        for entry in self._walk():
+            seen.add(entry.path)
+            self.stats.scanned += 1
+            record = self._files.get(entry.path)
+            if record and record["size"] == entry.size and record["mtime_ns"] == entry.mtime_ns:
+                self.stats.unchanged += 1
+            else:
+                changed.append(entry)
+        gone = [path for path in self._files if path not in seen]
+        if self.delete and gone and not seen and not self.allow_empty:
+            # Most likely an unmounted share, not a tree that was emptied on purpose
+            raise SyncError(f"{self.root} is empty; refusing to delete all {len(gone)} synced files")
+        logger.info(f"Scanned {self.stats.scanned} files: {len(changed)} new or changed, {len(gone)} gone")
+
+        try:
+            if not has_manifest and changed:
+                self._load_existing()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sync") as pool:
+                futures = {pool.submit(self._upload, entry): entry for entry in changed}
+                try:
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except (OSError, requests.RequestException) as e:
+                            logger.error(f"Upload of {futures[future].path} failed: {str(e)}")
+                            with self._lock:
+                                self.stats.failed += 1
+                except KeyboardInterrupt:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            if self.delete:
+                for path in gone:
+                    record = self._files.pop(path)
+                    if record.get("file_id"):
+                        self._pending_deletes.add(record["file_id"])
+                self._delete_pending()
+        finally:
+            self._save_manifest(force=True)
+
+        self.stats.seconds = round(time.perf_counter() - started, 1)
+        return self.stats
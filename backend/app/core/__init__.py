@@ -0,0 +1 @@
+# Cross-cutting HTTP infrastructure (responses, middleware)
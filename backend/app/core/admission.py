@@ -0,0 +1,169 @@
+"""
+Admission control of expensive requests (load shedding).
+
+When Google slows down, chat and upload requests pile up inside the server
+until every client times out. Requests are sorted into route classes
+(chat, upload, write); each class admits at most a limited number of
+requests at once and rejects the excess immediately with 503 and
+Retry-After instead of queueing it:
+
+- the limit starts at the class's ``max_in_flight``; while the class's
+  recent latency (an EWMA of completed requests, or the age of the oldest
+  running one if that is larger) exceeds its latency target, the limit
+  shrinks in proportion (``max_in_flight * target / latency``), down to
+  ADMISSION_MIN_IN_FLIGHT, and grows back as latency recovers,
+- Retry-After follows the recent latency of the class,
+- requests of no class (health checks, listings, search, SSE events,
+  metrics, admin) are never counted nor rejected.
+
+State per class is exported as the admission_in_flight, admission_limit
+and admission_latency_seconds gauges; rejections as
+admission_rejected_total.
+"""
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest completed request in the latency average
+LATENCY_EWMA_ALPHA = 0.2
+
+
+@dataclass
+class RouteClass:
+    """
+    Admission limits of a group of routes.
+
+    Args:
+        name: Label of the class in metrics and logs
+        max_in_flight: Requests admitted at once while latency is healthy
+        latency_target: Latency (seconds) above which the limit shrinks;
+            None keeps the limit fixed (e.g. uploads, whose latency follows their size)
+    """
+    name: str
+    max_in_flight: int
+    latency_target: Optional[float] = None
+    in_flight: int = 0
+    latency: float = 0.0  # EWMA of completed requests, seconds
+    _started: dict = field(default_factory=dict)  # Request token -> start time
+    _next_token: int = 0
+
+    def recent_latency(self, now: float) -> float:
+        """Average latency, or the age of the oldest running request when that is larger"""
+        oldest = min(self._started.values(), default=now)
+        return max(self.latency, now - oldest)
+
+    def limit(self, now: float, min_in_flight: int) -> int:
+        """Requests admitted at once given the recent latency"""
+        if self.latency_target is None:
+            return self.max_in_flight
+        latency = self.recent_latency(now)
+        if latency <= self.latency_target:
+            return self.max_in_flight
+        return max(min_in_flight, min(self.max_in_flight, int(self.max_in_flight * self.latency_target / latency)))
+
+    def enter(self, now: float) -> int:
+        self._next_token += 1
+        self._started[self._next_token] = now
+        self.in_flight += 1
+        return self._next_token
+
+    def leave(self, token: int, now: float) -> float:
+        elapsed = now - self._started.pop(token)
+        self.in_flight -= 1
+        self.latency = elapsed if self.latency == 0.0 else (
+            LATENCY_EWMA_ALPHA * elapsed + (1 - LATENCY_EWMA_ALPHA) * self.latency
+        )
+        return elapsed
+
+
+def admission_classes(settings) -> list:
+    """(method, path regex, RouteClass) rules of the shed routes under the given settings"""
+    chat_class = RouteClass(
+        "chat", settings.admission_chat_max_in_flight, settings.admission_chat_latency_target_seconds
+    )
+    upload_class = RouteClass("upload", settings.admission_upload_max_in_flight)
+    write_class = RouteClass(
+        "write", settings.admission_write_max_in_flight, settings.admission_write_latency_target_seconds
+    )
+    return [
+        ("POST", r"/chat/?", chat_class),
+        ("POST", r"/stores/\d+/files/?", upload_class),
+        ("POST", r"/stores/\d+/files/archive/?", upload_class),
+        ("POST", r"/stores/?", write_class),
+        ("DELETE", r"/stores/\d+/?", write_class),
+        ("POST", r"/stores/\d+/files/refresh-status/?", write_class),
+    ]
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware shedding requests of overloaded route classes.
+
+    Args:
+        app: The wrapped ASGI application
+        classes: (method, path regex, RouteClass) rules; the first match wins
+        min_in_flight: Floor of a class limit however slow it gets
+        retry_after_max: Upper bound of Retry-After, in seconds
+    """
+
+    def __init__(self, app: ASGIApp, classes: list, min_in_flight: int, retry_after_max: int):
+        self.app = app
+        self.min_in_flight = max(1, min_in_flight)
+        self.retry_after_max = max(1, retry_after_max)
+        self._rules = [(method, re.compile(pattern), route_class) for method, pattern, route_class in classes]
+
+    def _classify(self, scope: Scope) -> Optional[RouteClass]:
+        if scope["type"] != "http":
+            return None
+        for method, pattern, route_class in self._rules:
+            if scope["method"] == method and pattern.fullmatch(scope["path"]):
+                return route_class
+        return None
+
+    def _update_gauges(self, route_class: RouteClass, now: float) -> None:
+        labels = {"class": route_class.name}
+        metrics.set_gauge("admission_in_flight", route_class.in_flight, labels=labels)
+        metrics.set_gauge("admission_limit", route_class.limit(now, self.min_in_flight), labels=labels)
+        metrics.set_gauge("admission_latency_seconds", route_class.latency, labels=labels)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = self._classify(scope)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.monotonic()
+        limit = route_class.limit(now, self.min_in_flight)
+        if route_class.in_flight >= limit:
+            latency = route_class.recent_latency(now)
+            retry_after = min(self.retry_after_max, max(1, math.ceil(latency)))
+            metrics.inc("admission_rejected_total", labels={"class": route_class.name})
+            logger.info(
+                f"Shed {scope['method']} {scope['path']}: {route_class.in_flight} {route_class.name} "
+                f"requests in flight (limit {limit}, latency {latency:.1f} s)"
+            )
+            await JSONResponse(
+                {"detail": "Serwer jest przeciążony, spróbuj ponownie później"},
+                status_code=503,
+                headers={"Retry-After": str(retry_after)},
+            )(scope, receive, send)
+            return
+
+        token = route_class.enter(now)
+        self._update_gauges(route_class, now)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            now = time.monotonic()
+            metrics.observe("admission_request_seconds", route_class.leave(token, now), labels={"class": route_class.name})
+            self._update_gauges(route_class, now)
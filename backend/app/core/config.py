@@ -0,0 +1,164 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# .env lives in the project root; real environment variables take precedence
+ENV_FILE = Path(__file__).resolve().parents[3] / ".env"
+
+
+class Settings(BaseSettings):
+    """Application configuration, read once from the environment and .env"""
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILE,
+        env_file_encoding="utf-8",
+        extra="ignore",
+        protected_namespaces=(),  # allow model_* field names
+    )
+
+    # Core
+    google_api_key: Optional[str] = None
+    database_url: str = "sqlite:///./gemini_rag.db"
+    log_level: str = "INFO"
+    admin_token: Optional[str] = None  # Enables the /admin endpoints
+
+    # Google GenAI backend: "google" (real API) or "fake" (offline stand-in)
+    genai_backend: Literal["google", "fake"] = "google"
+    fake_genai_latency_ms: float = 20.0
+    fake_genai_jitter_ms: float = 10.0
+    fake_genai_generate_latency_ms: float = 400.0
+    fake_genai_tail_probability: float = 0.0
+    fake_genai_tail_multiplier: float = 10.0
+    fake_genai_error_rate: float = 0.0
+    fake_genai_stream_chunks: int = 8
+    fake_genai_operation_polls: int = 0
+    fake_genai_seed: Optional[int] = None
+
+    # Model catalog
+    model_catalog_ttl_seconds: float = 3600.0
+    file_search_model_prefixes: str = "gemini-2.5-pro,gemini-2.5-flash,gemini-3"
+
+    # Chat model router (model="auto")
+    model_router_fast_model: str = "gemini-2.5-flash-lite"
+    model_router_strong_model: str = "gemini-2.5-flash"
+    model_router_long_message_chars: int = 400  # Longer questions go to the strong model
+    model_router_large_store_files: int = 200  # Stores with this many files go to the strong model
+    model_router_max_error_rate: float = 0.5  # Avoid a model whose recent error rate is higher
+    model_router_sample_max_age_seconds: float = 300.0  # Older latency/error samples are forgotten
+    model_router_probe_ratio: float = 0.05  # Share of diverted requests still sent to the avoided model
+
+    # Hedged chat generations
+    chat_hedging_enabled: bool = False
+    chat_hedge_percentile: float = 95.0  # Hedge calls slower than this percentile of recent latency
+    chat_hedge_min_delay_seconds: float = 0.2
+    chat_hedge_min_samples: int = 20  # Calls per model observed before hedging starts
+    chat_hedge_budget_ratio: float = 0.05  # At most ~5% of calls are hedged
+
+    # Cached context of per-Store system instructions
+    context_cache_ttl_seconds: float = 3600.0
+    context_cache_refresh_margin_seconds: float = 300.0  # Extend the TTL when less than this remains
+    context_cache_min_chars: int = 4096  # Shorter instructions are sent inline (API minimum is ~1024 tokens)
+
+    # Metadata export/import
+    metadata_batch_size: int = 5000  # Rows per query (export) and per transaction (import)
+
+    # Deletion garbage collector (Google documents of deleted files)
+    gc_batch_size: int = 200  # Deleted files processed per pass
+    gc_concurrency: int = 8  # Parallel Google deletions
+    gc_rate_per_second: float = 20.0  # Deletions started per second (0 = unlimited)
+    gc_max_attempts: int = 6  # Then the file stays DELETE_FAILED for reconciliation
+    gc_retry_base_seconds: float = 30.0  # Backoff doubles with every failed attempt
+    gc_interval_seconds: float = 60.0  # Pause between passes when idle (deletes wake it earlier)
+
+    # Uploads
+    max_upload_bytes: int = 100 * 1024 * 1024  # File Search per-document limit
+    upload_chunk_size: int = 1024 * 1024
+    archive_max_bytes: int = 1024 * 1024 * 1024
+    archive_max_entries: int = 1000
+    archive_upload_concurrency: int = 4  # Entries uploaded to Google in parallel
+    upload_operation_poll_interval: float = 2.0  # Seconds between checks of Google's import operation
+    upload_operation_timeout: float = 300.0  # Stop waiting and leave the file IMPORTING after this
+
+    # Batched refresh of IMPORTING file statuses (paged document listings)
+    status_refresh_interval_seconds: float = 300.0
+    status_refresh_page_size: int = 20  # Documents per list call (API maximum)
+    status_refresh_operation_concurrency: int = 4  # Operation gets when a name is ambiguous
+
+    # Global budget of in-flight uploads (spooled to the temp directory)
+    upload_budget_enabled: bool = True
+    upload_budget_max_bytes: int = 2 * 1024 * 1024 * 1024  # Disk footprint of uploads in flight (see upload_routes)
+    upload_budget_max_transfers: int = 16
+    upload_budget_wait_seconds: float = 10.0  # Wait for room, then 503
+    upload_budget_retry_after_seconds: int = 5
+    upload_budget_min_free_disk_bytes: int = 0  # Refuse uploads that would leave less free temp space (0 = off)
+
+    # Admission control (503 + Retry-After when a route class is saturated or slow)
+    admission_enabled: bool = True
+    admission_chat_max_in_flight: int = 64
+    admission_chat_latency_target_seconds: float = 20.0
+    admission_upload_max_in_flight: int = 32  # Upload latency follows file size, so no target
+    admission_write_max_in_flight: int = 32  # Store creation/deletion, status refresh
+    admission_write_latency_target_seconds: float = 10.0
+    admission_min_in_flight: int = 2  # Floor of a class limit however slow it gets
+    admission_retry_after_max_seconds: int = 30
+
+    # Scheduling of upstream Google calls (chat > upload > bulk, fair across stores)
+    scheduler_max_concurrency: int = 16
+    scheduler_interactive_reserved: int = 4  # Slots only chat may use
+    scheduler_queue_limit_interactive: int = 200
+    scheduler_queue_limit_upload: int = 100
+    scheduler_queue_limit_bulk: int = 1000
+
+    # Request deadlines (X-Request-Timeout can only shorten them)
+    chat_timeout_seconds: float = 120.0
+    upload_timeout_seconds: float = 900.0
+    archive_timeout_seconds: float = 3600.0
+
+    # Idempotency-Key handling of POST /stores/, file uploads and chat
+    idempotency_enabled: bool = True
+    idempotency_ttl_seconds: float = 24 * 3600.0
+    idempotency_wait_seconds: float = 60.0  # How long a retry waits for the original request
+
+    # Live ingestion events (SSE)
+    events_heartbeat_seconds: float = 15.0
+
+    # Optional local text extraction before ingestion
+    text_extraction_enabled: bool = False
+    text_extraction_workers: Optional[int] = None  # Defaults to the CPU count
+    text_extraction_max_ratio: float = 0.5  # Use the text only if it is at most this fraction of the original
+    upload_bandwidth_estimate: float = 5 * 1024 * 1024  # Bytes/s assumed until large uploads have been measured
+
+    # Local full-text index (GET /stores/{id}/search)
+    search_index_enabled: bool = True  # When disabled, new files are indexed by name only
+    search_index_max_chars: int = 2 * 1024 * 1024  # Characters (bytes) of text indexed per file
+
+    # Tracing (spans of requests, DB statements and Google calls)
+    tracing_enabled: bool = False
+    tracing_exporter: Literal["console", "otlp", "memory"] = "console"
+    tracing_sample_ratio: float = 1.0  # Share of requests traced (an incoming traceparent decides instead)
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_otlp_headers: Optional[str] = None  # "key=value,key2=value2"
+    tracing_service_name: str = "gemini-rag-manager"
+    tracing_db_statements: bool = True  # Record SQL text on db spans
+
+    # On-demand profiling of requests (X-Profile header with the admin token, or sampled)
+    profiling_enabled: bool = False
+    profiling_sample_ratio: float = 0.0  # Share of requests profiled without the header
+    profiling_interval_seconds: float = 0.001  # Sampling interval of the profiler
+    profiling_dir: Optional[str] = None  # Defaults to <temp dir>/gfsa-profiles
+    profiling_max_profiles: int = 100  # Newest profiles kept
+
+    # Response serialization and compression
+    fast_json_enabled: bool = False
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Get the cached Settings instance"""
+    return Settings()
@@ -0,0 +1,168 @@
+"""
+Per-request deadlines and cancellation of upstream work.
+
+Each expensive route gets a deadline from its configured timeout, which a
+client may shorten (never extend) with the ``X-Request-Timeout`` header
+(seconds). The deadline is passed down to the Google SDK as the HTTP
+timeout, and ``RequestDeadline.run`` aborts the awaited work when the
+deadline passes or the client disconnects, so abandoned requests stop
+spending quota and worker slots.
+
+Work running in worker threads cannot be cancelled from the event loop; it
+must check ``RequestDeadline.cancel_event`` (set on abort) and stop itself.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = "x-request-timeout"
+
+# Not in the HTTP spec; the de-facto code for "client closed request"
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+class RequestCancelled(Exception):
+    """Raised inside worker threads when their request was aborted"""
+
+
+class RequestDeadline:
+    """
+    Deadline and disconnect watcher of one request.
+
+    Usage (as a route dependency):
+        deadline: RequestDeadline = Depends(request_deadline("chat"))
+        result = await deadline.run(some_coroutine(timeout=deadline.remaining()))
+    """
+
+    def __init__(self, request: Request, route: str, seconds: float):
+        self.request = request
+        self.route = route
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cancel_event = threading.Event()  # For worker threads
+        self._disconnected = asyncio.Event()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout_ms(self) -> int:
+        """Remaining time in milliseconds, as expected by the SDK's http_options"""
+        return max(1, int(self.remaining() * 1000))
+
+    def check(self) -> None:
+        """Raise RequestCancelled if the request was aborted (for worker threads)"""
+        if self.cancel_event.is_set() or self.remaining() <= 0:
+            raise RequestCancelled(f"Request aborted ({self.route})")
+
+    async def _watch_disconnect(self) -> None:
+        # The request body has been consumed by the time a route runs, so the
+        # next message on the channel can only be the disconnect
+        while True:
+            message = await self.request.receive()
+            if message["type"] == "http.disconnect":
+                self._disconnected.set()
+                return
+
+    def _abort(self, reason: str, on_cancel: Optional[Callable[[], None]]) -> None:
+        self.cancel_event.set()
+        if on_cancel is not None:
+            on_cancel()
+        metrics.inc("requests_aborted_total", labels={"route": self.route, "reason": reason})
+
+    async def run(self, awaitable: Awaitable[T], on_cancel: Optional[Callable[[], None]] = None) -> T:
+        """
+        Await work, aborting it on deadline or client disconnect.
+
+        Args:
+            awaitable: The upstream work
+            on_cancel: Optional callback run when the work is aborted
+
+        Returns:
+            The result of the work
+
+        Raises:
+            HTTPException: 504 when the deadline passes, 499 when the client disconnected
+        """
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch_disconnect())
+        work = asyncio.ensure_future(awaitable)
+        disconnected = asyncio.ensure_future(self._disconnected.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {work, disconnected},
+                timeout=self.remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            disconnected.cancel()
+
+        if work in done:
+            return work.result()
+
+        work.cancel()
+        if self._disconnected.is_set():
+            self._abort("disconnect", on_cancel)
+            logger.info(f"Client disconnected, cancelled upstream work ({self.route})")
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Klient zamknął połączenie")
+        self._abort("deadline", on_cancel)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Przekroczono limit czasu żądania ({self.seconds:g} s)"
+        )
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+
+def _route_timeout(route: str) -> float:
+    settings = get_settings()
+    return {
+        "chat": settings.chat_timeout_seconds,
+        "upload": settings.upload_timeout_seconds,
+        "archive": settings.archive_timeout_seconds,
+    }[route]
+
+
+def request_deadline(route: str):
+    """
+    Build a dependency that provides the RequestDeadline of a route.
+
+    The route's configured timeout applies unless the X-Request-Timeout
+    header asks for a shorter one.
+    """
+    async def dependency(request: Request):
+        seconds = _route_timeout(route)
+        header = request.headers.get(TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                requested = float(header)
+            except ValueError:
+                requested = 0.0
+            if requested <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Nagłówek X-Request-Timeout musi być dodatnią liczbą sekund"
+                )
+            seconds = min(seconds, requested)
+
+        deadline = RequestDeadline(request, route, seconds)
+        try:
+            yield deadline
+        finally:
+            deadline.close()
+
+    return dependency
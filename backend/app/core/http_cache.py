@@ -0,0 +1,45 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+CACHE_CONTROL = "no-cache"  # Clients may store responses but must revalidate with If-None-Match
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from cheap change indicators (counters, timestamps)"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    # Compression appends a coding suffix ("-br"/"-gz") to the ETag of the
+    # encoded representation; strip it so the validator matches either form
+    tag = tag.strip().removeprefix("W/").strip('"')
+    for suffix in ("-br", "-gz"):
+        tag = tag.removesuffix(suffix)
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == current for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the current validator"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    """Attach the validator to a full response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
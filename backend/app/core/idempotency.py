@@ -0,0 +1,462 @@
+"""
+Idempotency-Key support for expensive POST routes.
+
+A client (or a retrying gateway) that sends the same ``Idempotency-Key``
+header again gets the stored response of the first request instead of a
+second Google upload, store creation or generation:
+
+- the first request claims the key by inserting an IN_PROGRESS row,
+- a retry that arrives while it is running waits for the outcome (up to
+  IDEMPOTENCY_WAIT_SECONDS, then 409),
+- a retry after completion replays the stored status, headers and body
+  with ``Idempotent-Replayed: true``,
+- a key reused for a different request (method, path or body) is
+  rejected with 422.
+
+JSON bodies are buffered and fingerprinted up front. Uploads are streamed
+through to the app and hashed on the way; the hash covers the multipart
+part headers (file name, type) and contents but not the boundary, which
+differs between retries. A retry of an upload is hashed the same way
+before its stored response is replayed.
+
+Server errors (5xx) and aborted requests release the key so the request can
+be retried for real. Keys expire after IDEMPOTENCY_TTL_SECONDS.
+
+A claim whose process died mid-request would otherwise hold its key until
+the TTL: IN_PROGRESS rows are deleted at startup, and a claim older than
+its lease (the longest request deadline plus a margin) is taken over by
+the next request with that key.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.deadlines import CLIENT_CLOSED_REQUEST
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # Older releases of python-multipart
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# POST routes that start upstream work worth deduplicating
+DEFAULT_ROUTES = (
+    r"/stores/?",
+    r"/stores/\d+/files/?",
+    r"/stores/\d+/files/archive/?",
+    r"/chat/?",
+)
+
+# Responses that describe a transient state and must not be replayed
+# (499: the deadline or a client disconnect aborted the request)
+NON_REPLAYABLE_STATUSES = {408, 409, 425, 429, CLIENT_CLOSED_REQUEST}
+
+# Age after which an IN_PROGRESS claim is presumed dead and taken over
+DEFAULT_LEASE_SECONDS = 3600.0 + 60.0
+# Added to the longest request deadline to get the lease
+LEASE_MARGIN_SECONDS = 60.0
+
+
+def _fingerprint(method: str, path: str, body: Optional[bytes]) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    if body:
+        digest.update(body)
+    return digest.hexdigest()
+
+
+class _BodyDigest:
+    """
+    SHA-256 of a streamed request body.
+
+    Multipart bodies are hashed by their parts (headers and data), so two
+    sends of the same form with different boundaries hash the same.
+    """
+
+    def __init__(self, content_type: str):
+        self._digest = hashlib.sha256()
+        self._parser = None
+        self.complete = False
+        media_type, options = parse_options_header(content_type)
+        if media_type == b"multipart/form-data" and options.get(b"boundary"):
+            update = self._digest.update
+            self._parser = MultipartParser(options[b"boundary"], callbacks={
+                "on_part_begin": lambda: update(b"\x00part\x00"),
+                "on_header_field": lambda data, start, end: update(b"\x00h:" + data[start:end]),
+                "on_header_value": lambda data, start, end: update(b"=" + data[start:end]),
+                "on_part_data": lambda data, start, end: update(data[start:end]),
+            })
+
+    def update(self, message: Message) -> None:
+        if message["type"] != "http.request":
+            return
+        chunk = message.get("body", b"")
+        if chunk:
+            if self._parser is not None:
+                self._parser.write(chunk)
+            else:
+                self._digest.update(chunk)
+        if not message.get("more_body", False):
+            self.complete = True
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _hashing_receive(digest: _BodyDigest, receive: Receive) -> Receive:
+    async def wrapped() -> Message:
+        message = await receive()
+        digest.update(message)
+        return message
+
+    return wrapped
+
+
+async def _drain_digest(digest: _BodyDigest, receive: Receive) -> None:
+    """Read the rest of the body into the digest"""
+    while not digest.complete:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        digest.update(message)
+
+
+def idempotency_lease_seconds(settings) -> float:
+    """Lease of a claim: the longest request deadline plus a margin"""
+    longest = max(settings.chat_timeout_seconds, settings.upload_timeout_seconds, settings.archive_timeout_seconds)
+    return longest + LEASE_MARGIN_SECONDS
+
+
+class _Claim:
+    """Result of trying to claim a key"""
+
+    def __init__(self, claimed: bool, record: Optional[IdempotencyKey] = None):
+        self.claimed = claimed
+        self.record = record
+
+
+class IdempotencyStore:
+    """Persistence of idempotency keys (blocking; call from a worker thread)"""
+
+    def __init__(self, ttl_seconds: float, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+
+    def claim(self, key: str, fingerprint: str) -> _Claim:
+        """Insert an IN_PROGRESS row, or return the existing unexpired one"""
+        with SessionLocal() as db:
+            now = datetime.utcnow()
+            existing = db.get(IdempotencyKey, key)
+            if existing is not None and existing.expires_at <= now:
+                db.delete(existing)
+                db.commit()
+                existing = None
+            if existing is not None and existing.status == "IN_PROGRESS" and existing.created_at <= now - self.lease:
+                # The claimant outlived any request deadline: its process is gone.
+                # Conditional on the old claim time, so only one request takes over.
+                taken = db.query(IdempotencyKey).filter(
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status == "IN_PROGRESS",
+                    IdempotencyKey.created_at == existing.created_at,
+                ).update({"fingerprint": fingerprint, "created_at": now, "expires_at": now + self.ttl},
+                         synchronize_session=False)
+                db.commit()
+                if taken:
+                    logger.warning(f"Took over idempotency key claimed at {existing.created_at} and never completed")
+                    return _Claim(True)
+                db.expire_all()
+                existing = db.get(IdempotencyKey, key)  # Taken over or completed meanwhile
+            if existing is not None:
+                db.expunge(existing)
+                return _Claim(False, existing)
+
+            db.add(IdempotencyKey(key=key, fingerprint=fingerprint, status="IN_PROGRESS",
+                                  created_at=now, expires_at=now + self.ttl))
+            try:
+                db.commit()
+                return _Claim(True)
+            except IntegrityError:
+                # Another request claimed it between our read and insert
+                db.rollback()
+                existing = db.get(IdempotencyKey, key)
+                if existing is None:
+                    return self.claim(key, fingerprint)
+                db.expunge(existing)
+                return _Claim(False, existing)
+
+    def get(self, key: str) -> Optional[IdempotencyKey]:
+        with SessionLocal() as db:
+            record = db.get(IdempotencyKey, key)
+            if record is not None:
+                db.expunge(record)
+            return record
+
+    def complete(self, key: str, status_code: int, headers: list, body: bytes,
+                 fingerprint: Optional[str] = None) -> None:
+        with SessionLocal() as db:
+            record = db.get(IdempotencyKey, key)
+            if record is None:
+                return
+            if fingerprint is not None:
+                record.fingerprint = fingerprint
+            record.status = "COMPLETED"
+            record.response_status = status_code
+            record.response_headers = json.dumps(headers)
+            record.response_body = body
+            db.commit()
+
+    def release(self, key: str) -> None:
+        with SessionLocal() as db:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete()
+            db.commit()
+
+    def release_in_progress(self) -> int:
+        """Delete every IN_PROGRESS claim (at startup, when no request of this process runs)"""
+        with SessionLocal() as db:
+            deleted = db.query(IdempotencyKey).filter(IdempotencyKey.status == "IN_PROGRESS").delete()
+            db.commit()
+            return deleted
+
+    def purge_expired(self) -> int:
+        with SessionLocal() as db:
+            deleted = db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+            db.commit()
+            return deleted
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware deduplicating POSTs that carry an Idempotency-Key header"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        ttl_seconds: float = 86400.0,
+        wait_seconds: float = 60.0,
+        routes: Iterable[str] = DEFAULT_ROUTES,
+        purge_interval: float = 300.0,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        self.app = app
+        self.store = IdempotencyStore(ttl_seconds, lease_seconds)
+        self.wait_seconds = wait_seconds
+        self.routes = [re.compile(pattern) for pattern in routes]
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._inflight: dict[str, asyncio.Event] = {}  # Keys being processed by this process
+
+    def _applies(self, scope: Scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and any(pattern.fullmatch(scope["path"]) for pattern in self.routes)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse(
+                {"detail": f"Nagłówek Idempotency-Key musi mieć od 1 do {MAX_KEY_LENGTH} znaków"},
+                status_code=400,
+            )(scope, receive, send)
+            return
+
+        # JSON bodies are small: buffer them to include in the fingerprint and
+        # replay them to the app. Other bodies (uploads) are hashed while the
+        # app streams them; their fingerprint is "<route>:<body hash>".
+        digest = None
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            body = await _read_body(receive)
+            receive = _replay_receive(body, receive)
+            fingerprint = _fingerprint(scope["method"], scope["path"], body)
+        else:
+            digest = _BodyDigest(content_type)
+            receive = _hashing_receive(digest, receive)
+            fingerprint = _fingerprint(scope["method"], scope["path"], None) + ":"
+
+        await self._maybe_purge()
+        claim = await run_in_threadpool(self.store.claim, key, fingerprint)
+        if not claim.claimed:
+            await self._respond_existing(key, fingerprint, claim.record, scope, receive, send, digest)
+            return
+
+        done = self._inflight[key] = asyncio.Event()
+        try:
+            await self._run_and_record(key, scope, receive, send, fingerprint, digest)
+        finally:
+            done.set()
+            self._inflight.pop(key, None)
+
+    async def _run_and_record(self, key: str, scope: Scope, receive: Receive, send: Send,
+                              fingerprint: str, digest: Optional[_BodyDigest]) -> None:
+        start: Optional[Message] = None
+        chunks = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            await run_in_threadpool(self.store.release, key)
+            raise
+
+        status_code = start["status"] if start else 500
+        if status_code >= 500 or status_code in NON_REPLAYABLE_STATUSES:
+            await run_in_threadpool(self.store.release, key)
+            return
+        stored_headers = [
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in start.get("headers", [])
+        ]
+        if digest is not None and digest.complete:
+            # The app read the whole body; otherwise (an early rejection) the route alone is kept
+            fingerprint += digest.hexdigest()
+        await run_in_threadpool(
+            self.store.complete, key, status_code, stored_headers, b"".join(chunks), fingerprint
+        )
+
+    async def _respond_existing(
+        self,
+        key: str,
+        fingerprint: str,
+        record: IdempotencyKey,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        digest: Optional[_BodyDigest] = None,
+    ) -> None:
+        if not self._same_request(record, fingerprint):
+            await self._reject_reuse(scope, receive, send)
+            return
+
+        if record.status == "IN_PROGRESS":
+            record = await self._wait_for(key)
+            if record is None:
+                # The original failed and released the key: run this request for real
+                await self(scope, receive, send)
+                return
+            if record.status == "IN_PROGRESS":
+                await JSONResponse(
+                    {"detail": "Żądanie z tym kluczem Idempotency-Key jest nadal przetwarzane"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )(scope, receive, send)
+                return
+
+        if digest is not None and record.fingerprint != fingerprint:
+            # The original upload was hashed: hash this one before replaying
+            await _drain_digest(digest, receive)
+            if record.fingerprint != fingerprint + digest.hexdigest():
+                await self._reject_reuse(scope, receive, send)
+                return
+
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in json.loads(record.response_headers or "[]")
+        ]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record.response_status, "headers": headers})
+        await send({"type": "http.response.body", "body": record.response_body or b""})
+
+    @staticmethod
+    def _same_request(record: IdempotencyKey, fingerprint: str) -> bool:
+        if fingerprint.endswith(":"):
+            # Streamed body: the route must match; the body hash is checked once known
+            return record.fingerprint.startswith(fingerprint)
+        return record.fingerprint == fingerprint
+
+    @staticmethod
+    async def _reject_reuse(scope: Scope, receive: Receive, send: Send) -> None:
+        await JSONResponse(
+            {"detail": "Klucz Idempotency-Key został już użyty dla innego żądania"},
+            status_code=422,
+        )(scope, receive, send)
+
+    async def _wait_for(self, key: str) -> Optional[IdempotencyKey]:
+        """
+        Wait until the request holding the key finishes.
+
+        The original may run in this process (woken through an event) or in
+        another worker (the row is polled).
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            event = self._inflight.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=max(0.0, remaining))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(0.5, max(0.0, remaining)))
+            record = await run_in_threadpool(self.store.get, key)
+            if record is None or record.status != "IN_PROGRESS" or time.monotonic() >= deadline:
+                return record
+
+    async def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        try:
+            deleted = await run_in_threadpool(self.store.purge_expired)
+            if deleted:
+                logger.info(f"Purged {deleted} expired idempotency keys")
+        except Exception as e:
+            logger.warning(f"Failed to purge idempotency keys: {e}")
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_receive(body: bytes, receive: Receive) -> Receive:
+    """Hand the buffered body to the app once, then defer to the real channel"""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
@@ -0,0 +1,109 @@
+"""
+Minimal in-process metrics registry.
+
+Counters, gauges and histograms keyed by name and labels, exposed as a JSON
+snapshot by GET /metrics. Histograms keep running totals plus a bounded
+window of recent observations for percentiles.
+"""
+import threading
+from collections import deque
+from typing import Optional
+
+HISTOGRAM_WINDOW = 1024
+
+
+def _key(name: str, labels: Optional[dict]) -> tuple:
+    return (name, tuple(sorted((labels or {}).items())))
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.recent = deque(maxlen=HISTOGRAM_WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        self._histograms: dict[tuple, _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None) -> None:
+        """Increment a counter"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def add_gauge(self, name: str, delta: float, labels: Optional[dict] = None) -> None:
+        """Move a gauge up or down"""
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        """Record an observation in a histogram"""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """Return all metrics as {"counters": [...], "gauges": [...], "histograms": [...]}"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._gauges.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.snapshot()}
+                    for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
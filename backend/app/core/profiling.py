@@ -0,0 +1,369 @@
+"""
+On-demand profiling of single requests.
+
+With PROFILING_ENABLED set, a request runs under a sampling profiler when
+
+- it carries ``X-Profile: 1`` together with a valid admin token, or
+- it is picked by PROFILING_SAMPLE_RATIO (0 = only on demand).
+
+The profile is saved under PROFILING_DIR with a JSON description (route,
+status, duration, trace id) and its id is returned in the ``X-Profile-Id``
+response header; GET /admin/profiles lists them and
+GET /admin/profiles/{id} returns one. Only the newest
+PROFILING_MAX_PROFILES are kept and at most one request is profiled at a
+time (others run normally).
+
+pyinstrument is used when installed (HTML flame view and a text call
+tree, await time attributed to the awaiting line). Without it a built-in
+sampler reads the event loop thread's stack every PROFILING_INTERVAL_SECONDS
+while the request's task runs, and the task's suspended coroutine stack
+while it waits; the result is written as folded stacks (flamegraph.pl,
+speedscope) and a text summary.
+
+When profiling is disabled the middleware is not installed at all; when
+enabled, an unprofiled request costs a header lookup and a random draw.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.security import is_admin
+from app.core.tracing import current_span
+
+try:
+    import pyinstrument
+except ImportError:  # pyinstrument is optional; fall back to the built-in stack sampler
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Artifact format -> (file suffix, media type)
+FORMATS = {
+    "html": (".html", "text/html; charset=utf-8"),
+    "text": (".txt", "text/plain; charset=utf-8"),
+    "folded": (".folded", "text/plain; charset=utf-8"),
+}
+
+
+class ProfileStore:
+    """
+    Directory of saved profiles: ``<id>.json`` plus one file per format.
+
+    Args:
+        directory: Where profiles are written (created when missing)
+        max_profiles: Newest profiles kept; older ones are removed on save
+    """
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max(1, max_profiles)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ProfileStore":
+        return cls(
+            directory=settings.profiling_dir or os.path.join(tempfile.gettempdir(), "gfsa-profiles"),
+            max_profiles=settings.profiling_max_profiles,
+        )
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, info: dict, artifacts: dict) -> None:
+        """Write the artifacts ({format: content}) and the description of a profile"""
+        os.makedirs(self.directory, exist_ok=True)
+        for fmt, content in artifacts.items():
+            with open(self._path(info["id"], FORMATS[fmt][0]), "w", encoding="utf-8") as f:
+                f.write(content)
+        info = {**info, "formats": [fmt for fmt in FORMATS if fmt in artifacts]}
+        # The description goes last: a profile is listed only once complete
+        with open(self._path(info["id"], ".json"), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        self._prune()
+
+    def _prune(self) -> None:
+        with self._lock:
+            profiles = self.list()
+            for info in profiles[self.max_profiles:]:
+                for suffix in [".json"] + [FORMATS[fmt][0] for fmt in info.get("formats", [])]:
+                    try:
+                        os.remove(self._path(info["id"], suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> list[dict]:
+        """Descriptions of the saved profiles, newest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names:
+            if name.endswith(".json"):
+                info = self.get(name[:-5])
+                if info is not None:
+                    profiles.append(info)
+        profiles.sort(key=lambda info: info["started_at"], reverse=True)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        """Description of one profile, or None"""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read(self, profile_id: str, fmt: str) -> Optional[str]:
+        """Content of one artifact of a profile, or None"""
+        info = self.get(profile_id)
+        if info is None or fmt not in info.get("formats", []):
+            return None
+        try:
+            with open(self._path(profile_id, FORMATS[fmt][0]), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+# --- Profilers -------------------------------------------------------------
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace(os.sep, "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _request_frames(frames: list) -> list:
+    """Frames (outermost first) below ProfilingMiddleware, without the server and event loop"""
+    for i in range(len(frames) - 1, -1, -1):
+        if frames[i].f_code is ProfilingMiddleware.__call__.__code__:
+            return frames[i + 1:]
+    return frames
+
+
+class StackSampler:
+    """
+    Built-in wall-clock sampler of the current asyncio task.
+
+    A thread records, every ``interval`` seconds, the event loop thread's
+    stack while the task runs and the task's suspended coroutine stack
+    (ending in ``[await]``) while it waits. Work handed to the thread pool
+    shows up as time spent awaiting it.
+    """
+
+    name = "sampler"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:  # A racing task switch must not end the profile
+                pass
+
+    def _sample(self) -> None:
+        if asyncio.current_task(self._loop) is self._task:
+            frames = []
+            frame = sys._current_frames().get(self._thread_id)
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            stack = [_frame_label(f.f_code) for f in _request_frames(frames[::-1])]
+        else:
+            stack = [_frame_label(f.f_code) for f in _request_frames(self._task.get_stack())] + ["[await]"]
+        if stack:
+            self.samples[";".join(stack)] += 1
+
+    def render(self) -> dict:
+        folded = "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+        return {"folded": folded, "text": self._summary()}
+
+    def _summary(self, limit: int = 40) -> str:
+        total = sum(self.samples.values())
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")
+            for label in set(frames):
+                inclusive[label] += count
+            own[frames[-1]] += count
+        lines = [f"{total} samples every {self.interval * 1000:g} ms", "", "  total    self  function"]
+        for label, count in inclusive.most_common(limit):
+            lines.append(f"{count / total:6.1%} {own[label] / total:6.1%}  {label}")
+        return "\n".join(lines) + "\n"
+
+
+class PyinstrumentProfiler:
+    """pyinstrument session with await time attributed to the awaiting code"""
+
+    name = "pyinstrument"
+
+    def __init__(self, interval: float):
+        self._profiler = pyinstrument.Profiler(interval=interval, async_mode="enabled")
+        self.samples: Counter = Counter()
+
+    def start(self) -> None:
+        self._profiler.start()
+
+    def stop(self) -> None:
+        self._profiler.stop()
+
+    def render(self) -> dict:
+        return {"html": self._profiler.output_html(), "text": self._profiler.output_text(unicode=True)}
+
+
+def _new_profiler(interval: float):
+    return PyinstrumentProfiler(interval) if pyinstrument is not None else StackSampler(interval)
+
+
+# --- Middleware ------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running selected requests under a profiler.
+
+    The profile is stopped and saved before the last body chunk is sent, so
+    it can be fetched as soon as the client has the response.
+
+    Args:
+        app: The wrapped ASGI application
+        store: Where profiles are saved
+        sample_ratio: Share of requests profiled without the header
+        interval: Sampling interval in seconds
+    """
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, sample_ratio: float, interval: float):
+        self.app = app
+        self.store = store
+        self.sample_ratio = sample_ratio
+        self.interval = interval
+        self._active = False
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        """Why the request should be profiled, or None"""
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") and is_admin(headers.get("x-admin-token"), headers.get("authorization")):
+            return "header"
+        if self.sample_ratio and random.random() < self.sample_ratio:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            metrics.inc("profiling_skipped_total", labels={"reason": "busy"})
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profile_id = uuid.uuid4().hex
+        span = current_span()
+        info = {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": None,
+            "status": None,
+            "trigger": trigger,
+            "profiler": None,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": None,
+            "samples": None,
+            "trace_id": span.trace_id if span is not None and span.sampled else None,
+        }
+        profiler = _new_profiler(self.interval)
+        info["profiler"] = profiler.name
+        started = time.perf_counter()
+        saved = False
+
+        async def finish() -> None:
+            nonlocal saved
+            if saved:
+                return
+            saved = True
+            profiler.stop()
+            info["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            route = scope.get("route")
+            info["route"] = getattr(route, "path", None)
+            try:
+                await run_in_threadpool(self._save, profiler, info)
+            except Exception as e:
+                metrics.inc("profiling_failures_total")
+                logger.warning(f"Could not save profile {profile_id}: {str(e)}")
+
+        async def send_profiled(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                info["status"] = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                await finish()
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            try:
+                await finish()
+            finally:
+                self._active = False
+
+    def _save(self, profiler, info: dict) -> None:
+        artifacts = profiler.render()
+        info["samples"] = sum(profiler.samples.values()) if profiler.samples else None
+        self.store.save(info, artifacts)
+        metrics.inc("profiles_saved_total", labels={"trigger": info["trigger"]})
+        logger.info(f"Saved profile {info['id']} of {info['method']} {info['path']} ({info['duration_ms']} ms)")
+
+
+# Singleton instance
+_store_instance: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    """Get singleton instance of ProfileStore"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = ProfileStore.from_settings(get_settings())
+    return _store_instance
@@ -0,0 +1,26 @@
+import typing
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import get_settings
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (several times faster than json.dumps)"""
+
+    def render(self, content: typing.Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def fast_json_enabled() -> bool:
+    """Fast JSON is opt-in (FAST_JSON_ENABLED=true) and requires orjson"""
+    return orjson is not None and get_settings().fast_json_enabled
+
+
+# Response class for large listing/chat payloads
+JSONResponseClass = FastJSONResponse if fast_json_enabled() else JSONResponse
@@ -0,0 +1,48 @@
+"""
+Access control of administrative endpoints.
+
+Admin routes (metadata export/import and other maintenance operations)
+require the ADMIN_TOKEN setting and a matching ``X-Admin-Token`` header
+(or ``Authorization: Bearer <token>``). Without ADMIN_TOKEN they are
+disabled.
+"""
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from app.core.config import get_settings
+
+
+def is_admin(x_admin_token: Optional[str], authorization: Optional[str]) -> bool:
+    """Whether the request headers carry the configured admin token"""
+    expected = get_settings().admin_token
+    if not expected:
+        return False
+    token = x_admin_token
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    return token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+async def require_admin(
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+) -> None:
+    """
+    Dependency guarding admin routes.
+
+    Raises:
+        HTTPException: 403 if admin routes are disabled, 401 if the token is missing or wrong
+    """
+    if not get_settings().admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Endpointy administracyjne są wyłączone (brak ADMIN_TOKEN)"
+        )
+    if not is_admin(x_admin_token, authorization):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Nieprawidłowy token administracyjny",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
@@ -0,0 +1,530 @@
+"""
+Minimal in-process tracing, modelled on OpenTelemetry.
+
+Spans form a tree per request: TracingMiddleware opens the root span of
+every HTTP request, and code opens child spans with ``tracer.span(...)``
+or the ``@traced`` decorator. The current span travels in a contextvar, so
+it follows awaits, tasks and ``run_in_threadpool``; database statements
+are recorded as children by instrument_sqlalchemy().
+
+- sampling is decided once per trace (TRACING_SAMPLE_RATIO), or taken from
+  an incoming W3C ``traceparent`` header; unsampled traces cost one
+  contextvar lookup per span,
+- finished spans go to a pluggable exporter: ``console`` (log lines),
+  ``otlp`` (OTLP/HTTP JSON, batched in a background thread) or ``memory``
+  (kept in a list, for tests and debugging).
+
+Nothing is recorded unless TRACING_ENABLED is set.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+MAX_ATTRIBUTE_LENGTH = 1000
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "sampled", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 sampled: bool, kind: str = "internal", attributes: Optional[dict] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: dict = {}
+        self.status = "UNSET"
+        self.status_message: Optional[str] = None
+        if attributes:
+            self.set_attributes(attributes)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if not self.sampled or value is None:
+            return
+        if not isinstance(value, (bool, int, float, str)):
+            value = str(value)
+        if isinstance(value, str) and len(value) > MAX_ATTRIBUTE_LENGTH:
+            value = value[:MAX_ATTRIBUTE_LENGTH] + "…"
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"[:MAX_ATTRIBUTE_LENGTH]
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            self._tracer._export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _SpanScope:
+    """Context manager making a span current for the duration of a block"""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Optional[Span]):
+        self.span = span
+
+    def __enter__(self) -> Optional[Span]:
+        if self.span is not None:
+            self._token = _current_span.set(self.span)
+        return self.span if self.span is not None else _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is None:
+            return
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.span.record_error(exc)
+        _current_span.reset(self._token)
+        self.span.end()
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled"""
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# --- Exporters -------------------------------------------------------------
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list (tests, debugging)"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        with self._lock:
+            self.spans.extend(spans)
+            del self.spans[:-self.max_spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class ConsoleSpanExporter:
+    """Logs every finished span as one JSON line"""
+
+    def export(self, spans: list[Span]) -> None:
+        for span in spans:
+            logger.info("span " + json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+    def shutdown(self) -> None:
+        pass
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpSpanExporter:
+    """
+    Sends spans to an OTLP/HTTP collector as JSON (``/v1/traces``).
+
+    Args:
+        endpoint: Collector URL, e.g. http://localhost:4318/v1/traces
+        service_name: Value of the service.name resource attribute
+        headers: Extra HTTP headers (e.g. authentication)
+        timeout: Seconds per request
+    """
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[dict] = None, timeout: float = 10.0):
+        import requests
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({"Content-Type": "application/json", **(headers or {})})
+
+    def _payload(self, spans: list[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "app.core.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": _OTLP_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                    "status": {"code": 2, "message": span.status_message or ""} if span.status == "ERROR" else {"code": 0},
+                } for span in spans],
+            }],
+        }]}
+
+    def export(self, spans: list[Span]) -> None:
+        response = self._session.post(self.endpoint, data=json.dumps(self._payload(spans)), timeout=self.timeout)
+        response.raise_for_status()
+
+    def shutdown(self) -> None:
+        self._session.close()
+
+
+class BatchSpanProcessor:
+    """
+    Hands finished spans to an exporter from a background thread.
+
+    Spans are sent in batches of up to max_batch every flush_interval
+    seconds; when the queue is full new spans are dropped (and counted)
+    rather than slowing requests down.
+    """
+
+    def __init__(self, exporter, max_queue: int = 8192, max_batch: int = 512, flush_interval: float = 5.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("tracing_spans_dropped_total")
+
+    def _drain(self) -> None:
+        while True:
+            batch = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+                metrics.inc("tracing_spans_exported_total", len(batch))
+            except Exception as e:
+                metrics.inc("tracing_export_failures_total")
+                logger.warning(f"Exporting {len(batch)} spans failed: {str(e)}")
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self._drain()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval)
+        self._drain()
+        self.exporter.shutdown()
+
+
+class SimpleSpanProcessor:
+    """Exports every span synchronously when it ends (console, memory)"""
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self.exporter.export([span])
+        except Exception as e:
+            logger.warning(f"Exporting span {span.name} failed: {str(e)}")
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+# --- Tracer ------------------------------------------------------------------
+
+class Tracer:
+    """Creates spans; disabled (no-op) until configure() is called"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_ratio = 1.0
+        self.processor = None
+
+    def configure(self, processor, sample_ratio: float = 1.0) -> None:
+        self.processor = processor
+        self.sample_ratio = sample_ratio
+        self.enabled = True
+
+    def shutdown(self) -> None:
+        if self.processor is not None:
+            self.processor.shutdown()
+        self.enabled = False
+        self.processor = None
+
+    def _export(self, span: Span) -> None:
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    def start_span(self, name: str, attributes: Optional[dict] = None, kind: str = "internal",
+                   parent: Optional[Span] = None, traceparent: Optional[str] = None) -> Optional[Span]:
+        """
+        Start a span without making it current (end it with span.end()).
+
+        Args:
+            name: Span name
+            attributes: Initial attributes
+            kind: "internal", "server" or "client"
+            parent: Parent span (default: the current span)
+            traceparent: W3C traceparent header continuing a remote trace
+
+        Returns:
+            The span, or None when tracing is disabled
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current_span.get()
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, parent.sampled, kind, attributes)
+        match = TRACEPARENT.match(traceparent or "")
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < self.sample_ratio
+        return Span(self, name, trace_id, parent_id, sampled, kind, attributes)
+
+    def span(self, name: str, attributes: Optional[dict] = None, kind: str = "internal") -> _SpanScope:
+        """Context manager running a block in a new child span of the current one"""
+        return _SpanScope(self.start_span(name, attributes, kind))
+
+
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    """The span of the running code, if any"""
+    return _current_span.get()
+
+
+def set_attributes(attributes: dict) -> None:
+    """Add attributes to the current span (no-op without one)"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(attributes)
+
+
+def traced(name: str, arguments: Optional[dict] = None):
+    """
+    Decorator running a function (sync or async) in its own span.
+
+    Args:
+        name: Span name
+        arguments: Span attributes taken from the call's arguments, as
+            {attribute: parameter name}, e.g. {"store": "google_store_name"}
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def span_attributes(args, kwargs) -> Optional[dict]:
+            if not arguments:
+                return None
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            return {key: bound.get(parameter) for key, parameter in arguments.items()}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(name, span_attributes(args, kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, span_attributes(args, kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Setup -------------------------------------------------------------------
+
+def _parse_headers(value: Optional[str]) -> dict:
+    headers = {}
+    for pair in (value or "").split(","):
+        if "=" in pair:
+            key, _, header_value = pair.partition("=")
+            headers[key.strip()] = header_value.strip()
+    return headers
+
+
+def configure_tracing(settings) -> None:
+    """Set up the tracer from settings (no-op unless TRACING_ENABLED)"""
+    if not settings.tracing_enabled:
+        return
+    if settings.tracing_exporter == "otlp":
+        processor = BatchSpanProcessor(OtlpHttpSpanExporter(
+            settings.tracing_otlp_endpoint,
+            settings.tracing_service_name,
+            _parse_headers(settings.tracing_otlp_headers),
+        ))
+    elif settings.tracing_exporter == "memory":
+        processor = SimpleSpanProcessor(InMemorySpanExporter())
+    else:
+        processor = SimpleSpanProcessor(ConsoleSpanExporter())
+    tracer.configure(processor, settings.tracing_sample_ratio)
+    logger.info(f"Tracing enabled: exporter={settings.tracing_exporter}, sample ratio={settings.tracing_sample_ratio}")
+
+
+def instrument_sqlalchemy(engine, record_statements: bool = True) -> None:
+    """Record every statement run inside a traced request as a db.query span"""
+    from sqlalchemy import event
+
+    system = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not tracer.enabled or _current_span.get() is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        attributes = {"db.system": system, "db.operation": operation}
+        if record_statements:
+            attributes["db.statement"] = statement
+        context._trace_span = tracer.start_span(f"db.{operation.lower() or 'query'}", attributes, kind="client")
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rows", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_error(exception_context.original_exception)
+            span.end()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request.
+
+    The span is named after the matched route template (e.g.
+    ``POST /stores/{store_id}/files/``), continues an incoming traceparent
+    and is returned to the client as X-Trace-Id when sampled.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        span = tracer.start_span(
+            f"{method} {scope['path']}",
+            {"http.method": method, "http.target": scope["path"]},
+            kind="server",
+            traceparent=Headers(scope=scope).get("traceparent"),
+        )
+
+        async def send_with_trace(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "ERROR"
+                if span.sampled:
+                    MutableHeaders(scope=message).append("X-Trace-Id", span.trace_id)
+            await send(message)
+
+        with _SpanScope(span):
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
@@ -0,0 +1,260 @@
+"""
+Global budget of in-flight uploads.
+
+Every upload is spooled to the temp directory before Google sees it, so a
+burst of large uploads can fill the disk and the memory of the process.
+Upload requests reserve their disk footprint and one transfer slot before
+the body is read. The footprint is the size (Content-Length, or the route's
+maximum when the length is unknown) times the route's number of copies on
+disk (e.g. the spooled upload plus the text extracted from it), plus what
+the route spools besides (archive entries in flight); see upload_routes().
+A route whose worst case exceeds the budget is capped at the budget with a
+warning at startup, so its largest allowed upload is still admitted:
+
+- at most UPLOAD_BUDGET_MAX_BYTES and UPLOAD_BUDGET_MAX_TRANSFERS are in
+  flight at once; the reservation is held until the response is sent,
+- a request that does not fit waits, in arrival order, up to
+  UPLOAD_BUDGET_WAIT_SECONDS and is then rejected with 503 and Retry-After,
+- a request larger than the whole budget is rejected with 413 at once,
+- optionally, uploads are refused while the temp directory would be left
+  with less than UPLOAD_BUDGET_MIN_FREE_DISK_BYTES.
+
+Usage is exported as the upload_inflight_bytes and
+upload_inflight_transfers gauges.
+"""
+import asyncio
+import logging
+import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UploadRoute:
+    """
+    Disk footprint of an upload route.
+
+    Args:
+        max_bytes: Size assumed when the request has no Content-Length
+        copies: Copies of the request body the route keeps on disk
+        extra_bytes: Disk used besides those copies, whatever the body size
+    """
+    max_bytes: int
+    copies: int = 1
+    extra_bytes: int = 0
+
+    def footprint(self, size: int) -> int:
+        return size * self.copies + self.extra_bytes
+
+
+def upload_routes(settings) -> dict:
+    """
+    Footprints of the upload routes under the given settings.
+
+    A file is spooled once, plus its extracted text when extraction is on
+    (written in full before TEXT_EXTRACTION_MAX_RATIO is checked). An archive
+    is spooled once by Starlette, and up to ARCHIVE_UPLOAD_CONCURRENCY of its
+    entries (each up to MAX_UPLOAD_BYTES, whatever the archive's compressed
+    size) are spooled at the same time, each with its extracted text.
+    """
+    extraction = 1 + settings.text_extraction_enabled
+    return {
+        r"/stores/\d+/files/?": UploadRoute(settings.max_upload_bytes, copies=extraction),
+        r"/stores/\d+/files/archive/?": UploadRoute(
+            settings.archive_max_bytes,
+            extra_bytes=settings.archive_upload_concurrency * settings.max_upload_bytes * extraction,
+        ),
+    }
+
+
+class UploadBudgetExceeded(Exception):
+    """The upload did not fit in the budget within the wait time"""
+
+
+@dataclass
+class _Waiter:
+    size: int
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class UploadBudget:
+    """
+    Bytes and transfer slots shared by all uploads of the process.
+
+    Args:
+        max_bytes: Bytes of uploads in flight at once
+        max_transfers: Uploads in flight at once
+        min_free_disk_bytes: Free space the temp directory must keep (0 = not checked)
+    """
+
+    def __init__(self, max_bytes: int, max_transfers: int, min_free_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_transfers = max(1, max_transfers)
+        self.min_free_disk_bytes = min_free_disk_bytes
+        self.in_flight_bytes = 0
+        self.in_flight_transfers = 0
+        self._waiters: deque[_Waiter] = deque()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("upload_inflight_bytes", self.in_flight_bytes)
+        metrics.set_gauge("upload_inflight_transfers", self.in_flight_transfers)
+        metrics.set_gauge("upload_budget_waiting", len(self._waiters))
+
+    def _disk_allows(self, size: int) -> bool:
+        if not self.min_free_disk_bytes:
+            return True
+        free = shutil.disk_usage(tempfile.gettempdir()).free
+        # Reserved uploads may not have been written yet; count them as used
+        return free - self.in_flight_bytes - size >= self.min_free_disk_bytes
+
+    def _fits(self, size: int) -> bool:
+        return (
+            self.in_flight_transfers < self.max_transfers
+            and self.in_flight_bytes + size <= self.max_bytes
+            and self._disk_allows(size)
+        )
+
+    def _grant(self, size: int) -> None:
+        self.in_flight_bytes += size
+        self.in_flight_transfers += 1
+
+    def _dispatch(self) -> None:
+        """Admit waiting uploads in arrival order while they fit"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(waiter.size):
+                break
+            self._waiters.popleft()
+            self._grant(waiter.size)
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    async def acquire(self, size: int, timeout: float) -> None:
+        """
+        Reserve size bytes and one transfer slot.
+
+        Args:
+            size: Bytes the upload will occupy
+            timeout: Seconds to wait for room
+
+        Raises:
+            UploadBudgetExceeded: If there was no room within timeout
+        """
+        if not self._waiters and self._fits(size):
+            self._grant(size)
+            self._update_gauges()
+            return
+
+        waiter = _Waiter(size)
+        self._waiters.append(waiter)
+        self._update_gauges()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                return  # Granted just as the wait ran out
+            waiter.future.cancel()
+            self._dispatch()
+            raise UploadBudgetExceeded()
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(size)
+            else:
+                waiter.future.cancel()
+                self._dispatch()
+            raise
+        finally:
+            metrics.observe("upload_budget_wait_seconds", time.monotonic() - started)
+
+    def release(self, size: int) -> None:
+        """Return a reservation taken with acquire()"""
+        self.in_flight_bytes -= size
+        self.in_flight_transfers -= 1
+        self._dispatch()
+
+
+class UploadBudgetMiddleware:
+    """
+    ASGI middleware admitting upload requests into the UploadBudget.
+
+    Args:
+        app: The wrapped ASGI application
+        budget: Shared budget
+        wait_seconds: How long a request waits for room before the 503
+        retry_after: Retry-After of the 503 response, in seconds
+        routes: Regexes of upload paths -> UploadRoute
+    """
+
+    def __init__(self, app: ASGIApp, budget: UploadBudget, wait_seconds: float, retry_after: int, routes: dict):
+        self.app = app
+        self.budget = budget
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self._routes = [(re.compile(pattern), route) for pattern, route in routes.items()]
+        for pattern, route in routes.items():
+            worst = route.footprint(route.max_bytes)
+            if worst > budget.max_bytes:
+                logger.warning(
+                    f"Upload route {pattern} may need {worst} B of disk, more than UPLOAD_BUDGET_MAX_BYTES "
+                    f"({budget.max_bytes} B); its reservations are capped at the budget"
+                )
+
+    def _route(self, scope: Scope) -> Optional[UploadRoute]:
+        """Footprint of the route, or None when the request is not an upload"""
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        for pattern, route in self._routes:
+            if pattern.fullmatch(scope["path"]):
+                return route
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = self._route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        size = int(content_length) if content_length and content_length.isdigit() else route.max_bytes
+        if size > self.budget.max_bytes:
+            metrics.inc("upload_budget_rejected_total", labels={"reason": "too_large"})
+            await JSONResponse(
+                {"detail": f"Upload ({size} B) przekracza budżet uploadów serwera ({self.budget.max_bytes} B)"},
+                status_code=413,
+            )(scope, receive, send)
+            return
+        size = min(route.footprint(size), self.budget.max_bytes)
+
+        try:
+            await self.budget.acquire(size, self.wait_seconds)
+        except UploadBudgetExceeded:
+            metrics.inc("upload_budget_rejected_total", labels={"reason": "busy"})
+            logger.info(f"Upload of {size} B rejected: budget full ({self.budget.in_flight_bytes} B, "
+                        f"{self.budget.in_flight_transfers} transfers in flight)")
+            await JSONResponse(
+                {"detail": "Serwer przetwarza zbyt wiele uploadów, spróbuj ponownie później"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.budget.release(size)
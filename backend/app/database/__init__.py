@@ -1,3 +1,3 @@
-from .database import Base, engine, get_db, init_db
+from .database import Base, SessionLocal, engine, get_db, init_db
 
-__all__ = ["Base", "engine", "get_db", "init_db"]
+__all__ = ["Base", "SessionLocal", "engine", "get_db", "init_db"]
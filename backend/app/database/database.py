@@ -1,15 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-from pathlib import Path
-from dotenv import load_dotenv
 
-# Load .env from project root (searches parent directories)
-env_path = Path(__file__).resolve().parents[2] / '.env'
-load_dotenv(dotenv_path=env_path, override=False)
+from app.core.config import get_settings
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./gemini_rag.db")
+DATABASE_URL = get_settings().database_url
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
@@ -32,3 +27,48 @@ def get_db():
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    added = _add_missing_columns()
+    _add_missing_indexes()
+    if "stores.file_count" in added:
+        # Store statistics were just introduced: fill them once from the files
+        from app.services.store_stats import recompute_store_stats
+        with SessionLocal() as db:
+            recompute_store_stats(db)
+            db.commit()
+
+
+def _add_missing_columns() -> set:
+    """
+    Add columns introduced after a table was first created.
+    
+    create_all() only creates missing tables, so existing databases would
+    otherwise lack newer columns. New columns must be nullable or carry a
+    server_default.
+    
+    Returns:
+        set: Added columns as "table.column"
+    """
+    added = set()
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                connection.execute(text(ddl))
+                added.add(f"{table.name}.{column.name}")
+    return added
+
+
+def _add_missing_indexes():
+    """Create indexes introduced after a table was first created"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
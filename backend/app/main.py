@@ -1,15 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
-import os
 import sys
 
-from app.database import init_db
-from app.routes import stores_router, files_router, chat_router
+from app.core.admission import AdmissionControlMiddleware, admission_classes
+from app.core.compression import CompressionMiddleware
+from app.core.config import get_settings
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore, idempotency_lease_seconds
+from app.core.profiling import ProfilingMiddleware, get_profile_store
+from app.core.tracing import TracingMiddleware, configure_tracing, instrument_sqlalchemy, tracer
+from app.core.upload_budget import UploadBudget, UploadBudgetMiddleware, upload_routes
+from app.database import engine, init_db
+from app.routes import stores_router, files_router, chat_router, models_router, metrics_router, events_router, search_router, admin_router
+from app.services.deletion_gc import get_deletion_collector
+from app.services.model_catalog import get_model_catalog
+from app.services.search_index import ensure_search_index
+from app.services.status_refresh import get_status_refresher
+from app.services.text_extraction import shutdown_extraction_pool
+
+settings = get_settings()
 
 # Configure logging
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVEL = settings.log_level.upper()
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -24,15 +38,36 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+configure_tracing(settings)
+if settings.tracing_enabled:
+    instrument_sqlalchemy(engine, record_statements=settings.tracing_db_statements)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup: Initialize database
     init_db()
+    ensure_search_index(engine)
     print("✓ Database initialized")
+    if settings.idempotency_enabled:
+        # Claims of requests that died with the previous process would block their keys
+        released = IdempotencyStore(settings.idempotency_ttl_seconds).release_in_progress()
+        if released:
+            logger.info(f"Released {released} idempotency keys left in progress")
+    # Keep the model catalog warm so chat validation never waits for Google
+    catalog_task = asyncio.create_task(get_model_catalog().run_refresh_loop())
+    # Remove the Google documents of deleted files in the background
+    gc_task = asyncio.create_task(get_deletion_collector().run_loop())
+    # Resolve files left IMPORTING when their upload request ended
+    refresh_task = asyncio.create_task(get_status_refresher().run_loop())
     yield
     # Shutdown: Cleanup if needed
+    catalog_task.cancel()
+    gc_task.cancel()
+    refresh_task.cancel()
+    shutdown_extraction_pool()
+    tracer.shutdown()  # Flush batched spans
     print("✓ Application shutdown")
 
 
@@ -44,6 +79,42 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Deduplicate retried uploads, store creation and chat (Idempotency-Key header).
+# Registered before CORS so replayed responses still get CORS headers.
+if settings.idempotency_enabled:
+    app.add_middleware(
+        IdempotencyMiddleware,
+        ttl_seconds=settings.idempotency_ttl_seconds,
+        wait_seconds=settings.idempotency_wait_seconds,
+        lease_seconds=idempotency_lease_seconds(settings),
+    )
+
+# Global budget of in-flight upload bytes and transfers (503 + Retry-After when full).
+# Outside the idempotency layer, so a rejected upload does not claim its key.
+if settings.upload_budget_enabled:
+    app.add_middleware(
+        UploadBudgetMiddleware,
+        budget=UploadBudget(
+            max_bytes=settings.upload_budget_max_bytes,
+            max_transfers=settings.upload_budget_max_transfers,
+            min_free_disk_bytes=settings.upload_budget_min_free_disk_bytes,
+        ),
+        wait_seconds=settings.upload_budget_wait_seconds,
+        retry_after=settings.upload_budget_retry_after_seconds,
+        routes=upload_routes(settings),
+    )
+
+# Shed chat, uploads and Google-bound writes early (503 + Retry-After) when their class
+# is saturated or slow; listings, health checks and events are never limited.
+# Inside CORS, so browsers can read the 503.
+if settings.admission_enabled:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        classes=admission_classes(settings),
+        min_in_flight=settings.admission_min_in_flight,
+        retry_after_max=settings.admission_retry_after_max_seconds,
+    )
+
 # Configure CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -51,12 +122,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "X-Trace-Id", "X-Profile-Id"],
 )
 
+# Negotiated gzip/brotli compression of large JSON payloads
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
+# Profiling of selected requests (inside the root span, so profiles carry its trace id)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=get_profile_store(),
+        sample_ratio=settings.profiling_sample_ratio,
+        interval=settings.profiling_interval_seconds,
+    )
+
+# Root span of every request (outermost, so it covers all other middleware)
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(stores_router)
 app.include_router(files_router)
 app.include_router(chat_router)
+app.include_router(models_router)
+app.include_router(metrics_router)
+app.include_router(events_router)
+app.include_router(search_router)
+app.include_router(admin_router)
 
 
 @app.get("/", tags=["Health"])
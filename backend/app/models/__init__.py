@@ -1,3 +1,3 @@
-from .models import Store, File
+from .models import Store, File, IdempotencyKey
 
-__all__ = ["Store", "File"]
+__all__ = ["Store", "File", "IdempotencyKey"]
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, LargeBinary, Text
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import ClauseElement
 from datetime import datetime
 from app.database.database import Base
 
@@ -13,10 +14,42 @@ class Store(Base):
     google_store_name = Column(String, unique=True, nullable=False, index=True)  # Google FileSearchStore name (e.g., "fileSearchStores/abc-123")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on every change to the store's files (ETag source)
+    system_instruction = Column(Text, nullable=True)  # Sent with every chat (as cached content when long)
+    generation_config = Column(Text, nullable=True)  # JSON: max_output_tokens, temperature, thinking_budget
+    safety_settings = Column(Text, nullable=True)  # JSON list of {"category", "threshold"}
+    # Materialized statistics of the visible (not deleted) files, kept up to date by the
+    # upload and delete paths; `python -m app.cli repair-stats` recomputes them
+    file_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_bytes = Column(Integer, nullable=False, default=0, server_default="0")
+    last_upload_at = Column(DateTime, nullable=True)
     
     # Relationship to files
     files = relationship("File", back_populates="store", cascade="all, delete-orphan")
 
+    def bump_version(self) -> None:
+        """Mark the store's file list as changed (evaluated atomically in SQL on flush)"""
+        self.version = Store.version + 1
+
+    def _increment(self, name: str, delta: int) -> None:
+        # Stack on an increment already pending in this flush instead of replacing it
+        current = self.__dict__.get(name)
+        base = current if isinstance(current, ClauseElement) else getattr(Store, name)
+        setattr(self, name, base + delta)
+
+    def record_files_added(self, files: list) -> None:
+        """Count new files in the statistics (evaluated atomically in SQL on flush)"""
+        if files:
+            self._increment("file_count", len(files))
+            self._increment("total_bytes", sum(f.size_bytes or 0 for f in files))
+            self.last_upload_at = datetime.utcnow()
+
+    def record_files_removed(self, files: list) -> None:
+        """Remove deleted files from the statistics (evaluated atomically in SQL on flush)"""
+        if files:
+            self._increment("file_count", -len(files))
+            self._increment("total_bytes", -sum(f.size_bytes or 0 for f in files))
+
 
 class File(Base):
     """File model representing documents in a FileSearchStore"""
@@ -27,7 +60,32 @@ class File(Base):
     document_id = Column(String, nullable=False)  # Document ID in FileSearchStore
     display_name = Column(String, nullable=False)  # User-facing filename
     upload_date = Column(DateTime, default=datetime.utcnow)
-    status = Column(String, default="IMPORTING")  # IMPORTING, COMPLETED, FAILED
+    status = Column(String, default="IMPORTING")  # IMPORTING, COMPLETED, FAILED, MISSING, DELETING, DELETE_FAILED
+    size_bytes = Column(Integer, nullable=True)  # Size of the file as uploaded by the user
+    uploaded_bytes = Column(Integer, nullable=True)  # Bytes sent to Google (smaller when text was extracted)
+    content_sha256 = Column(String, nullable=True)  # SHA-256 of the original content
+    deleted_at = Column(DateTime, nullable=True, index=True)  # Set when deleted; the row stays until Google confirms
+    delete_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    delete_next_attempt_at = Column(DateTime, nullable=True)  # Retry backoff of the garbage collector
+    delete_error = Column(Text, nullable=True)  # Last error of the remote deletion
     
     # Relationship to store
     store = relationship("Store", back_populates="files")
+
+    __table_args__ = (
+        Index("ix_files_store_document", "store_id", "document_id"),  # Per-store listing and upserts by document
+    )
+
+
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # Idempotency-Key header value
+    fingerprint = Column(String, nullable=False)  # Method, path and JSON body hash of the original request
+    status = Column(String, nullable=False, default="IN_PROGRESS")  # IN_PROGRESS, COMPLETED
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(Text, nullable=True)  # JSON list of [name, value] pairs
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
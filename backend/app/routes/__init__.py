@@ -2,5 +2,10 @@ from .stores import router as stores_router
 
 from .files import router as files_router
 from .chat import router as chat_router
+from .models import router as models_router
+from .metrics import router as metrics_router
+from .events import router as events_router
+from .search import router as search_router
+from .admin import router as admin_router
 
-__all__ = ["stores_router", "files_router", "chat_router"]
+__all__ = ["stores_router", "files_router", "chat_router", "models_router", "metrics_router", "events_router", "search_router", "admin_router"]
@@ -0,0 +1,204 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.core.profiling import FORMATS, get_profile_store
+from app.core.security import require_admin
+from app.database import SessionLocal, get_db
+from app.models import File
+from app.schemas import DeletionLeftoverListResponse, ErrorResponse, MetadataImportResponse, ProfileListResponse
+from app.services.deletion_gc import DELETE_FAILED, DELETING, get_deletion_collector
+from app.services.metadata_transfer import MetadataImporter, MetadataImportError, NDJSONLines, iter_export
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+NDJSON = "application/x-ndjson"
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {NDJSON: {}}, "description": "NDJSON stream of Store and File records"},
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+    }
+)
+async def export_metadata(store_id: Optional[List[int]] = Query(None)):
+    """
+    Export Store and File metadata as NDJSON.
+    
+    Streams a header line, then Stores, then Files (with Google resource
+    names, hashes and statuses). Rows are read in batches, so memory use
+    does not depend on the number of files. Pass store_id (repeatable) to
+    export selected Stores only.
+    """
+    batch_size = get_settings().metadata_batch_size
+
+    def lines():
+        with SessionLocal() as db:
+            yield from iter_export(db, store_id, batch_size)
+
+    return StreamingResponse(
+        iterate_in_threadpool(lines()),
+        media_type=NDJSON,
+        headers={"Content-Disposition": 'attachment; filename="metadata.ndjson"'},
+    )
+
+
+@router.post(
+    "/import",
+    response_model=MetadataImportResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Not a metadata export"},
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+    }
+)
+async def import_metadata(request: Request):
+    """
+    Import an NDJSON metadata export (request body).
+    
+    Stores are matched by their Google name and files by (Store,
+    document_id): existing records are updated, new ones inserted, in
+    transactions of METADATA_BATCH_SIZE files. The body is processed as it
+    arrives. Invalid records are skipped and reported in the summary.
+    Nothing is sent to Google.
+    """
+    batch_size = get_settings().metadata_batch_size
+    db = SessionLocal()
+    importer = MetadataImporter(db, batch_size)
+
+    def add_lines(lines: list) -> None:
+        for line in lines:
+            importer.add(line)
+
+    try:
+        splitter = NDJSONLines()
+        lines = []
+        async for chunk in request.stream():
+            lines.extend(splitter.feed(chunk))
+            if len(lines) >= batch_size:
+                await run_in_threadpool(add_lines, lines)
+                lines = []
+        lines.extend(splitter.finish())
+        await run_in_threadpool(add_lines, lines)
+        stats = await run_in_threadpool(importer.finish)
+    except MetadataImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Błąd podczas importu metadanych: {str(e)}"
+        )
+    finally:
+        db.close()
+
+    return MetadataImportResponse(**stats.__dict__)
+
+
+@router.get(
+    "/deletions",
+    response_model=DeletionLeftoverListResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+    }
+)
+async def list_failed_deletions(limit: int = Query(500, ge=1, le=10000), db: Session = Depends(get_db)):
+    """
+    List deleted files whose Google document could not be removed.
+    
+    These are the leftovers of the deletion GC (GC_MAX_ATTEMPTS failed
+    attempts), with the last error, for reconciliation.
+    """
+    query = db.query(File).filter(File.status == DELETE_FAILED)
+    files = query.order_by(File.deleted_at).limit(limit).all()
+    return DeletionLeftoverListResponse(files=files, total=query.count())
+
+
+@router.post(
+    "/deletions/retry",
+    response_model=DeletionLeftoverListResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+    }
+)
+async def retry_failed_deletions(file_id: Optional[List[int]] = Query(None), db: Session = Depends(get_db)):
+    """
+    Queue failed deletions again (all, or the given file_id values).
+    
+    Returns the files handed back to the deletion GC.
+    """
+    query = db.query(File).filter(File.status == DELETE_FAILED)
+    if file_id:
+        query = query.filter(File.id.in_(file_id))
+    files = query.all()
+    for file in files:
+        file.status = DELETING
+        file.delete_attempts = 0
+        file.delete_next_attempt_at = None
+    db.commit()
+    get_deletion_collector().wake()
+    return DeletionLeftoverListResponse(files=files, total=len(files))
+
+
+@router.get(
+    "/profiles",
+    response_model=ProfileListResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+    }
+)
+async def list_profiles():
+    """
+    List saved request profiles, newest first.
+    
+    Requests are profiled with PROFILING_ENABLED when they carry
+    ``X-Profile: 1`` and the admin token, or are sampled
+    (PROFILING_SAMPLE_RATIO); their responses have an X-Profile-Id header.
+    """
+    profiles = await run_in_threadpool(get_profile_store().list)
+    return ProfileListResponse(profiles=profiles, total=len(profiles))
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=Response,
+    responses={
+        200: {"content": {"text/html": {}, "text/plain": {}}, "description": "Profile output"},
+        401: {"model": ErrorResponse, "description": "Missing or wrong admin token"},
+        403: {"model": ErrorResponse, "description": "Admin endpoints disabled"},
+        404: {"model": ErrorResponse, "description": "Profile or format not found"},
+    }
+)
+async def get_profile(profile_id: str, format: Optional[str] = Query(None, pattern="^(html|text|folded)$")):
+    """
+    Get the output of a saved profile.
+    
+    Formats: ``html`` (pyinstrument flame view), ``text`` (call tree or
+    summary) and ``folded`` (folded stacks of the built-in sampler, for
+    flamegraph.pl or speedscope). Defaults to the first available one.
+    """
+    store = get_profile_store()
+    info = await run_in_threadpool(store.get, profile_id)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profil o ID {profile_id} nie został znaleziony"
+        )
+    fmt = format or info["formats"][0]
+    content = await run_in_threadpool(store.read, profile_id, fmt)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profil {profile_id} nie jest dostępny w formacie {fmt}"
+        )
+    return Response(content, media_type=FORMATS[fmt][1])
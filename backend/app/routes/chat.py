@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
+from app.core.deadlines import RequestDeadline, request_deadline
+from app.core.responses import JSONResponseClass
+from app.core.tracing import set_attributes
 from app.database import get_db
 from app.models import Store
 from app.schemas.chat_schemas import ChatRequest, ChatResponse
-from app.schemas import ErrorResponse
+from app.schemas import ErrorResponse, StoreChatConfig
 from app.services.google_file_search_service import get_google_file_search_service
+from app.services.model_catalog import get_model_catalog, ModelNotAvailableError
+from app.services.model_router import AUTO_MODEL, get_model_router
+from app.services.upstream_scheduler import Priority, SchedulerQueueFull, get_upstream_scheduler
 
 import logging
+import time
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = logging.getLogger(__name__)
@@ -15,22 +22,50 @@ logger = logging.getLogger(__name__)
 @router.post(
     "/",
     response_model=ChatResponse,
+    response_class=JSONResponseClass,
     responses={
+        400: {"model": ErrorResponse, "description": "Model not available for File Search chat"},
         404: {"model": ErrorResponse, "description": "Store not found"},
         500: {"model": ErrorResponse, "description": "Google API error"},
+        503: {"model": ErrorResponse, "description": "Upstream queue full"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
     }
 )
 async def chat_with_store(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    deadline: RequestDeadline = Depends(request_deadline("chat"))
 ):
     """
     Chat with a specific Store using Google File Search.
     
     US4: Czat z Agentem (Kontekstowy)
+    
+    The generation is cancelled when the client disconnects or the deadline
+    (CHAT_TIMEOUT_SECONDS, or a shorter X-Request-Timeout header) passes.
+    
+    With model="auto" the model is chosen per request (fast model for short
+    lookups, stronger one for analytical questions, long messages and large
+    Stores); the response reports the model used and the routing reason.
     """
     logger.debug(f"Chat request received: store_id={chat_request.store_id}, message_length={len(chat_request.message)}")
     
+    catalog = get_model_catalog()
+    router_ = get_model_router()
+    auto = (chat_request.model or "").strip().lower() == AUTO_MODEL
+    routing_reason = None
+    
+    # Validate the model against the cached catalog before touching DB or Google
+    if not auto:
+        try:
+            model_name = catalog.validate_chat_model(chat_request.model or "gemini-2.5-flash")
+        except ModelNotAvailableError as e:
+            logger.warning(f"Rejected chat model: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
     # Check if store exists
     store = db.query(Store).filter(Store.id == chat_request.store_id).first()
     if not store:
@@ -42,22 +77,70 @@ async def chat_with_store(
     
     logger.debug(f"Store found: id={store.id}, name='{store.display_name}', google_name='{store.google_store_name}'")
     
+    if auto:
+        # Materialized count of visible files: no COUNT query on the chat path
+        decision = router_.route(chat_request.message, store.file_count)
+        routing_reason = decision.reason
+        try:
+            model_name = catalog.validate_chat_model(decision.model)
+        except ModelNotAvailableError as e:
+            # The configured model is missing from the catalog: use the other one
+            fallback = router_.fallback_for(decision.model)
+            logger.warning(f"Routed model unavailable, falling back to '{fallback}': {str(e)}")
+            try:
+                model_name = catalog.validate_chat_model(fallback)
+            except ModelNotAvailableError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            routing_reason = f"{decision.reason}_fallback_unavailable"
+        logger.debug(f"Auto model: {model_name} ({routing_reason})")
+    set_attributes({"store.id": store.id, "model": model_name, "chat.routing_reason": routing_reason})
+    
     try:
         google_service = get_google_file_search_service()
+        store_config = StoreChatConfig.from_store(store)
         
-        response_text = google_service.chat_with_store(
-            google_store_name=store.google_store_name,
-            message=chat_request.message,
-            model_name=chat_request.model
-        )
+        # Chat is interactive: it is scheduled ahead of uploads and bulk ingests
+        async def generate() -> str:
+            async with get_upstream_scheduler().slot(Priority.INTERACTIVE, store.id):
+                started = time.perf_counter()
+                try:
+                    text = await google_service.chat_with_store(
+                        google_store_name=store.google_store_name,
+                        message=chat_request.message,
+                        model_name=model_name,
+                        timeout=deadline.remaining(),
+                        system_instruction=store_config.system_instruction,
+                        generation=store_config.generation_params(),
+                        safety_settings=[setting.model_dump() for setting in store_config.safety_settings]
+                    )
+                except Exception:
+                    router_.record(model_name, time.perf_counter() - started, ok=False)
+                    raise
+                router_.record(model_name, time.perf_counter() - started, ok=True)
+                return text
+        
+        response_text = await deadline.run(generate())
         
         logger.debug(f"Response generated successfully, length={len(response_text)}")
         
         return ChatResponse(
             response=response_text,
-            citations=[] # Citations are usually embedded in text or need extra parsing
+            citations=[], # Citations are usually embedded in text or need extra parsing
+            model=model_name,
+            routing_reason=routing_reason
         )
         
+    except HTTPException:
+        raise
+    except SchedulerQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Zbyt wiele oczekujących zapytań, spróbuj ponownie za chwilę",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
+
+from app.core.config import get_settings
+from app.database import get_db
+from app.models import Store
+from app.schemas import ErrorResponse
+from app.services.store_events import get_event_broker
+
+router = APIRouter(prefix="/stores/{store_id}/events", tags=["events"])
+
+
+@router.get(
+    "/",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Server-Sent Events stream"},
+        404: {"model": ErrorResponse, "description": "Store not found"},
+    }
+)
+async def stream_store_events(
+    store_id: int,
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Live ingestion events of a Store as Server-Sent Events.
+
+    Event types: upload.started, upload.progress (bytes sent to Google),
+    upload.operation (Google import state), upload.failed, file.status
+    (file record created or its status changed) and file.deleted.
+
+    Reconnecting clients send Last-Event-ID (EventSource does it
+    automatically) and receive the events they missed, as long as they are
+    still in the store's recent history.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+    db.close()  # Do not hold a connection for the lifetime of the stream
+
+    heartbeat = get_settings().events_heartbeat_seconds
+    broker = get_event_broker()
+
+    async def event_stream():
+        subscriber, backlog = broker.subscribe(store_id, last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield event.encode()
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            broker.unsubscribe(store_id, subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
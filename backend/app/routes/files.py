@@ -1,17 +1,314 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File as FastAPIFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-import shutil
+from typing import List, Optional
+import asyncio
+import logging
 import os
 import tempfile
+import time
+import uuid
+from datetime import datetime
 from pathlib import Path
 
-from app.database import get_db
+from app.core.config import get_settings
+from app.core.deadlines import RequestDeadline, request_deadline
+from app.core.metrics import metrics
+from app.core.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from app.core.responses import JSONResponseClass
+from app.core.tracing import set_attributes, tracer
+from app.database import SessionLocal, get_db
 from app.models import File, Store
-from app.schemas import FileResponse, FileListResponse, ErrorResponse
+from app.schemas import (
+    FileResponse,
+    FileListResponse,
+    ArchiveEntryResult,
+    ArchiveUploadResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse,
+    StatusRefreshResponse,
+    ErrorResponse,
+)
+from app.services.archive_ingestion import (
+    ARCHIVE_READ_ERRORS,
+    DEFAULT_EXCLUDES,
+    matches_filters,
+    open_archive,
+    spool_entry,
+)
+from app.services.deletion_gc import get_deletion_collector
 from app.services.google_file_search_service import get_google_file_search_service
+from app.services import store_events
+from app.services.store_events import get_event_broker
+from app.services.ingestion import prepare_upload, record_ingestion
+from app.services import search_index
+from app.services.status_refresh import get_status_refresher
+from app.services.upstream_scheduler import Priority, SchedulerQueueFull, get_upstream_scheduler
+from app.services.upload_preflight import PreflightError, PreflightResult, UploadPreflight, check_content_length
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ModuleNotFoundError:  # Older releases of python-multipart
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
 
 router = APIRouter(prefix="/stores/{store_id}/files", tags=["files"])
+logger = logging.getLogger(__name__)
+
+# Bytes of upload that count as one unit of scheduler cost (a chat is one unit)
+SCHEDULER_COST_UNIT = 1024 * 1024
+
+
+class _UploadStream:
+    """
+    Multipart parser writing the form's ``file`` field straight to a temporary file.
+
+    The field's name and extension are checked as soon as its part headers
+    arrive, before any of its bytes are read, and every chunk is validated on
+    the way. The upload is not spooled by Starlette first, so it is on disk
+    once. The temporary file is removed if validation fails.
+    """
+
+    def __init__(self, boundary: bytes, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.preflight: Optional[UploadPreflight] = None
+        self.tmp = None
+        self._headers: dict = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") != b"file" or self.preflight is not None:
+            return  # Other form fields (and a repeated file field) are ignored
+        self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+        declared = self._headers.get(b"content-length", b"")
+        self.preflight = UploadPreflight(
+            self.filename, int(declared) if declared.isdigit() else None, self.max_bytes
+        )
+        self.tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(self.filename).suffix)
+        self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            chunk = data[start:end]
+            self.preflight.feed(chunk)
+            self.tmp.write(chunk)
+
+    def _on_part_end(self) -> None:
+        self._in_file = False
+
+    async def receive(self, request: Request) -> tuple[str, PreflightResult]:
+        """
+        Read the request body and return the spooled file's path and validated facts.
+
+        Raises:
+            PreflightError: The form has no file or the file failed validation
+        """
+        try:
+            try:
+                async for chunk in request.stream():
+                    self._parser.write(chunk)
+                self._parser.finalize()
+            except MultipartParseError:
+                raise PreflightError(status.HTTP_400_BAD_REQUEST, "Niepoprawne dane formularza")
+            if self.preflight is None:
+                raise PreflightError(status.HTTP_422_UNPROCESSABLE_ENTITY, "Brak pliku w formularzu")
+            self.tmp.close()
+            return self.tmp.name, self.preflight.finish()
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        if self.tmp is not None:
+            self.tmp.close()
+            if os.path.exists(self.tmp.name):
+                os.unlink(self.tmp.name)
+
+
+def _new_upload_id() -> str:
+    """Correlation id tying an upload's live events together"""
+    return uuid.uuid4().hex[:12]
+
+
+def _publish_file_status(new_file: File, upload_id: Optional[str] = None) -> None:
+    """Announce a created or updated File record on the store's event stream"""
+    get_event_broker().publish(new_file.store_id, store_events.FILE_STATUS, {
+        "upload_id": upload_id,
+        "file": FileResponse.model_validate(new_file).model_dump(mode="json"),
+    })
+
+
+def _publish_upload_failed(store_id: int, upload_id: str, display_name: str, detail: str) -> None:
+    get_event_broker().publish(store_id, store_events.UPLOAD_FAILED, {
+        "upload_id": upload_id,
+        "display_name": display_name,
+        "detail": detail,
+    })
+
+
+async def _ingest_spooled(
+    store: Store,
+    tmp_path: str,
+    checked: PreflightResult,
+    display_name: str,
+    compact: bool,
+    upload_id: str,
+    deadline: RequestDeadline,
+    priority: Priority = Priority.UPLOAD
+) -> tuple[File, str]:
+    """
+    Send a validated, spooled file to Google and build its (unsaved) File record.
+    
+    Runs the optional text extraction, uploads in a worker thread so the event
+    loop stays free while the bytes are transferred, and records ingestion
+    metrics. Progress and Google operation state are published on the
+    store's event stream under upload_id. The transfer waits for an
+    upstream scheduler slot of the given priority, weighted by its size. The
+    caller owns tmp_path; extraction output is cleaned up here.
+    
+    When the request deadline passes or the client disconnects, the transfer
+    stops at the next chunk (HTTPException 504/499 is raised). If the bytes
+    had already reached Google, the pending import is still recorded in the
+    background so the document is not orphaned.
+    
+    Returns:
+        tuple: (File record, text to put in the local search index)
+    """
+    broker = get_event_broker()
+    store_id = store.id
+
+    def on_progress(kind: str, data: dict) -> None:
+        event_type = store_events.UPLOAD_PROGRESS if kind == "progress" else store_events.UPLOAD_OPERATION
+        broker.publish(store_id, event_type, {"upload_id": upload_id, **data})
+
+    prepared = await prepare_upload(tmp_path, checked, compact=compact)
+
+    def build_file(operation) -> File:
+        # A finished import yields the document name; otherwise keep the
+        # operation name so the status can be refreshed later
+        if operation.done:
+            document_id, file_status = operation.response.document_name, "COMPLETED"
+        else:
+            document_id, file_status = operation.name, "IMPORTING"
+        return File(
+            store_id=store_id,
+            document_id=document_id,
+            display_name=display_name,
+            status=file_status,
+            size_bytes=prepared.original_bytes,
+            uploaded_bytes=prepared.upload_bytes,
+            content_sha256=checked.sha256
+        )
+
+    try:
+        broker.publish(store_id, store_events.UPLOAD_STARTED, {
+            "upload_id": upload_id,
+            "display_name": display_name,
+            "total_bytes": prepared.upload_bytes,
+        })
+        google_service = get_google_file_search_service()
+        google_store_name = store.google_store_name
+        transfer_started = False
+
+        async def scheduled_upload():
+            nonlocal transfer_started
+            cost = max(1.0, prepared.upload_bytes / SCHEDULER_COST_UNIT)
+            async with get_upstream_scheduler().slot(priority, store_id, cost=cost):
+                transfer_started = True
+                return await run_in_threadpool(
+                    google_service.upload_to_store,
+                    file_path=prepared.path,
+                    google_store_name=google_store_name,
+                    display_name=display_name,
+                    mime_type=prepared.mime_type,
+                    on_progress=on_progress,
+                    timeout=deadline.remaining(),
+                    cancel_event=deadline.cancel_event
+                )
+
+        upload_started = time.perf_counter()
+        upload = asyncio.ensure_future(scheduled_upload())
+        try:
+            # The worker thread cannot be cancelled from here: shield it and let
+            # the cancel event stop it
+            operation = await deadline.run(asyncio.shield(upload))
+        except SchedulerQueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Zbyt wiele oczekujących uploadów, spróbuj ponownie za chwilę",
+                headers={"Retry-After": "5"}
+            )
+        except HTTPException:
+            if transfer_started:
+                _background(_keep_abandoned_import(upload, build_file, upload_id))
+            else:
+                upload.cancel()  # Still queued: just leave the queue
+            raise
+        record_ingestion(prepared, time.perf_counter() - upload_started, display_name)
+        index_text = await search_index.load_index_text(tmp_path, checked, prepared)
+    finally:
+        prepared.cleanup()
+
+    return build_file(operation), index_text
+
+
+# Strong references to fire-and-forget tasks
+_background_tasks: set = set()
+
+
+def _background(coroutine) -> None:
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _keep_abandoned_import(upload: asyncio.Future, build_file, upload_id: str) -> None:
+    """Record a file whose request was aborted after its bytes reached Google"""
+    try:
+        operation = await upload
+    except Exception:
+        return  # The transfer was stopped; nothing to keep
+    with SessionLocal() as db:
+        new_file = build_file(operation)
+        store = db.get(Store, new_file.store_id)
+        if store is None:
+            return
+        db.add(new_file)
+        store.record_files_added([new_file])
+        store.bump_version()
+        db.flush()
+        search_index.index_file(db, new_file.id, new_file.store_id, new_file.display_name, "")
+        db.commit()
+        db.refresh(new_file)
+        logger.info(f"Recorded '{new_file.display_name}' uploaded by an aborted request as {new_file.status}")
+        _publish_file_status(new_file, upload_id)
 
 @router.post(
     "/",
@@ -19,20 +316,43 @@ router = APIRouter(prefix="/stores/{store_id}/files", tags=["files"])
     status_code=status.HTTP_201_CREATED,
     responses={
         404: {"model": ErrorResponse, "description": "Store not found"},
+        413: {"model": ErrorResponse, "description": "File too large"},
+        415: {"model": ErrorResponse, "description": "Unsupported file type"},
+        422: {"model": ErrorResponse, "description": "Empty or encrypted file"},
         500: {"model": ErrorResponse, "description": "Google API error"},
-    }
+        503: {"model": ErrorResponse, "description": "Upstream queue full"},
+        504: {"model": ErrorResponse, "description": "Request deadline exceeded"},
+    },
+    # The body is parsed by _UploadStream, not by FastAPI; describe it for the docs
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"],
+    }}}}}
 )
 async def upload_file(
     store_id: int,
-    file: UploadFile = FastAPIFile(...),
-    db: Session = Depends(get_db)
+    request: Request,
+    keep_original: Optional[bool] = None,
+    db: Session = Depends(get_db),
+    deadline: RequestDeadline = Depends(request_deadline("upload"))
 ):
     """
     Upload a file to a specific Store.
     
     US2: Upload i Zarządzanie Plikami
     - [Pozytywny] Upload pliku do Google File Search + rekord w SQLite
+    - [Negatywny] Pre-flight: za duże, puste, zaszyfrowane lub nieobsługiwane pliki
+      są odrzucane w trakcie strumieniowania, zanim cokolwiek trafi do Google
+    
+    When TEXT_EXTRACTION_ENABLED is set, PDF/Office/HTML files are replaced
+    by their locally extracted text before upload; pass keep_original=true
+    to upload the original file instead.
+    
+    The transfer to Google stops when the client disconnects or the deadline
+    (UPLOAD_TIMEOUT_SECONDS, or a shorter X-Request-Timeout header) passes.
     """
+    settings = get_settings()
     # Check if store exists
     store = db.query(Store).filter(Store.id == store_id).first()
     if not store:
@@ -41,70 +361,47 @@ async def upload_file(
             detail=f"Store o ID {store_id} nie został znaleziony"
         )
 
-    # Save uploaded file temporarily
-    # Create a temp directory if not exists (though tempfile handles this)
-    # We use a named temporary file to get a path
-    
-    suffix = Path(file.filename).suffix
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
+    # Pre-flight: Content-Length, then name and extension from the part
+    # headers before the body is read, then streaming checks (size, sniffed
+    # MIME type, encryption) while spooling to a temp file
+    try:
+        check_content_length(request.headers.get("content-length"), settings.max_upload_bytes)
+        _, options = parse_options_header(request.headers.get("content-type", ""))
+        if not options.get(b"boundary"):
+            raise PreflightError(status.HTTP_422_UNPROCESSABLE_ENTITY, "Brak pliku w formularzu")
+        upload = _UploadStream(options[b"boundary"], settings.max_upload_bytes)
+        with tracer.span("upload.spool"):
+            tmp_path, checked = await upload.receive(request)
+    except PreflightError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    filename = upload.filename
+    set_attributes({"store.id": store_id, "file.name": filename, "file.size": checked.size_bytes, "file.mime_type": checked.mime_type})
     
+    upload_id = _new_upload_id()
     try:
-        # Upload to Google
-        google_service = get_google_file_search_service()
-        
-        # Note: We pass the store's google_store_name
-        # The service returns metadata about the uploaded file
-        # We assume the service handles the complexity of "uploading to store"
-        result = google_service.upload_to_store(
-            file_path=tmp_path,
-            google_store_name=store.google_store_name,
-            display_name=file.filename
-        )
-        
-        # Result should contain document info. 
-        # Based on typical Google API responses, we might get an object.
-        # Let's assume the service returns an object or dict with 'name' (document_id)
-        # If the service returns the `uploaded_file` object (from files.upload), its name is `files/xyz`.
-        # If it returns the `file_search_store` operation result, it might be different.
-        # Let's adjust based on what we implemented in the service.
-        # In service we returned: client.file_search_stores.upload_to_file_search_store(...)
-        # This returns a UploadFileResponse or similar.
-        # Let's assume we can access .name (which is the file resource name).
-        
-        # Wait, `upload_to_file_search_store` returns `tuple[str, str]` in my previous thought?
-        # No, I returned the result of the call directly.
-        # The result of `upload_to_file_search_store` is usually an operation or a response containing the file resource.
-        # Let's assume it has a `.name` attribute which is the document resource name.
-        
-        # However, to be safe, let's inspect what we get or assume standard attribute access.
-        # If it's a dict (from my type hint in service, though I didn't enforce it), we access keys.
-        # But `upload_to_file_search_store` returns an object.
-        # Let's try to access `.name` (document ID) and `.uri` or similar if needed.
-        # Actually, for `File` model we need `document_id`.
-        
-        document_id = getattr(result, 'name', None)
-        if not document_id:
-             # Fallback if it's a dict
-             document_id = result.get('name')
-        
-        # Create local record
-        new_file = File(
-            store_id=store.id,
-            document_id=document_id,
-            display_name=file.filename,
-            status="COMPLETED" # We assume it's done if the call succeeded (or we might need async check)
+        compact = settings.text_extraction_enabled if keep_original is None else not keep_original
+        new_file, index_text = await _ingest_spooled(
+            store, tmp_path, checked, filename, compact, upload_id, deadline
         )
         
         db.add(new_file)
+        store.record_files_added([new_file])
+        store.bump_version()
+        db.flush()
+        search_index.index_file(db, new_file.id, store_id, new_file.display_name, index_text)
         db.commit()
         db.refresh(new_file)
+        _publish_file_status(new_file, upload_id)
         
         return new_file
 
+    except HTTPException as e:
+        db.rollback()
+        _publish_upload_failed(store_id, upload_id, filename, e.detail)
+        raise
     except Exception as e:
         db.rollback()
+        _publish_upload_failed(store_id, upload_id, filename, str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Błąd podczas uploadu pliku: {str(e)}"
@@ -114,18 +411,183 @@ async def upload_file(
         if os.path.exists(tmp_path):
             os.unlink(tmp_path)
 
+@router.post(
+    "/archive",
+    response_model=ArchiveUploadResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+        413: {"model": ErrorResponse, "description": "Archive too large"},
+        415: {"model": ErrorResponse, "description": "Unsupported archive format"},
+        422: {"model": ErrorResponse, "description": "Damaged archive"},
+        500: {"model": ErrorResponse, "description": "Database error"},
+    }
+)
+async def upload_archive(
+    store_id: int,
+    file: UploadFile = FastAPIFile(...),
+    include: Optional[List[str]] = Query(None, description="Glob(s) an entry path must match, e.g. docs/*.pdf"),
+    exclude: Optional[List[str]] = Query(None, description="Glob(s) of entry paths to skip"),
+    max_entry_bytes: Optional[int] = Query(None, gt=0, description="Per-entry size limit (capped at MAX_UPLOAD_BYTES)"),
+    keep_original: Optional[bool] = None,
+    db: Session = Depends(get_db),
+    deadline: RequestDeadline = Depends(request_deadline("archive"))
+):
+    """
+    Upload a zip or tar archive and ingest each file inside it.
+    
+    Entries are read one by one from the archive (never unpacked as a whole),
+    validated with the same pre-flight as single uploads and sent to Google
+    with up to ARCHIVE_UPLOAD_CONCURRENCY uploads in flight. Every ingested
+    entry becomes its own File record, named after its path in the archive.
+    
+    Per-entry problems do not fail the request; the response is a manifest
+    with the outcome of every entry. When the client disconnects or the
+    deadline (ARCHIVE_TIMEOUT_SECONDS) passes, in-flight transfers stop and
+    the remaining entries are not read.
+    """
+    settings = get_settings()
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+    if file.size is not None and file.size > settings.archive_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Archiwum jest za duże (limit: {settings.archive_max_bytes // (1024 * 1024)} MB)"
+        )
+
+    try:
+        entries = await run_in_threadpool(open_archive, file.file, file.filename)
+    except PreflightError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    entry_limit = min(max_entry_bytes or settings.max_upload_bytes, settings.max_upload_bytes)
+    exclude = [*DEFAULT_EXCLUDES, *(exclude or [])]
+    compact = settings.text_extraction_enabled if keep_original is None else not keep_original
+
+    # The semaphore is taken before an entry is spooled, so it bounds both the
+    # uploads in flight and the temporary files waiting on disk
+    slots = asyncio.Semaphore(settings.archive_upload_concurrency)
+    results: List[ArchiveEntryResult] = []
+    created: dict[int, File] = {}
+    index_texts: dict[int, str] = {}
+    tasks = []
+
+    upload_ids: dict[int, str] = {}
+
+    async def ingest(index: int, tmp_path: str, checked: PreflightResult) -> None:
+        result = results[index]
+        upload_id = upload_ids[index] = _new_upload_id()
+        try:
+            created[index], index_texts[index] = await _ingest_spooled(
+                store, tmp_path, checked, result.name, compact, upload_id, deadline, priority=Priority.BULK
+            )
+            result.status = "uploaded"
+        except Exception as e:
+            result.status = "failed"
+            result.detail = e.detail if isinstance(e, HTTPException) else str(e)
+            _publish_upload_failed(store_id, upload_id, result.name, result.detail)
+        finally:
+            os.unlink(tmp_path)
+            slots.release()
+
+    truncated = False
+    error = None
+    try:
+        while True:
+            if deadline.cancel_event.is_set() or deadline.remaining() <= 0:
+                truncated, error = True, "Import przerwany (limit czasu lub rozłączenie klienta)"
+                break
+            try:
+                entry = await run_in_threadpool(next, entries, None)
+            except ARCHIVE_READ_ERRORS as e:
+                truncated, error = True, f"Archiwum jest uszkodzone: {e}"
+                break
+            if entry is None:
+                break
+            if len(results) >= settings.archive_max_entries:
+                truncated, error = True, f"Przekroczono limit {settings.archive_max_entries} plików w archiwum"
+                break
+
+            result = ArchiveEntryResult(name=entry.name, status="skipped", size_bytes=entry.size)
+            results.append(result)
+            if entry.skip_reason:
+                result.detail = entry.skip_reason
+                continue
+            if not matches_filters(entry.name, include, exclude):
+                result.detail = "Pominięty przez filtr include/exclude"
+                continue
+
+            await slots.acquire()
+            try:
+                preflight = UploadPreflight(entry.name, entry.size, entry_limit)
+                tmp_path, checked = await run_in_threadpool(spool_entry, entry, preflight, settings.upload_chunk_size)
+            except PreflightError as e:
+                slots.release()
+                result.status, result.detail = "rejected", e.detail
+                continue
+            except ARCHIVE_READ_ERRORS as e:
+                slots.release()
+                result.status, result.detail = "failed", f"Błąd odczytu z archiwum: {e}"
+                continue
+            result.size_bytes = checked.size_bytes
+            tasks.append(asyncio.create_task(ingest(len(results) - 1, tmp_path, checked)))
+    finally:
+        await asyncio.gather(*tasks)
+
+    for result in results:
+        metrics.inc("archive_entries_total", labels={"status": result.status})
+
+    try:
+        if created:
+            db.add_all(created.values())
+            store.record_files_added(list(created.values()))
+            store.bump_version()
+            db.flush()
+            for index, new_file in created.items():
+                search_index.index_file(db, new_file.id, store_id, new_file.display_name, index_texts[index])
+            db.commit()
+            for index, new_file in created.items():
+                db.refresh(new_file)
+                results[index].file = FileResponse.model_validate(new_file)
+                _publish_file_status(new_file, upload_ids[index])
+    except Exception as e:
+        db.rollback()
+        for index in created:
+            _publish_upload_failed(store_id, upload_ids[index], results[index].name, str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Błąd podczas zapisu plików z archiwum: {str(e)}"
+        )
+
+    return ArchiveUploadResponse(
+        entries=results,
+        uploaded=sum(1 for r in results if r.status == "uploaded"),
+        skipped=sum(1 for r in results if r.status == "skipped"),
+        failed=sum(1 for r in results if r.status in ("rejected", "failed")),
+        truncated=truncated,
+        error=error,
+    )
+
 @router.get(
     "/",
     response_model=FileListResponse,
+    response_class=JSONResponseClass,
     responses={
+        304: {"description": "List unchanged since the ETag in If-None-Match"},
         404: {"model": ErrorResponse, "description": "Store not found"},
     }
 )
-async def list_files(store_id: int, db: Session = Depends(get_db)):
+async def list_files(store_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     List files in a specific Store.
     
     US3: Podgląd zawartości Store
+    
+    Supports conditional GET: the ETag comes from the store's change counter,
+    so an unchanged list is answered with 304 without loading file rows.
     """
     # Check if store exists
     store = db.query(Store).filter(Store.id == store_id).first()
@@ -134,25 +596,90 @@ async def list_files(store_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Store o ID {store_id} nie został znaleziony"
         )
+    
+    etag = make_etag("files", store.id, store.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
         
-    files = db.query(File).filter(File.store_id == store_id).order_by(File.upload_date.desc()).all()
+    files = db.query(File).filter(File.store_id == store_id, File.deleted_at.is_(None)).order_by(File.upload_date.desc()).all()
     
     return FileListResponse(
         files=files,
         total=len(files)
     )
 
+@router.post(
+    "/refresh-status",
+    response_model=StatusRefreshResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+        500: {"model": ErrorResponse, "description": "Google API error"},
+        503: {"model": ErrorResponse, "description": "Upstream queue full"},
+    }
+)
+async def refresh_file_statuses(store_id: int, db: Session = Depends(get_db)):
+    """
+    Refresh the statuses of a Store's files from Google.
+    
+    The Store's documents are read with paged list calls (not one call per
+    file) and all changed rows are updated in one transaction: IMPORTING
+    files become COMPLETED or FAILED, files whose document is gone become
+    MISSING. Changes are published as file.status events.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+
+    try:
+        result = await get_status_refresher().refresh_store(store_id)
+    except SchedulerQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Zbyt wiele oczekujących zapytań do Google, spróbuj ponownie później"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Błąd podczas odświeżania statusów plików: {str(e)}"
+        )
+    return StatusRefreshResponse(
+        checked=result.checked,
+        updated=result.updated,
+        api_calls=result.api_calls,
+        listing_complete=result.listing_complete,
+        statuses=result.statuses,
+    )
+
+
+def _mark_deleted(db: Session, store: Store, files: List[File]) -> None:
+    """Hide files, queue their Google documents for the deletion GC and update the Store statistics"""
+    store.record_files_removed(files)
+    now = datetime.utcnow()
+    for file in files:
+        file.deleted_at = now
+        file.status = "DELETING"
+        file.delete_next_attempt_at = None
+        search_index.remove_file(db, file.id)
+
+
 @router.delete(
     "/{file_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     responses={
         404: {"model": ErrorResponse, "description": "File not found"},
-        500: {"model": ErrorResponse, "description": "Google API error"},
+        500: {"model": ErrorResponse, "description": "Database error"},
     }
 )
 async def delete_file(store_id: int, file_id: int, db: Session = Depends(get_db)):
     """
     Delete a file from a Store.
+    
+    The file disappears from the Store immediately; its Google document is
+    deleted in the background.
     """
     # Check if store exists (optional but good for consistency)
     store = db.query(Store).filter(Store.id == store_id).first()
@@ -162,7 +689,9 @@ async def delete_file(store_id: int, file_id: int, db: Session = Depends(get_db)
             detail=f"Store o ID {store_id} nie został znaleziony"
         )
 
-    file = db.query(File).filter(File.id == file_id, File.store_id == store_id).first()
+    file = db.query(File).filter(
+        File.id == file_id, File.store_id == store_id, File.deleted_at.is_(None)
+    ).first()
     if not file:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -170,17 +699,68 @@ async def delete_file(store_id: int, file_id: int, db: Session = Depends(get_db)
         )
         
     try:
-        # Delete from Google
-        google_service = get_google_file_search_service()
-        google_service.delete_file(file.document_id)
-        
-        # Delete from DB
-        db.delete(file)
+        _mark_deleted(db, store, [file])
+        store.bump_version()
         db.commit()
-        
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Błąd podczas usuwania pliku: {str(e)}"
         )
+    get_event_broker().publish(store_id, store_events.FILE_DELETED, {"file_id": file_id})
+    get_deletion_collector().wake()
+
+
+@router.post(
+    "/bulk-delete",
+    response_model=BulkDeleteResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+        500: {"model": ErrorResponse, "description": "Database error"},
+    }
+)
+async def bulk_delete_files(store_id: int, payload: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """
+    Delete many files of a Store in one call.
+    
+    All files are hidden in one transaction and their Google documents are
+    deleted in the background. Ids that do not exist in the Store (or are
+    already deleted) are returned in not_found.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+
+    requested = list(dict.fromkeys(payload.file_ids))
+    try:
+        files = []
+        for chunk_start in range(0, len(requested), 500):  # Stay below SQLite's variable limit
+            files += db.query(File).filter(
+                File.store_id == store_id,
+                File.id.in_(requested[chunk_start:chunk_start + 500]),
+                File.deleted_at.is_(None),
+            ).all()
+        _mark_deleted(db, store, files)
+        if files:
+            store.bump_version()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Błąd podczas usuwania plików: {str(e)}"
+        )
+
+    deleted = {file.id for file in files}
+    broker = get_event_broker()
+    for file_id in deleted:
+        broker.publish(store_id, store_events.FILE_DELETED, {"file_id": file_id})
+    get_deletion_collector().wake()
+    return BulkDeleteResponse(
+        deleted=[file_id for file_id in requested if file_id in deleted],
+        not_found=[file_id for file_id in requested if file_id not in deleted],
+    )
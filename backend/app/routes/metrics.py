@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+
+from app.core.metrics import metrics
+from app.schemas import MetricsResponse
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/", response_model=MetricsResponse)
+async def get_metrics():
+    """
+    Snapshot of in-process metrics (ingestion, and other subsystems).
+    """
+    return metrics.snapshot()
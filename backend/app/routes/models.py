@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.schemas import ModelListResponse, ErrorResponse
+from app.services.model_catalog import get_model_catalog
+
+router = APIRouter(prefix="/models", tags=["models"])
+
+
+@router.get(
+    "/",
+    response_model=ModelListResponse,
+    responses={
+        503: {"model": ErrorResponse, "description": "Model catalog unavailable"},
+    }
+)
+async def list_models(file_search_only: bool = False):
+    """
+    List Gemini models from the cached catalog.
+    
+    The catalog is refreshed in the background; only the very first call
+    after startup may wait for Google.
+    """
+    catalog = get_model_catalog()
+    try:
+        models = await run_in_threadpool(catalog.list_models)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Lista modeli jest niedostępna: {str(e)}"
+        )
+
+    if file_search_only:
+        models = [m for m in models if m.supports_file_search]
+
+    return ModelListResponse(
+        models=models,
+        total=len(models),
+        refreshed_at=catalog.refreshed_at
+    )
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+import time
+
+from app.core.metrics import metrics
+from app.database import get_db
+from app.models import File, Store
+from app.schemas import ErrorResponse, FileResponse, SearchHit, SearchResponse
+from app.services import search_index
+
+router = APIRouter(prefix="/stores/{store_id}/search", tags=["search"])
+
+
+@router.get(
+    "/",
+    response_model=SearchResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+        422: {"model": ErrorResponse, "description": "Query without searchable words"},
+        503: {"model": ErrorResponse, "description": "Full-text index not available"},
+    }
+)
+async def search_store(
+    store_id: int,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Search file names and content of a Store in the local full-text index.
+    
+    Every word of the query must match (as a word prefix, case and
+    diacritics insensitive); names weigh more than content. No Google call
+    is made, so results come back in milliseconds, including for files that
+    are still importing.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+
+    started = time.perf_counter()
+    try:
+        hits, total = search_index.search(db, store_id, q, limit=limit, offset=offset)
+    except search_index.SearchIndexUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Wyszukiwanie pełnotekstowe jest niedostępne (SQLite bez FTS5)"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    files = {
+        file.id: file
+        for file in db.query(File).filter(File.id.in_([hit.file_id for hit in hits])).all()
+    } if hits else {}
+    took = time.perf_counter() - started
+    metrics.observe("search_seconds", took)
+
+    return SearchResponse(
+        query=q,
+        hits=[
+            SearchHit(file=FileResponse.model_validate(files[hit.file_id]), snippet=hit.snippet, score=hit.score)
+            for hit in hits
+            if hit.file_id in files
+        ],
+        total=total,
+        took_ms=round(took * 1000, 3),
+    )
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List
 
+from app.core.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from app.core.responses import JSONResponseClass
 from app.database import get_db
 from app.models import Store
-from app.schemas import StoreCreate, StoreResponse, StoreListResponse, ErrorResponse
+from app.schemas import StoreCreate, StoreResponse, StoreListResponse, StoreChatConfig, ErrorResponse
 from app.services.google_file_search_service import get_google_file_search_service
+from app.services import search_index
+from app.services.store_events import get_event_broker
 
 router = APIRouter(prefix="/stores", tags=["stores"])
 
@@ -69,16 +74,31 @@ async def create_store(
 @router.get(
     "/",
     response_model=StoreListResponse,
+    response_class=JSONResponseClass,
     responses={
         200: {"model": StoreListResponse, "description": "List of all stores"},
+        304: {"description": "List unchanged since the ETag in If-None-Match"},
     }
 )
-async def list_stores(db: Session = Depends(get_db)):
+async def list_stores(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Get list of all Stores.
     
-    Returns all available stores in the system.
+    Returns all available stores in the system. Supports conditional GET:
+    the ETag is derived from a single aggregate query, so an unchanged list
+    is answered with 304 without loading any rows.
     """
+    count, max_id, max_updated, version_sum = db.query(
+        func.count(Store.id),
+        func.max(Store.id),
+        func.max(Store.updated_at),
+        func.coalesce(func.sum(Store.version), 0)
+    ).one()
+    etag = make_etag("stores", count, max_id, max_updated, version_sum)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+    
     stores = db.query(Store).order_by(Store.created_at.desc()).all()
     
     return StoreListResponse(
@@ -109,6 +129,56 @@ async def get_store(store_id: int, db: Session = Depends(get_db)):
     return store
 
 
+@router.get(
+    "/{store_id}/config",
+    response_model=StoreChatConfig,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+    }
+)
+async def get_store_config(store_id: int, db: Session = Depends(get_db)):
+    """
+    Get the chat configuration of a Store.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+    return StoreChatConfig.from_store(store)
+
+
+@router.put(
+    "/{store_id}/config",
+    response_model=StoreChatConfig,
+    responses={
+        404: {"model": ErrorResponse, "description": "Store not found"},
+    }
+)
+async def update_store_config(store_id: int, config: StoreChatConfig, db: Session = Depends(get_db)):
+    """
+    Replace the chat configuration of a Store.
+    
+    The system instruction, generation parameters (max_output_tokens,
+    temperature, thinking_budget) and safety settings apply to every chat
+    with the Store. A long system instruction is cached on Google's side;
+    the previous cache of the Store is deleted here.
+    """
+    store = db.query(Store).filter(Store.id == store_id).first()
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store o ID {store_id} nie został znaleziony"
+        )
+
+    config.apply_to(store)
+    db.commit()
+    db.refresh(store)
+    await get_google_file_search_service().invalidate_context_cache(store.google_store_name)
+    return StoreChatConfig.from_store(store)
+
+
 @router.delete(
     "/{store_id}",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -138,7 +208,10 @@ async def delete_store(store_id: int, db: Session = Depends(get_db)):
         
         # Then delete from local DB
         db.delete(store)
+        search_index.remove_store(db, store_id)
         db.commit()
+        get_event_broker().forget_store(store_id)
+        await google_service.invalidate_context_cache(store.google_store_name)
     
     except Exception as e:
         db.rollback()
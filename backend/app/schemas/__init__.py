@@ -3,12 +3,39 @@ from .store_schemas import (
     StoreCreate,
     StoreResponse,
     StoreListResponse,
+    SafetySetting,
+    StoreChatConfig,
     ErrorResponse
 )
 from .files import (
     FileCreate,
     FileResponse,
-    FileListResponse
+    FileListResponse,
+    ArchiveEntryResult,
+    ArchiveUploadResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse,
+    StatusRefreshResponse,
+    DeletionLeftover,
+    DeletionLeftoverListResponse
+)
+from .model_schemas import (
+    ModelResponse,
+    ModelListResponse
+)
+from .metrics_schemas import (
+    MetricSample,
+    HistogramSample,
+    MetricsResponse
+)
+from .admin_schemas import (
+    MetadataImportResponse,
+    ProfileInfo,
+    ProfileListResponse
+)
+from .search_schemas import (
+    SearchHit,
+    SearchResponse
 )
 
 __all__ = [
@@ -16,8 +43,27 @@ __all__ = [
     "StoreCreate",
     "StoreResponse",
     "StoreListResponse",
+    "SafetySetting",
+    "StoreChatConfig",
     "ErrorResponse",
     "FileCreate",
     "FileResponse",
-    "FileListResponse"
+    "FileListResponse",
+    "ArchiveEntryResult",
+    "ArchiveUploadResponse",
+    "BulkDeleteRequest",
+    "BulkDeleteResponse",
+    "StatusRefreshResponse",
+    "DeletionLeftover",
+    "DeletionLeftoverListResponse",
+    "ModelResponse",
+    "ModelListResponse",
+    "MetricSample",
+    "HistogramSample",
+    "MetricsResponse",
+    "MetadataImportResponse",
+    "ProfileInfo",
+    "ProfileListResponse",
+    "SearchHit",
+    "SearchResponse"
 ]
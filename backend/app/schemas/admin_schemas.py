@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class MetadataImportResponse(BaseModel):
+    """Summary of a metadata import"""
+    stores_created: int
+    stores_updated: int
+    files_created: int
+    files_updated: int
+    skipped: int
+    errors: List[str]  # First problems found (skipped records)
+
+
+class ProfileInfo(BaseModel):
+    """Description of a saved request profile"""
+    id: str
+    method: str
+    path: str
+    route: Optional[str] = None  # Route template, e.g. /chat/
+    status: Optional[int] = None  # None when the request failed before responding
+    trigger: str  # header or sampled
+    profiler: str  # pyinstrument or sampler
+    started_at: str
+    duration_ms: Optional[float] = None
+    samples: Optional[int] = None
+    trace_id: Optional[str] = None
+    formats: List[str]  # Available through GET /admin/profiles/{id}?format=
+
+
+class ProfileListResponse(BaseModel):
+    """Saved request profiles, newest first"""
+    profiles: List[ProfileInfo]
+    total: int
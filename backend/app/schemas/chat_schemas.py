@@ -4,8 +4,10 @@ from typing import Optional, List
 class ChatRequest(BaseModel):
     store_id: int
     message: str
-    model: Optional[str] = "gemini-2.5-flash"
+    model: Optional[str] = "gemini-2.5-flash"  # "auto" lets the server pick the model
 
 class ChatResponse(BaseModel):
     response: str
     citations: Optional[List[str]] = []
+    model: Optional[str] = None  # Model that generated the response
+    routing_reason: Optional[str] = None  # Why the model was chosen (model="auto" only)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class FileBase(BaseModel):
     display_name: str
@@ -14,6 +14,9 @@ class FileResponse(FileBase):
     document_id: str
     upload_date: datetime
     status: str
+    size_bytes: Optional[int] = None
+    uploaded_bytes: Optional[int] = None
+    content_sha256: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -21,3 +24,49 @@ class FileResponse(FileBase):
 class FileListResponse(BaseModel):
     files: List[FileResponse]
     total: int
+
+class ArchiveEntryResult(BaseModel):
+    name: str  # Path of the entry inside the archive
+    status: str  # uploaded, skipped, rejected, failed
+    size_bytes: Optional[int] = None
+    detail: Optional[str] = None
+    file: Optional[FileResponse] = None
+
+class ArchiveUploadResponse(BaseModel):
+    entries: List[ArchiveEntryResult]
+    uploaded: int
+    skipped: int
+    failed: int  # Rejected by pre-flight or failed to upload
+    truncated: bool = False  # Entry limit reached or archive damaged; remaining entries were not read
+    error: Optional[str] = None
+
+class BulkDeleteRequest(BaseModel):
+    file_ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]  # Hidden now, removed from Google in the background
+    not_found: List[int]
+
+class StatusRefreshResponse(BaseModel):
+    checked: int  # Rows compared with the Google listing
+    updated: int
+    api_calls: int  # List pages plus operation gets
+    listing_complete: bool  # False when the listing stopped once all pending rows were found
+    statuses: Dict[str, int]  # New status -> number of files moved to it
+
+class DeletionLeftover(BaseModel):
+    """File whose Google document could not be deleted"""
+    id: int
+    store_id: int
+    document_id: str
+    display_name: str
+    deleted_at: Optional[datetime] = None
+    delete_attempts: int
+    delete_error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class DeletionLeftoverListResponse(BaseModel):
+    files: List[DeletionLeftover]
+    total: int
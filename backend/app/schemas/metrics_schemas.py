@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class MetricSample(BaseModel):
+    """Counter or gauge value"""
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class HistogramSample(BaseModel):
+    """Histogram summary (percentiles over the most recent observations)"""
+    name: str
+    labels: Dict[str, str]
+    count: int
+    sum: float
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p50: float
+    p95: float
+    p99: float
+
+
+class MetricsResponse(BaseModel):
+    """Snapshot of the in-process metrics registry"""
+    counters: List[MetricSample]
+    gauges: List[MetricSample]
+    histograms: List[HistogramSample]
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class ModelResponse(BaseModel):
+    """Schema for a single catalog model"""
+    name: str
+    display_name: str
+    description: str
+    supported_actions: List[str]
+    input_token_limit: Optional[int] = None
+    output_token_limit: Optional[int] = None
+    supports_generate_content: bool
+    supports_file_search: bool
+
+    model_config = {"from_attributes": True}
+
+
+class ModelListResponse(BaseModel):
+    """Schema for the model catalog"""
+    models: List[ModelResponse]
+    total: int
+    refreshed_at: Optional[datetime] = None
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List
+
+from .files import FileResponse
+
+
+class SearchHit(BaseModel):
+    """Document matching a search query"""
+    file: FileResponse
+    snippet: str  # Matching fragment of the content, terms wrapped in <mark>
+    score: float  # BM25 relevance, higher is better
+
+
+class SearchResponse(BaseModel):
+    """Ranked results of a local full-text search in a Store"""
+    query: str
+    hits: List[SearchHit]
+    total: int
+    took_ms: float
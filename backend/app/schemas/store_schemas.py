@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
+import json
 import re
 
 
@@ -37,6 +38,9 @@ class StoreResponse(StoreBase):
     google_store_name: str  # Google FileSearchStore resource name
     created_at: datetime
     updated_at: datetime
+    file_count: int = 0  # Files in the store (deleted ones excluded)
+    total_bytes: int = 0  # Sum of the files' original sizes
+    last_upload_at: Optional[datetime] = None
     
     model_config = {"from_attributes": True}
 
@@ -47,6 +51,49 @@ class StoreListResponse(BaseModel):
     total: int
 
 
+class SafetySetting(BaseModel):
+    """Blocking threshold for one harm category"""
+    category: str = Field(..., pattern=r"^HARM_CATEGORY_[A-Z_]+$", description="e.g. HARM_CATEGORY_HARASSMENT")
+    threshold: Literal[
+        "BLOCK_LOW_AND_ABOVE", "BLOCK_MEDIUM_AND_ABOVE", "BLOCK_ONLY_HIGH", "BLOCK_NONE", "OFF"
+    ]
+
+
+class StoreChatConfig(BaseModel):
+    """Chat configuration of a Store, applied to every chat request"""
+    system_instruction: Optional[str] = Field(None, max_length=200_000)
+    max_output_tokens: Optional[int] = Field(None, ge=1)
+    temperature: Optional[float] = Field(None, ge=0.0, le=2.0)
+    thinking_budget: Optional[int] = Field(None, ge=-1, description="-1 = dynamic, 0 = off")
+    safety_settings: List[SafetySetting] = []
+
+    @classmethod
+    def from_store(cls, store) -> "StoreChatConfig":
+        """Read the configuration stored on a Store row"""
+        generation = json.loads(store.generation_config) if store.generation_config else {}
+        safety = json.loads(store.safety_settings) if store.safety_settings else []
+        return cls(system_instruction=store.system_instruction, safety_settings=safety, **generation)
+
+    def apply_to(self, store) -> None:
+        """Write the configuration to a Store row"""
+        generation = self.generation_params()
+        store.system_instruction = self.system_instruction or None
+        store.generation_config = json.dumps(generation) if generation else None
+        store.safety_settings = json.dumps([s.model_dump() for s in self.safety_settings]) if self.safety_settings else None
+
+    def generation_params(self) -> dict:
+        """Generation parameters that are set"""
+        return {
+            key: value
+            for key, value in (
+                ("max_output_tokens", self.max_output_tokens),
+                ("temperature", self.temperature),
+                ("thinking_budget", self.thinking_budget),
+            )
+            if value is not None
+        }
+
+
 class ErrorResponse(BaseModel):
     """Schema for error responses"""
     detail: str
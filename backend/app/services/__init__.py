@@ -1,3 +1,10 @@
 from .google_file_search_service import get_google_file_search_service, GoogleFileSearchService
+from .model_catalog import get_model_catalog, ModelCatalog, ModelNotAvailableError
 
-__all__ = ["get_google_file_search_service", "GoogleFileSearchService"]
+__all__ = [
+    "get_google_file_search_service",
+    "GoogleFileSearchService",
+    "get_model_catalog",
+    "ModelCatalog",
+    "ModelNotAvailableError",
+]
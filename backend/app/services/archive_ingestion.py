@@ -0,0 +1,149 @@
+"""
+Reading zip and tar archives for bulk ingestion.
+
+Entries are read one at a time straight from the uploaded archive; nothing
+is unpacked to disk except the entry currently being validated, which is
+spooled to its own temporary file (through the regular upload pre-flight)
+before it is handed to the upload pipeline.
+
+Tar archives (optionally gzip/bz2/xz compressed) are read in stream mode,
+so entries must be consumed in order. Zip archives need random access to
+their central directory and are read from the spooled upload.
+"""
+import fnmatch
+import os
+import stat
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import IO, Iterable, Iterator, Optional
+
+from fastapi import status
+
+from app.services.upload_preflight import PreflightError, PreflightResult, UploadPreflight
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Metadata that archivers add and that is never worth ingesting
+DEFAULT_EXCLUDES = ("__MACOSX/*", ".*", "*/.*")
+
+# Errors raised while reading a damaged or truncated archive
+ARCHIVE_READ_ERRORS = (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError, OSError)
+
+
+@dataclass
+class ArchiveEntry:
+    """One member of an archive"""
+    name: str
+    size: Optional[int]
+    stream: Optional[IO[bytes]] = None  # Only valid until the next entry is read
+    skip_reason: Optional[str] = None  # Set for members that cannot be ingested
+
+
+def is_archive_name(filename: Optional[str]) -> bool:
+    """Check whether a filename has one of the supported archive suffixes"""
+    return bool(filename) and filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _normalize_name(name: str) -> str:
+    """Strip leading "./" and "/" so filters and display names are relative"""
+    return str(PurePosixPath("/", name).relative_to("/"))
+
+
+def matches_filters(name: str, include: Optional[Iterable[str]], exclude: Optional[Iterable[str]]) -> bool:
+    """
+    Apply include/exclude globs to an entry path.
+
+    Patterns use fnmatch syntax and are matched against the full relative
+    path ("*" also matches "/"). An entry must match at least one include
+    pattern (when given) and none of the exclude patterns.
+    """
+    if include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in include):
+        return False
+    return not any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude or ())
+
+
+def _iter_zip(archive: zipfile.ZipFile) -> Iterator[ArchiveEntry]:
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            name = _normalize_name(info.filename)
+            if stat.S_ISLNK(info.external_attr >> 16):
+                yield ArchiveEntry(name, info.file_size, skip_reason="Nie jest zwykłym plikiem")
+            elif info.flag_bits & 0x1:
+                yield ArchiveEntry(name, info.file_size, skip_reason="Plik jest zaszyfrowany (chroniony hasłem)")
+            else:
+                with archive.open(info) as stream:
+                    yield ArchiveEntry(name, info.file_size, stream)
+
+
+def _iter_tar(archive: tarfile.TarFile) -> Iterator[ArchiveEntry]:
+    with archive:
+        for member in archive:
+            if member.isdir():
+                continue
+            name = _normalize_name(member.name)
+            if not member.isfile():
+                yield ArchiveEntry(name, None, skip_reason="Nie jest zwykłym plikiem")
+            else:
+                yield ArchiveEntry(name, member.size, archive.extractfile(member))
+
+
+def open_archive(fileobj: IO[bytes], filename: Optional[str]) -> Iterator[ArchiveEntry]:
+    """
+    Open an uploaded archive and return an iterator over its file entries.
+
+    Args:
+        fileobj: Seekable file object positioned anywhere (the spooled upload)
+        filename: Name of the uploaded archive
+
+    Returns:
+        Iterator of ArchiveEntry; each entry's stream must be read before
+        advancing the iterator
+
+    Raises:
+        PreflightError: If the upload is not a readable zip or tar archive
+    """
+    if not is_archive_name(filename):
+        raise PreflightError(
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            f"Nieobsługiwany format archiwum (obsługiwane: {', '.join(ARCHIVE_SUFFIXES)})"
+        )
+
+    fileobj.seek(0)
+    try:
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            return _iter_zip(zipfile.ZipFile(fileobj))
+        fileobj.seek(0)
+        return _iter_tar(tarfile.open(fileobj=fileobj, mode="r|*"))
+    except ARCHIVE_READ_ERRORS:
+        raise PreflightError(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            "Archiwum jest uszkodzone lub ma nieobsługiwany format"
+        )
+
+
+def spool_entry(entry: ArchiveEntry, preflight: UploadPreflight, chunk_size: int) -> tuple[str, PreflightResult]:
+    """
+    Copy an entry to a temporary file, validating each chunk on the way.
+
+    Blocking; run it in a worker thread. The temporary file is removed if
+    validation or reading fails.
+    """
+    suffix = PurePosixPath(entry.name).suffix
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp_path = tmp.name
+        try:
+            while chunk := entry.stream.read(chunk_size):
+                preflight.feed(chunk)
+                tmp.write(chunk)
+            return tmp_path, preflight.finish()
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp_path)
+            raise
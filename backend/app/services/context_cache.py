@@ -0,0 +1,154 @@
+"""
+Per-Store cached context for chat generations.
+
+A Store's system instruction and File Search tool are the same static
+prefix on every chat. When the instruction is long enough for the API's
+explicit caching, it is stored once as a CachedContent and later
+generations reference the cache instead of resending (and paying for) the
+prefix:
+
+- caches are keyed by Store, model and instruction hash, so a changed
+  configuration simply gets a new cache,
+- a cache is created on first use, its TTL is extended when it is about to
+  expire, and caches of a Store are deleted when its configuration changes
+  or the Store is removed,
+- if a cache cannot be created (e.g. the prefix is below the API minimum),
+  the instruction is sent inline and creation is not retried for a while.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    name: str
+    google_store_name: str
+    expires_at: float  # time.monotonic()
+
+
+class ContextCacheManager:
+    """
+    Creates, refreshes and expires CachedContent handles.
+
+    Args:
+        caches: The SDK's async caches API (``client.aio.caches``)
+        ttl_seconds: TTL of created caches; refreshed caches get it again
+        refresh_margin: Extend a cache's TTL when less than this remains
+        min_chars: Instructions shorter than this are always sent inline
+        failure_backoff: Seconds before retrying a cache that failed to be created
+    """
+
+    def __init__(self, caches, ttl_seconds: float, refresh_margin: float, min_chars: int, failure_backoff: float = 600.0):
+        self.caches = caches
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.min_chars = min_chars
+        self.failure_backoff = failure_backoff
+        self._entries: dict[tuple, _CacheEntry] = {}
+        self._failed_until: dict[tuple, float] = {}
+        self._locks: dict[tuple, asyncio.Lock] = {}
+
+    @classmethod
+    def from_settings(cls, caches, settings) -> "ContextCacheManager":
+        return cls(
+            caches,
+            ttl_seconds=settings.context_cache_ttl_seconds,
+            refresh_margin=settings.context_cache_refresh_margin_seconds,
+            min_chars=settings.context_cache_min_chars,
+        )
+
+    @staticmethod
+    def _key(google_store_name: str, model_name: str, system_instruction: str) -> tuple:
+        digest = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        return (google_store_name, model_name, digest)
+
+    def _ttl(self) -> str:
+        return f"{int(self.ttl_seconds)}s"
+
+    async def get(self, google_store_name: str, model_name: str, system_instruction: str, tools: list) -> Optional[str]:
+        """
+        Get the name of a live cache holding the instruction and tools.
+
+        Returns:
+            Optional[str]: CachedContent name, or None to send the prefix inline
+        """
+        from google.genai import types
+
+        if len(system_instruction) < self.min_chars:
+            return None
+        key = self._key(google_store_name, model_name, system_instruction)
+        now = time.monotonic()
+        if self._failed_until.get(key, 0.0) > now:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at - now > self.refresh_margin:
+            metrics.inc("context_cache_total", labels={"result": "hit"})
+            return entry.name
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry.expires_at - now > self.refresh_margin:
+                metrics.inc("context_cache_total", labels={"result": "hit"})
+                return entry.name
+
+            if entry is not None and entry.expires_at > now:
+                try:
+                    await self.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(ttl=self._ttl()))
+                    entry.expires_at = time.monotonic() + self.ttl_seconds
+                    metrics.inc("context_cache_total", labels={"result": "refreshed"})
+                    return entry.name
+                except Exception as e:
+                    logger.info(f"Could not refresh context cache {entry.name}, creating a new one: {e}")
+            self._entries.pop(key, None)
+
+            try:
+                cached = await self.caches.create(
+                    model=model_name,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"{google_store_name.split('/')[-1]}-{key[2][:12]}",
+                        system_instruction=system_instruction,
+                        tools=tools,
+                        ttl=self._ttl(),
+                    ),
+                )
+            except Exception as e:
+                self._failed_until[key] = time.monotonic() + self.failure_backoff
+                metrics.inc("context_cache_total", labels={"result": "create_failed"})
+                logger.warning(f"Context cache not created for {google_store_name} ({model_name}), sending the instruction inline: {e}")
+                return None
+            self._entries[key] = _CacheEntry(cached.name, google_store_name, time.monotonic() + self.ttl_seconds)
+            metrics.inc("context_cache_total", labels={"result": "created"})
+            logger.info(f"Created context cache {cached.name} for {google_store_name} ({model_name})")
+            return cached.name
+
+    def discard(self, name: str) -> None:
+        """Forget a cache that the API no longer knows (e.g. expired early)"""
+        for key, entry in list(self._entries.items()):
+            if entry.name == name:
+                del self._entries[key]
+
+    async def invalidate_store(self, google_store_name: str) -> None:
+        """Delete all caches of a Store (best effort)"""
+        for key, entry in list(self._entries.items()):
+            if entry.google_store_name != google_store_name:
+                continue
+            del self._entries[key]
+            try:
+                await self.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.info(f"Could not delete context cache {entry.name}: {e}")
+        for key in [k for k in self._failed_until if k[0] == google_store_name]:
+            del self._failed_until[key]
+        for key in [k for k in self._locks if k[0] == google_store_name]:
+            del self._locks[key]
@@ -0,0 +1,211 @@
+"""
+Background garbage collector of deleted files.
+
+Deleting a file only marks its row (deleted_at, status DELETING) and hides
+it from listings, search and chat; the request returns immediately. This
+collector removes the documents from Google in batches:
+
+- up to GC_CONCURRENCY deletions run in parallel, at most GC_RATE_PER_SECOND
+  are started, and each takes a bulk-priority upstream scheduler slot so
+  chat and uploads keep precedence,
+- a document Google no longer has counts as deleted,
+- failures are retried with exponential backoff; after GC_MAX_ATTEMPTS the
+  row is kept as DELETE_FAILED with its last error, for reconciliation
+  (GET /admin/deletions).
+
+The row is removed only after Google confirmed the deletion, so the
+database never forgets a document that still exists remotely.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import traced
+from app.database import SessionLocal
+from app.models import File
+from app.services.google_file_search_service import get_google_file_search_service
+from app.services.upstream_scheduler import Priority, SchedulerQueueFull, get_upstream_scheduler
+
+logger = logging.getLogger(__name__)
+
+DELETING = "DELETING"
+DELETE_FAILED = "DELETE_FAILED"
+
+
+def _is_not_found(error: Optional[BaseException]) -> bool:
+    """Whether the error, or the SDK error it wraps, is Google's 404 NOT_FOUND"""
+    while error is not None:
+        # google.genai.errors.APIError (and the fake client's error) carry code and status
+        if getattr(error, "code", None) == 404 or getattr(error, "status", None) == "NOT_FOUND":
+            return True
+        error = error.__cause__
+    return False
+
+
+class _RateLimiter:
+    """Spaces out starts to at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class DeletionCollector:
+    """Drains soft-deleted files, deleting their Google documents"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        concurrency: int,
+        rate_per_second: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        interval_seconds: float,
+    ):
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.rate_per_second = rate_per_second
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.interval_seconds = interval_seconds
+        self._wake: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "DeletionCollector":
+        return cls(
+            batch_size=settings.gc_batch_size,
+            concurrency=settings.gc_concurrency,
+            rate_per_second=settings.gc_rate_per_second,
+            max_attempts=settings.gc_max_attempts,
+            retry_base_seconds=settings.gc_retry_base_seconds,
+            interval_seconds=settings.gc_interval_seconds,
+        )
+
+    def wake(self) -> None:
+        """Start a drain now instead of at the next interval (called after deletes)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def _claim_batch(self) -> list[tuple[int, int, str]]:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            rows = (
+                db.query(File.id, File.store_id, File.document_id)
+                .filter(
+                    File.status == DELETING,
+                    or_(File.delete_next_attempt_at.is_(None), File.delete_next_attempt_at <= now),
+                )
+                .order_by(File.deleted_at)
+                .limit(self.batch_size)
+                .all()
+            )
+            return [tuple(row) for row in rows]
+
+    def _record(self, deleted: list[int], failed: dict[int, str]) -> None:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            if deleted:
+                db.query(File).filter(File.id.in_(deleted)).delete(synchronize_session=False)
+            for file in db.query(File).filter(File.id.in_(list(failed))):
+                file.delete_attempts += 1
+                file.delete_error = failed[file.id][:2000]
+                if file.delete_attempts >= self.max_attempts:
+                    file.status = DELETE_FAILED
+                    logger.error(f"Giving up deleting {file.document_id} after {file.delete_attempts} attempts: {file.delete_error}")
+                else:
+                    backoff = self.retry_base_seconds * 2 ** (file.delete_attempts - 1)
+                    file.delete_next_attempt_at = now + timedelta(seconds=backoff)
+            db.commit()
+            pending, leftovers = db.query(
+                func.count(File.id).filter(File.status == DELETING),
+                func.count(File.id).filter(File.status == DELETE_FAILED),
+            ).one()
+        metrics.set_gauge("gc_pending_deletions", pending)
+        metrics.set_gauge("gc_failed_deletions", leftovers)
+
+    @traced("gc.drain")
+    async def drain_once(self) -> int:
+        """
+        Delete one batch of pending documents.
+
+        Returns:
+            int: Number of rows deleted or failed (0 when nothing was due)
+        """
+        batch = await run_in_threadpool(self._claim_batch)
+        if not batch:
+            return 0
+
+        service = get_google_file_search_service()
+        scheduler = get_upstream_scheduler()
+        limiter = _RateLimiter(self.rate_per_second)
+        slots = asyncio.Semaphore(self.concurrency)
+        deleted: list[int] = []
+        failed: dict[int, str] = {}
+
+        async def delete(file_id: int, store_id: int, document_id: str) -> None:
+            async with slots:
+                await limiter.wait()
+                try:
+                    async with scheduler.slot(Priority.BULK, store_id):
+                        await run_in_threadpool(service.delete_file, document_id)
+                    deleted.append(file_id)
+                except SchedulerQueueFull:
+                    pass  # Upstream busy: stays pending for the next pass, not an attempt
+                except Exception as e:
+                    if _is_not_found(e):
+                        deleted.append(file_id)  # Already gone remotely
+                    else:
+                        failed[file_id] = str(e)
+
+        await asyncio.gather(*(delete(*row) for row in batch))
+        await run_in_threadpool(self._record, deleted, failed)
+        metrics.inc("gc_deleted_total", len(deleted))
+        if failed:
+            metrics.inc("gc_failures_total", len(failed))
+            logger.warning(f"Deletion GC: {len(failed)} of {len(batch)} documents failed, will retry")
+        return len(deleted) + len(failed)
+
+    async def run_loop(self) -> None:
+        """Drain pending deletions for the app lifetime (background task)"""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                while await self.drain_once() >= self.batch_size:
+                    pass  # Full batch: more may be waiting
+            except Exception as e:
+                logger.warning(f"Deletion GC pass failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+# Singleton instance
+_collector_instance: Optional[DeletionCollector] = None
+
+
+def get_deletion_collector() -> DeletionCollector:
+    """Get singleton instance of DeletionCollector"""
+    global _collector_instance
+    if _collector_instance is None:
+        _collector_instance = DeletionCollector.from_settings(get_settings())
+    return _collector_instance
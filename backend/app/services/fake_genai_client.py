@@ -0,0 +1,626 @@
+"""
+Offline stand-in for ``google.genai.Client``.
+
+Implements the subset of the SDK surface used by ``GoogleFileSearchService``
+(``file_search_stores.*``, ``files.*``, ``operations.get``,
+``models.generate_content`` / ``generate_content_stream`` / ``list``,
+``caches.*`` and ``aio.models.generate_content`` / ``aio.caches.*``)
+entirely in memory, with configurable
+latency, error rate and streaming behaviour.
+It lets the backend run and be load-tested without an API key or quota.
+
+Enable it with ``GENAI_BACKEND=fake``.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Chunk size of the SDK's resumable upload
+
+
+class FakeGenaiError(Exception):
+    """Error raised by the fake client (mirrors ``google.genai.errors.APIError``)"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class FakeGenaiConfig:
+    """Behaviour knobs of the fake client"""
+    latency_ms: float = 20.0  # Base latency of every call
+    jitter_ms: float = 10.0  # Uniform jitter added on top of the base latency
+    generate_latency_ms: float = 400.0  # Base latency of generate_content
+    tail_probability: float = 0.0  # Probability that a call stalls
+    tail_multiplier: float = 10.0  # Latency multiplier of a stalled call
+    error_rate: float = 0.0  # Probability that a call fails with 503
+    stream_chunks: int = 8  # Number of chunks yielded by generate_content_stream
+    operation_polls: int = 0  # operations.get calls before an upload is done
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "FakeGenaiConfig":
+        """Build configuration from the fake_genai_* fields of Settings"""
+        return cls(
+            latency_ms=settings.fake_genai_latency_ms,
+            jitter_ms=settings.fake_genai_jitter_ms,
+            generate_latency_ms=settings.fake_genai_generate_latency_ms,
+            tail_probability=settings.fake_genai_tail_probability,
+            tail_multiplier=settings.fake_genai_tail_multiplier,
+            error_rate=settings.fake_genai_error_rate,
+            stream_chunks=settings.fake_genai_stream_chunks,
+            operation_polls=settings.fake_genai_operation_polls,
+            seed=settings.fake_genai_seed,
+        )
+
+
+# --- SDK-shaped response objects ---
+
+@dataclass
+class FakeState:
+    name: str
+
+
+@dataclass
+class FakeFile:
+    name: str
+    display_name: str
+    size_bytes: int
+    state: FakeState = field(default_factory=lambda: FakeState("ACTIVE"))
+    error: Optional[object] = None
+
+
+@dataclass
+class FakeDocument:
+    name: str
+    display_name: str
+    size_bytes: int
+    mime_type: str = "text/plain"
+    state: str = "STATE_ACTIVE"
+    create_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    update_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+@dataclass
+class FakeFileSearchStore:
+    name: str
+    display_name: str
+    create_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    documents: dict = field(default_factory=dict)
+
+
+@dataclass
+class FakeUploadResponse:
+    parent: str
+    document_name: str
+
+
+@dataclass
+class FakeOperation:
+    name: str
+    done: bool
+    response: Optional[FakeUploadResponse] = None
+    error: Optional[dict] = None
+    metadata: Optional[dict] = None
+
+
+@dataclass
+class FakeUsageMetadata:
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+    cached_content_token_count: int = 0
+
+
+@dataclass
+class FakeCachedContent:
+    name: str
+    model: str
+    display_name: str
+    expire_time: datetime
+    system_instruction: str = ""
+    tools: list = field(default_factory=list)
+    usage_metadata: Optional[FakeUsageMetadata] = None
+
+
+@dataclass
+class FakeRetrievedContext:
+    title: str
+    text: str
+
+
+@dataclass
+class FakeGroundingChunk:
+    retrieved_context: FakeRetrievedContext
+    web: Optional[object] = None
+
+
+@dataclass
+class FakeGroundingMetadata:
+    grounding_chunks: list
+    grounding_supports: list = field(default_factory=list)
+
+
+@dataclass
+class FakeCandidate:
+    grounding_metadata: Optional[FakeGroundingMetadata] = None
+    citation_metadata: Optional[object] = None
+
+
+@dataclass
+class FakeGenerateContentResponse:
+    text: str
+    usage_metadata: Optional[FakeUsageMetadata] = None
+    candidates: list = field(default_factory=list)
+
+
+@dataclass
+class FakeModel:
+    name: str
+    display_name: str
+    description: str
+    supported_actions: list
+    input_token_limit: int = 1048576
+    output_token_limit: int = 65536
+
+
+FAKE_MODELS = [
+    FakeModel("models/gemini-2.5-flash", "Gemini 2.5 Flash", "Fast multimodal model", ["generateContent", "countTokens", "createCachedContent"]),
+    FakeModel("models/gemini-2.5-flash-lite", "Gemini 2.5 Flash-Lite", "Lowest latency model", ["generateContent", "countTokens", "createCachedContent"]),
+    FakeModel("models/gemini-2.5-pro", "Gemini 2.5 Pro", "Strongest reasoning model", ["generateContent", "countTokens", "createCachedContent"]),
+    FakeModel("models/gemini-embedding-001", "Gemini Embedding 001", "Text embedding model", ["embedContent"]),
+]
+
+
+class FakePager:
+    """Page-by-page listing (mirrors ``google.genai.pagers.Pager``); every page is one call"""
+
+    def __init__(self, items: list, page_size: int, call):
+        self._items = items
+        self._page_size = max(1, page_size)
+        self._call = call
+        self._offset = 0
+        self.page = items[:self._page_size]
+
+    @property
+    def config(self) -> dict:
+        end = self._offset + self._page_size
+        return {"page_size": self._page_size, "page_token": str(end) if end < len(self._items) else None}
+
+    def next_page(self) -> list:
+        if not self.config["page_token"]:
+            raise IndexError("No more pages to fetch.")
+        self._call()
+        self._offset += self._page_size
+        self.page = self._items[self._offset:self._offset + self._page_size]
+        return self.page
+
+    def __iter__(self) -> Iterator:
+        while True:
+            yield from self.page
+            try:
+                self.next_page()
+            except IndexError:
+                return
+
+
+# --- Client ---
+
+class _FakeBackend:
+    """Shared in-memory state, latency and failure injection"""
+
+    def __init__(self, config: FakeGenaiConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.stores: dict[str, FakeFileSearchStore] = {}
+        self.files: dict[str, FakeFile] = {}
+        self.operations: dict[str, FakeOperation] = {}
+        self.pending_polls: dict[str, int] = {}
+        self.caches: dict[str, FakeCachedContent] = {}
+
+    def _draw(self, base_ms: float) -> tuple[float, bool]:
+        """Pick the latency (seconds) of a call and whether it fails"""
+        with self.lock:
+            delay = base_ms + self.random.uniform(0, self.config.jitter_ms)
+            if self.config.tail_probability and self.random.random() < self.config.tail_probability:
+                delay *= self.config.tail_multiplier
+            fail = self.config.error_rate and self.random.random() < self.config.error_rate
+        return delay / 1000.0, bool(fail)
+
+    def call(self, base_ms: Optional[float] = None) -> None:
+        """Simulate network latency and possibly fail"""
+        delay, fail = self._draw(self.config.latency_ms if base_ms is None else base_ms)
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise FakeGenaiError(503, "UNAVAILABLE: injected failure")
+
+    async def call_async(self, base_ms: Optional[float] = None, timeout_ms: Optional[float] = None) -> None:
+        """Async variant of call(); honours the http_options timeout and is cancellable"""
+        delay, fail = self._draw(self.config.latency_ms if base_ms is None else base_ms)
+        if timeout_ms is not None and delay > timeout_ms / 1000.0:
+            await asyncio.sleep(timeout_ms / 1000.0)
+            raise FakeGenaiError(504, "DEADLINE_EXCEEDED: request timed out")
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if fail:
+            raise FakeGenaiError(503, "UNAVAILABLE: injected failure")
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex[:12]
+
+    def get_store(self, name: str) -> FakeFileSearchStore:
+        store = self.stores.get(name)
+        if store is None:
+            raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+        return store
+
+
+def _config_value(config, key: str, default=None):
+    """Read a key from a dict or object style SDK config"""
+    if config is None:
+        return default
+    if isinstance(config, dict):
+        return config.get(key, default)
+    return getattr(config, key, default)
+
+
+def _file_size(file) -> int:
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    # Consume file objects in chunks, as the SDK's resumable upload does
+    size = 0
+    while chunk := file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+    return size
+
+
+class _FakeDocuments:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def list(self, *, parent: str, config=None) -> FakePager:
+        self._backend.call()
+        store = self._backend.get_store(parent)
+        page_size = (config or {}).get("page_size") or 20
+        return FakePager(list(store.documents.values()), page_size, self._backend.call)
+
+    def get(self, *, name: str, config=None) -> FakeDocument:
+        self._backend.call()
+        store = self._backend.get_store(name.split("/documents/")[0])
+        document = store.documents.get(name)
+        if document is None:
+            raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+        return document
+
+    def delete(self, *, name: str, config=None) -> None:
+        self._backend.call()
+        store = self._backend.get_store(name.split("/documents/")[0])
+        if store.documents.pop(name, None) is None:
+            raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+
+
+class _FakeFileSearchStores:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+        self.documents = _FakeDocuments(backend)
+
+    def create(self, *, config=None) -> FakeFileSearchStore:
+        self._backend.call()
+        display_name = _config_value(config, "display_name", "")
+        store = FakeFileSearchStore(
+            name=f"fileSearchStores/{self._backend.new_id()}",
+            display_name=display_name,
+        )
+        with self._backend.lock:
+            self._backend.stores[store.name] = store
+        return store
+
+    def delete(self, *, name: str, config=None) -> None:
+        self._backend.call()
+        store = self._backend.get_store(name)
+        if store.documents and not _config_value(config, "force", False):
+            raise FakeGenaiError(400, "FAILED_PRECONDITION: store is not empty")
+        with self._backend.lock:
+            self._backend.stores.pop(name, None)
+
+    def list(self, *, config=None) -> Iterator[FakeFileSearchStore]:
+        self._backend.call()
+        return iter(list(self._backend.stores.values()))
+
+    def get(self, *, name: str, config=None) -> FakeFileSearchStore:
+        self._backend.call()
+        return self._backend.get_store(name)
+
+    def upload_to_file_search_store(self, *, file_search_store_name: str, file, config=None) -> FakeOperation:
+        self._backend.call()
+        store = self._backend.get_store(file_search_store_name)
+        size = _file_size(file)
+        default_name = os.path.basename(file) if isinstance(file, (str, os.PathLike)) else "document"
+        document = FakeDocument(
+            name=f"{store.name}/documents/{self._backend.new_id()}",
+            display_name=_config_value(config, "display_name") or default_name,
+            size_bytes=size,
+            mime_type=_config_value(config, "mime_type") or "text/plain",
+        )
+        operation = FakeOperation(
+            name=f"{store.name}/upload/operations/{self._backend.new_id()}",
+            done=self._backend.config.operation_polls <= 0,
+        )
+        response = FakeUploadResponse(parent=store.name, document_name=document.name)
+        with self._backend.lock:
+            if operation.done:
+                store.documents[document.name] = document
+                operation.response = response
+            else:
+                document.state = "STATE_PENDING"
+                store.documents[document.name] = document
+                self._backend.operations[operation.name] = operation
+                self._backend.pending_polls[operation.name] = self._backend.config.operation_polls
+                operation.metadata = {"document_name": document.name}
+        return operation
+
+
+class _FakeFiles:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def upload(self, *, file, config=None) -> FakeFile:
+        self._backend.call()
+        default_name = os.path.basename(file) if isinstance(file, (str, os.PathLike)) else "file"
+        uploaded = FakeFile(
+            name=f"files/{self._backend.new_id()}",
+            display_name=_config_value(config, "display_name") or default_name,
+            size_bytes=_file_size(file),
+        )
+        with self._backend.lock:
+            self._backend.files[uploaded.name] = uploaded
+        return uploaded
+
+    def get(self, *, name: str, config=None) -> FakeFile:
+        self._backend.call()
+        uploaded = self._backend.files.get(name)
+        if uploaded is None:
+            raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+        return uploaded
+
+    def delete(self, *, name: str, config=None) -> None:
+        self._backend.call()
+        with self._backend.lock:
+            if self._backend.files.pop(name, None) is None:
+                raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+
+
+class _FakeOperations:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def get(self, operation, *, config=None) -> FakeOperation:
+        self._backend.call()
+        name = operation if isinstance(operation, str) else operation.name
+        with self._backend.lock:
+            current = self._backend.operations.get(name)
+            if current is None:
+                raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+            remaining = self._backend.pending_polls.get(name, 0) - 1
+            self._backend.pending_polls[name] = remaining
+            if remaining <= 0 and not current.done:
+                document_name = current.metadata["document_name"]
+                store = self._backend.stores.get(document_name.split("/documents/")[0])
+                if store is not None and document_name in store.documents:
+                    store.documents[document_name].state = "STATE_ACTIVE"
+                current.done = True
+                current.response = FakeUploadResponse(parent=name.split("/upload/")[0], document_name=document_name)
+                self._backend.pending_polls.pop(name, None)
+            return current
+
+
+# Minimum size of a cached prefix, as enforced by the API for Flash models
+MIN_CACHE_TOKENS = 1024
+
+
+def _ttl_seconds(ttl) -> float:
+    return float(str(ttl).rstrip("s")) if ttl else 3600.0
+
+
+class _FakeCaches:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def _live(self, name: str) -> FakeCachedContent:
+        cached = self._backend.caches.get(name)
+        if cached is None or cached.expire_time <= datetime.now(timezone.utc):
+            self._backend.caches.pop(name, None)
+            raise FakeGenaiError(404, f"NOT_FOUND: CachedContent not found (or expired): {name}")
+        return cached
+
+    def create(self, *, model: str, config=None) -> FakeCachedContent:
+        self._backend.call()
+        system_instruction = str(_config_value(config, "system_instruction", "") or "")
+        tokens = len(system_instruction) // 4
+        if tokens < MIN_CACHE_TOKENS:
+            raise FakeGenaiError(
+                400, f"INVALID_ARGUMENT: Cached content is too small. total_token_count={tokens}, min_total_token_count={MIN_CACHE_TOKENS}"
+            )
+        ttl = _ttl_seconds(_config_value(config, "ttl"))
+        cached = FakeCachedContent(
+            name=f"cachedContents/{self._backend.new_id()}",
+            model=f"models/{model.removeprefix('models/')}",
+            display_name=_config_value(config, "display_name", "") or "",
+            expire_time=datetime.fromtimestamp(time.time() + ttl, timezone.utc),
+            system_instruction=system_instruction,
+            tools=list(_config_value(config, "tools", None) or []),
+            usage_metadata=FakeUsageMetadata(tokens, 0, tokens),
+        )
+        with self._backend.lock:
+            self._backend.caches[cached.name] = cached
+        return cached
+
+    def get(self, *, name: str, config=None) -> FakeCachedContent:
+        self._backend.call()
+        with self._backend.lock:
+            return self._live(name)
+
+    def update(self, *, name: str, config=None) -> FakeCachedContent:
+        self._backend.call()
+        with self._backend.lock:
+            cached = self._live(name)
+            cached.expire_time = datetime.fromtimestamp(
+                time.time() + _ttl_seconds(_config_value(config, "ttl")), timezone.utc
+            )
+            return cached
+
+    def delete(self, *, name: str, config=None) -> None:
+        self._backend.call()
+        with self._backend.lock:
+            if self._backend.caches.pop(name, None) is None:
+                raise FakeGenaiError(404, f"NOT_FOUND: {name}")
+
+    def list(self, *, config=None) -> Iterator[FakeCachedContent]:
+        self._backend.call()
+        return iter(list(self._backend.caches.values()))
+
+
+class _FakeAsyncCaches:
+    """Async counterpart of _FakeCaches (latency is simulated without blocking the loop)"""
+
+    def __init__(self, caches: _FakeCaches):
+        self._caches = caches
+
+    async def create(self, *, model: str, config=None) -> FakeCachedContent:
+        return await asyncio.to_thread(self._caches.create, model=model, config=config)
+
+    async def get(self, *, name: str, config=None) -> FakeCachedContent:
+        return await asyncio.to_thread(self._caches.get, name=name, config=config)
+
+    async def update(self, *, name: str, config=None) -> FakeCachedContent:
+        return await asyncio.to_thread(self._caches.update, name=name, config=config)
+
+    async def delete(self, *, name: str, config=None) -> None:
+        return await asyncio.to_thread(self._caches.delete, name=name, config=config)
+
+
+class _FakeModels:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def _store_names(self, config) -> list:
+        names = []
+        for tool in _config_value(config, "tools", None) or []:
+            file_search = _config_value(tool, "file_search")
+            names.extend(_config_value(file_search, "file_search_store_names", None) or [])
+        return names
+
+    def _build_response(self, model: str, contents, config) -> FakeGenerateContentResponse:
+        if not any(m.name == f"models/{model.removeprefix('models/')}" for m in FAKE_MODELS):
+            raise FakeGenaiError(404, f"NOT_FOUND: models/{model} is not found")
+
+        # With cached content, the system instruction and tools come from the cache
+        store_names = self._store_names(config)
+        cached_tokens = 0
+        cached_content = _config_value(config, "cached_content")
+        if cached_content:
+            if _config_value(config, "system_instruction") or _config_value(config, "tools"):
+                raise FakeGenaiError(
+                    400, "INVALID_ARGUMENT: CachedContent can not be used with system_instruction, tools or tool_config"
+                )
+            with self._backend.lock:
+                cached = _FakeCaches(self._backend)._live(cached_content)
+            if cached.model != f"models/{model.removeprefix('models/')}":
+                raise FakeGenaiError(400, f"INVALID_ARGUMENT: Model {model} does not match the cached content model {cached.model}")
+            store_names = self._store_names({"tools": cached.tools})
+            cached_tokens = cached.usage_metadata.total_token_count
+
+        chunks = []
+        for store_name in store_names:
+            store = self._backend.get_store(store_name)
+            for document in list(store.documents.values())[:3]:
+                chunks.append(FakeGroundingChunk(
+                    retrieved_context=FakeRetrievedContext(
+                        title=document.display_name,
+                        text=f"Fragment dokumentu {document.display_name}",
+                    )
+                ))
+
+        question = contents if isinstance(contents, str) else str(contents)
+        sources = ", ".join(chunk.retrieved_context.title for chunk in chunks) or "brak źródeł"
+        text = f"[{model}] Odpowiedź na pytanie: {question[:200]} (źródła: {sources})"
+        prompt_tokens = max(1, len(question) // 4) + cached_tokens
+        response_tokens = max(1, len(text) // 4)
+        return FakeGenerateContentResponse(
+            text=text,
+            usage_metadata=FakeUsageMetadata(
+                prompt_tokens, response_tokens, prompt_tokens + response_tokens, cached_content_token_count=cached_tokens
+            ),
+            candidates=[FakeCandidate(grounding_metadata=FakeGroundingMetadata(grounding_chunks=chunks))],
+        )
+
+    def generate_content(self, *, model: str, contents, config=None) -> FakeGenerateContentResponse:
+        self._backend.call(self._backend.config.generate_latency_ms)
+        return self._build_response(model, contents, config)
+
+    def generate_content_stream(self, *, model: str, contents, config=None) -> Iterator[FakeGenerateContentResponse]:
+        # Time to first chunk is the base call latency; the rest of the
+        # generation time is spread across the streamed chunks
+        self._backend.call()
+        response = self._build_response(model, contents, config)
+        parts = max(1, self._backend.config.stream_chunks)
+        step = -(-len(response.text) // parts)
+        per_chunk = self._backend.config.generate_latency_ms / parts / 1000.0
+        for start in range(0, len(response.text), step):
+            time.sleep(per_chunk)
+            yield FakeGenerateContentResponse(text=response.text[start:start + step])
+
+    def list(self, *, config=None) -> Iterator[FakeModel]:
+        self._backend.call()
+        return iter(list(FAKE_MODELS))
+
+
+class _FakeAsyncModels:
+    def __init__(self, models: _FakeModels):
+        self._models = models
+        self._backend = models._backend
+
+    async def generate_content(self, *, model: str, contents, config=None) -> FakeGenerateContentResponse:
+        http_options = _config_value(config, "http_options")
+        await self._backend.call_async(
+            self._backend.config.generate_latency_ms,
+            timeout_ms=_config_value(http_options, "timeout"),
+        )
+        return self._models._build_response(model, contents, config)
+
+
+class _FakeAsyncClient:
+    """Counterpart of ``genai.Client.aio`` (the subset used by the service)"""
+
+    def __init__(self, models: _FakeModels, caches: _FakeCaches):
+        self.models = _FakeAsyncModels(models)
+        self.caches = _FakeAsyncCaches(caches)
+
+
+class FakeGenaiClient:
+    """In-memory replacement for ``genai.Client``"""
+
+    def __init__(self, config: Optional[FakeGenaiConfig] = None):
+        self.config = config or FakeGenaiConfig()
+        self._backend = _FakeBackend(self.config)
+        self.file_search_stores = _FakeFileSearchStores(self._backend)
+        self.files = _FakeFiles(self._backend)
+        self.operations = _FakeOperations(self._backend)
+        self.models = _FakeModels(self._backend)
+        self.caches = _FakeCaches(self._backend)
+        self.aio = _FakeAsyncClient(self.models, self.caches)
+
+    @classmethod
+    def from_settings(cls, settings) -> "FakeGenaiClient":
+        """Create a fake client configured from the fake_genai_* settings"""
+        return cls(FakeGenaiConfig.from_settings(settings))
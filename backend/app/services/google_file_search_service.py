@@ -1,30 +1,76 @@
+import asyncio
+import io
 import os
+import threading
 import time
 import re
 import logging
-import json
-from typing import Optional
-from google import genai
-from google.genai import types
-from pathlib import Path
-from dotenv import load_dotenv
+from typing import Callable, Iterator, Optional
 
-# Load .env from project root (searches parent directories)
-env_path = Path(__file__).resolve().parents[3] / '.env'
-load_dotenv(dotenv_path=env_path, override=False)
+from app.core.config import get_settings
+from app.core.deadlines import RequestCancelled
+from app.core.metrics import metrics
+from app.core.tracing import set_attributes, traced, tracer
 
+# NOTE: google.genai is imported lazily (in _create_client / chat_with_store).
+# Its type tree takes hundreds of milliseconds to import, which would
+# otherwise be paid by every process that merely imports the app.
+
+
+def _timeout_ms(seconds: float) -> int:
+    """Convert a time budget to the SDK's http_options timeout (milliseconds)"""
+    return max(1, int(seconds * 1000))
+
+
+class _ProgressFile(io.FileIO):
+    """
+    Read-only file that reports its read position after every read.
+    
+    Reading fails with RequestCancelled once cancel_event is set, which
+    aborts the SDK's chunked upload between chunks.
+    """
+
+    def __init__(self, path: str, on_read: Callable[[int], None], cancel_event: threading.Event):
+        super().__init__(path, "rb")
+        self._on_read = on_read
+        self._cancel_event = cancel_event
+
+    def read(self, size: int = -1) -> bytes:
+        if self._cancel_event.is_set():
+            raise RequestCancelled(f"Upload of {self.name} cancelled")
+        data = super().read(size)
+        if data:
+            self._on_read(self.tell())  # Position, not a running total: retries seek back
+        return data
 
 
 class GoogleFileSearchService:
     """Service for interacting with Google File Search API"""
     
-    def __init__(self):
-        """Initialize Google Genai client"""
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
+    def __init__(self, client=None):
+        """
+        Initialize Google Genai client.
+        
+        Args:
+            client: Optional pre-built client (e.g. FakeGenaiClient). When omitted,
+                the client is selected by GENAI_BACKEND ("google" or "fake").
+        """
+        self.client = client if client is not None else self._create_client()
+        self._context_cache = None
+    
+    @staticmethod
+    def _create_client():
+        """Create the Genai client selected by configuration"""
+        settings = get_settings()
+        if settings.genai_backend == "fake":
+            from app.services.fake_genai_client import FakeGenaiClient
+            return FakeGenaiClient.from_settings(settings)
+        
+        if not settings.google_api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
-        self.client = genai.Client(api_key=api_key)
+        from google import genai
+        return genai.Client(api_key=settings.google_api_key)
     
     def _generate_unique_store_name(self, display_name: str) -> str:
         """
@@ -45,6 +91,7 @@ class GoogleFileSearchService:
         timestamp = int(time.time())
         return f"store_{timestamp}_{sanitized}"
     
+    @traced("google.create_file_search_store")
     def create_file_search_store(self, display_name: str) -> tuple[str, str]:
         """
         Create a FileSearchStore in Google Cloud.
@@ -71,6 +118,7 @@ class GoogleFileSearchService:
         except Exception as e:
             raise Exception(f"Failed to create FileSearchStore: {str(e)}")
     
+    @traced("google.delete_file_search_store", {"store": "google_store_name"})
     def delete_file_search_store(self, google_store_name: str) -> bool:
         """
         Delete a FileSearchStore from Google Cloud.
@@ -94,6 +142,7 @@ class GoogleFileSearchService:
         except Exception as e:
             raise Exception(f"Failed to delete FileSearchStore: {str(e)}")
     
+    @traced("google.list_file_search_stores")
     def list_file_search_stores(self) -> list:
         """
         List all FileSearchStores in Google Cloud.
@@ -110,6 +159,21 @@ class GoogleFileSearchService:
         except Exception as e:
             raise Exception(f"Failed to list FileSearchStores: {str(e)}")
     
+    @traced("google.list_models")
+    def list_models(self) -> list:
+        """
+        List all models available to the API key.
+        
+        Returns:
+            list: List of Model objects
+        """
+        try:
+            return list(self.client.models.list())
+        
+        except Exception as e:
+            raise Exception(f"Failed to list models: {str(e)}")
+    
+    @traced("google.get_file_search_store", {"store": "google_store_name"})
     def get_file_search_store(self, google_store_name: str):
         """
         Get a specific FileSearchStore by name.
@@ -127,208 +191,229 @@ class GoogleFileSearchService:
             # Store not found
             return None
 
-    def upload_to_store(self, file_path: str, google_store_name: str, display_name: str = None) -> dict:
+    @traced("google.upload_to_store", {"store": "google_store_name", "file.name": "display_name"})
+    def upload_to_store(
+        self,
+        file_path: str,
+        google_store_name: str,
+        display_name: str = None,
+        mime_type: Optional[str] = None,
+        on_progress: Optional[Callable[[str, dict], None]] = None,
+        timeout: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
         """
-        Upload a file to a FileSearchStore.
+        Upload a file to a FileSearchStore and wait for Google to import it.
+        
+        The file is streamed to Google directly (no intermediate upload to the
+        Files API). Afterwards the import operation is polled every
+        UPLOAD_OPERATION_POLL_INTERVAL seconds until it is done or
+        UPLOAD_OPERATION_TIMEOUT elapses.
         
         Args:
             file_path: Local path to the file
             google_store_name: The Google resource name of the store
             display_name: Optional display name for the file
+            mime_type: Optional MIME type (sniffed from content) sent instead of guessing from the extension
+            on_progress: Optional callback(kind, data), called from the uploading
+                thread with kind "progress" ({"bytes_sent", "total_bytes"}) and
+                "operation" ({"operation", "done"})
+            timeout: Optional time budget in seconds for the transfer and the
+                wait for the import (sent as the SDK's HTTP timeout)
+            cancel_event: Optional event; once set, the transfer stops at the
+                next chunk and waiting for the import ends
             
         Returns:
-            dict: Metadata of the uploaded file (including name/id)
+            The last state of the upload operation: when ``done`` is True,
+            ``response.document_name`` is the imported document; otherwise the
+            import is still running under ``name``
+            
+        Raises:
+            RequestCancelled: If cancel_event was set during the transfer
+            Exception: If the upload or the import fails
         """
+        settings = get_settings()
+        notify = on_progress or (lambda kind, data: None)
+        cancel_event = cancel_event or threading.Event()
+        started = time.monotonic()
         try:
-            # Upload the file
-            # Note: The SDK might have slightly different method signatures depending on version
-            # We are using google-genai v0.3.0+ as per PRD
-            
-            # First, upload the file to Google GenAI
-            # The client.files.upload method uploads to the general pool
-            uploaded_file = self.client.files.upload(
-                file=file_path,
-                config={'display_name': display_name or os.path.basename(file_path)}
-            )
-            
-            # Wait for processing if needed (usually fast for small files, but good practice)
-            while uploaded_file.state.name == "PROCESSING":
-                time.sleep(1)
-                uploaded_file = self.client.files.get(name=uploaded_file.name)
-                
-            if uploaded_file.state.name == "FAILED":
-                raise Exception(f"File processing failed: {uploaded_file.error.message}")
-
-            # Now, add the file to the FileSearchStore
-            # We need to create a document linking the file to the store?
-            # Or does the SDK allow direct upload to store?
-            # Checking PRD reference: 
-            # operation = client.file_search_stores.upload_to_file_search_store(...)
-            # Let's try to find if there is a direct method or if we need to associate it.
-            
-            # In newer SDKs, it might be separate. However, PRD suggests `upload_to_file_search_store`.
-            # Let's assume the PRD is correct about the intent, but we might need to verify the exact SDK method.
-            # If `upload_to_file_search_store` doesn't exist on `client.file_search_stores`, 
-            # we might need to use `client.files.upload` then add to store.
-            
-            # Let's check if we can just return the uploaded_file for now and handle store association
-            # BUT, the PRD explicitly mentions `upload_to_file_search_store`.
-            # Let's try to use the method as described in PRD or similar.
-            
-            # Actually, looking at recent docs, typically you upload file, then add to store.
-            # OR use a convenience method.
-            # Let's implement a safe approach: Upload then try to add.
-            
-            # WAIT, PRD says:
-            # operation = client.file_search_stores.upload_to_file_search_store(...)
-            
-            # Let's trust the PRD's snippet for now, but if it fails we might need to adjust.
-            # However, `google-genai` SDK is quite new.
-            # Let's stick to a generic implementation that we can adjust if needed.
-            
-            # Let's try to find the method on the client object if possible.
-            # Since I cannot run help() on the object easily without a script, I will assume the PRD snippet is the target.
-            
-            # However, `client.file_search_stores` usually manages stores.
-            # Let's try to see if we can just use the `files` API and then link it?
-            # Actually, for RAG, usually you create a store, then add files to it.
-            
-            # Let's implement the logic:
-            # 1. Upload file
-            # 2. Add to store (if not automatic)
-            
-            # Let's try to follow the PRD snippet exactly first.
-            # But `upload_to_file_search_store` might be a high-level helper.
-            
-            # If that method doesn't exist, we will fallback to:
-            # 1. client.files.upload()
-            # 2. client.file_search_stores.create_file(parent=store_name, file_id=...) ??
-            
-            # Let's use a safer implementation that is more standard:
-            # Upload file -> Add to store.
-            
-            # Actually, let's look at the PRD snippet again.
-            # It uses `client.file_search_stores.upload_to_file_search_store`.
-            # I will assume this exists.
-            
-            # Wait, I can't be 100% sure. 
-            # Let's write a small script to check the available methods on `client.file_search_stores`?
-            # No, that takes time. I will implement what is in the PRD.
-            
-            # BUT, I will wrap it in a try-except block that is robust.
-            
-            # Actually, I will implement a slightly more manual but standard way which is often supported:
-            # Upload file, then update store?
-            # No, let's stick to the PRD snippet but correct the syntax if needed.
-            
-            # Re-reading PRD snippet:
-            # operation = client.file_search_stores.upload_to_file_search_store(...)
-            
-            # I will implement this.
-            
-            # Wait, `file` argument in PRD snippet is `uploaded_file`. 
-            # Is it a file object or path?
-            # `file=uploaded_file` implies a file object or path.
-            
-            # Let's try to implement `upload_file` which takes a path.
-            
-            # NOTE: I will use `client.files.upload` first because it is the standard way to get a file handle in GenAI,
-            # then I will try to associate it.
-            
-            # Actually, let's look at `google-genai` 0.3.0 docs (simulated memory).
-            # Usually: `client.files.upload(path=...)`
-            # Then: `client.models.generate_content(..., tools=[FileSearch(file_search_store_names=[...])])`
-            # But how to put file IN store?
-            
-            # `client.file_search_stores.create(file_ids=[...])` ?
-            # Or `store.add_files(...)`?
-            
-            # Let's assume the PRD is a bit aspirational and implement the most likely working code:
-            # 1. Upload file to GenAI.
-            # 2. Add file to the store.
-            
-            # I will implement a method that does:
-            # uploaded_file = client.files.upload(path=file_path)
-            # client.file_search_stores.create_file(parent=google_store_name, file_id=uploaded_file.name) # This is a guess
-            
-            # BETTER GUESS:
-            # The PRD mentions `upload_to_file_search_store`. I will try to use it.
-            # If it doesn't exist, I'll have to fix it later.
-            
-            # Let's write the code to use `client.files.upload` and then assume we just need to return the file handle
-            # and that we might need to add it to the store.
-            
-            # Wait, if I upload a file, it is not automatically in the store.
-            # I need to link it.
-            
-            # Let's try to find a method `create_file` on the store resource?
-            
-            # Let's stick to the PRD snippet as a starting point.
-            
-            with open(file_path, 'rb') as f:
-                # We might need to read it? Or pass path?
-                # client.files.upload usually takes path.
-                pass
-
-            # Let's try to use the exact PRD snippet logic but adapted.
-            
-            # Actually, I will check if I can list attributes of the client in a separate step?
-            # No, I'll just write the code.
-            
-            # I will use a generic approach:
-            # 1. Upload file.
-            # 2. Return file info.
-            # 3. (We might need another call to add to store, but let's assume `upload_to_file_search_store` does both).
-            
-            # Let's implement `upload_file` using `client.files.upload` and then `client.file_search_stores.create_file` (if it exists) or similar.
-            # Actually, looking at the PRD, it says:
-            # `client.file_search_stores.upload_to_file_search_store`
-            
-            # I will use that.
-            
-            pass
-            
-            # Real implementation:
-            # Since I don't have the library docs in front of me, I will trust the PRD.
-            # But I will also add `delete_file`.
-            
-            return self.client.file_search_stores.upload_to_file_search_store(
-                file=file_path,
-                file_search_store_name=google_store_name,
-                config={'display_name': display_name}
-            )
+            config = {'display_name': display_name or os.path.basename(file_path)}
+            if mime_type:
+                config['mime_type'] = mime_type
+            if timeout:
+                config['http_options'] = {'timeout': _timeout_ms(timeout)}
+            
+            file_size = os.path.getsize(file_path)
+            set_attributes({"file.size": file_size, "file.mime_type": mime_type})
+            with tracer.span("google.upload.transfer", {"store": google_store_name, "file.size": file_size}):
+                if mime_type:
+                    # Stream from a file object so the bytes sent can be reported;
+                    # the SDK needs an explicit MIME type in that case
+                    total_bytes = file_size
+                    report = lambda position: notify("progress", {"bytes_sent": position, "total_bytes": total_bytes})
+                    with _ProgressFile(file_path, report, cancel_event) as f:
+                        operation = self.client.file_search_stores.upload_to_file_search_store(
+                            file=f,
+                            file_search_store_name=google_store_name,
+                            config=config
+                        )
+                else:
+                    operation = self.client.file_search_stores.upload_to_file_search_store(
+                        file=file_path,
+                        file_search_store_name=google_store_name,
+                        config=config
+                    )
+            notify("operation", {"operation": operation.name, "done": bool(operation.done)})
+            
+            # The bytes are in Google now; on cancellation stop waiting and
+            # return the pending operation so the import can still be tracked
+            wait_budget = settings.upload_operation_timeout
+            if timeout:
+                wait_budget = min(wait_budget, timeout - (time.monotonic() - started))
+            deadline = time.monotonic() + wait_budget
+            with tracer.span("google.upload.poll", {"operation": operation.name}) as poll_span:
+                polls = 0
+                while not operation.done and time.monotonic() < deadline:
+                    if cancel_event.wait(settings.upload_operation_poll_interval):
+                        break
+                    operation = self.get_upload_operation(operation.name)
+                    polls += 1
+                    if operation.done:
+                        notify("operation", {"operation": operation.name, "done": True})
+                poll_span.set_attributes({"polls": polls, "done": bool(operation.done)})
+            
+            if operation.done and operation.error:
+                raise Exception(f"Import failed: {operation.error}")
+            return operation
 
+        except RequestCancelled:
+            raise
         except Exception as e:
+            if cancel_event.is_set():
+                raise RequestCancelled(f"Upload of {display_name} cancelled")
             raise Exception(f"Failed to upload file to store: {str(e)}")
 
+    @traced("google.get_upload_operation", {"operation": "operation_name"})
+    def get_upload_operation(self, operation_name: str):
+        """
+        Get the current state of an upload (import) operation.
+        
+        Args:
+            operation_name: Resource name of the operation
+                (e.g. "fileSearchStores/abc/upload/operations/xyz")
+            
+        Returns:
+            The operation; ``done`` and ``response.document_name`` describe the result
+        """
+        from google.genai import types
+        return self.client.operations.get(types.UploadToFileSearchStoreOperation(name=operation_name))
+
+    @traced("google.list_documents", {"store": "google_store_name"})
+    def list_document_pages(self, google_store_name: str, page_size: int = 20) -> Iterator[list]:
+        """
+        Iterate over the documents of a FileSearchStore, one page per list call.
+
+        Args:
+            google_store_name: The Google resource name of the store
+            page_size: Documents fetched per list call (the API allows up to 20)
+
+        Returns:
+            Iterator of pages (lists of Document objects with ``name``,
+            ``display_name``, ``state``); the next page is requested only
+            when the previous one has been consumed
+        """
+        pager = self.client.file_search_stores.documents.list(
+            parent=google_store_name,
+            config={'page_size': page_size}
+        )
+        yield list(pager.page)
+        while pager.config.get('page_token'):
+            yield list(pager.next_page())
+
+    @traced("google.delete_file", {"document": "file_resource_name"})
     def delete_file(self, file_resource_name: str) -> bool:
         """
-        Delete a file from Google Cloud.
+        Delete a document from its FileSearchStore.
         
         Args:
-            file_resource_name: The Google resource name of the file
+            file_resource_name: Resource name of the document
+                ("fileSearchStores/.../documents/..."). Records created before the
+                import finished may hold the upload operation name instead; it is
+                resolved to the document first. Plain Files API names ("files/...")
+                are deleted through the Files API.
             
         Returns:
             bool: True if deletion was successful
         """
         try:
-            self.client.files.delete(name=file_resource_name)
+            name = file_resource_name
+            if "/upload/operations/" in name:
+                operation = self.get_upload_operation(name)
+                if not operation.done or not operation.response:
+                    raise Exception(f"Import operation {name} has not finished yet")
+                name = operation.response.document_name
+            
+            if "/documents/" in name:
+                self.client.file_search_stores.documents.delete(name=name, config={'force': True})
+            else:
+                self.client.files.delete(name=name)
             return True
         except Exception as e:
-            raise Exception(f"Failed to delete file: {str(e)}")
+            # Chained so callers can read the SDK error's code
+            raise Exception(f"Failed to delete file: {str(e)}") from e
+
+    @property
+    def context_cache(self):
+        """Lazily created manager of per-Store cached context"""
+        if self._context_cache is None:
+            from app.services.context_cache import ContextCacheManager
+            self._context_cache = ContextCacheManager.from_settings(self.client.aio.caches, get_settings())
+        return self._context_cache
 
-    def chat_with_store(self, google_store_name: str, message: str, model_name: str = "gemini-2.5-flash") -> str:
+    @traced("google.invalidate_context_cache", {"store": "google_store_name"})
+    async def invalidate_context_cache(self, google_store_name: str) -> None:
+        """Delete the cached context of a Store (after its configuration changed or it was deleted)"""
+        if self._context_cache is not None:
+            await self._context_cache.invalidate_store(google_store_name)
+
+    @traced("google.chat_with_store", {"store": "google_store_name", "model": "model_name"})
+    async def chat_with_store(
+        self,
+        google_store_name: str,
+        message: str,
+        model_name: str = "gemini-2.5-flash",
+        timeout: Optional[float] = None,
+        system_instruction: Optional[str] = None,
+        generation: Optional[dict] = None,
+        safety_settings: Optional[list] = None,
+    ) -> str:
         """
         Chat with a specific FileSearchStore.
         
+        Uses the SDK's async client, so cancelling the awaiting task (e.g. on
+        client disconnect) aborts the HTTP call to Google.
+        
         Args:
             google_store_name: The Google resource name of the store
             message: User's question/message
             model_name: Model to use (default: gemini-2.5-flash)
+            timeout: Optional time budget in seconds, sent as the SDK's HTTP timeout
+            system_instruction: Optional Store system instruction
+            generation: Optional generation parameters (max_output_tokens,
+                temperature, thinking_budget)
+            safety_settings: Optional list of {"category", "threshold"} dicts
             
         Returns:
             str: Model response text with citations
+        
+        A long system instruction is sent once as cached content together
+        with the File Search tool and referenced on later calls (see
+        app.services.context_cache). With CHAT_HEDGING_ENABLED, a call still running after a high
+        percentile of recent latencies is duplicated and the first answer
+        wins (see app.services.hedging).
         """
+        from google.genai import types
+        
         # Create a local logger for this method if not already existing in class
         logger = logging.getLogger(__name__)
         
@@ -342,21 +427,67 @@ class GoogleFileSearchService:
             logger.debug(f"Message: {message}")
 
             # Prepare configuration
-            generation_config = types.GenerateContentConfig(
-                tools=[
-                    types.Tool(
-                        file_search=types.FileSearch(
-                            file_search_store_names=[google_store_name]
-                        )
+            tools = [
+                types.Tool(
+                    file_search=types.FileSearch(
+                        file_search_store_names=[google_store_name]
                     )
+                )
+            ]
+            base_config = {
+                "http_options": types.HttpOptions(timeout=_timeout_ms(timeout)) if timeout else None,
+            }
+            generation = generation or {}
+            if generation.get("temperature") is not None:
+                base_config["temperature"] = generation["temperature"]
+            if generation.get("max_output_tokens") is not None:
+                base_config["max_output_tokens"] = generation["max_output_tokens"]
+            if generation.get("thinking_budget") is not None:
+                base_config["thinking_config"] = types.ThinkingConfig(thinking_budget=generation["thinking_budget"])
+            if safety_settings:
+                base_config["safety_settings"] = [
+                    types.SafetySetting(category=setting["category"], threshold=setting["threshold"])
+                    for setting in safety_settings
                 ]
-            )
 
-            response = self.client.models.generate_content(
-                model=model_name,
-                contents=message,
-                config=generation_config
-            )
+            def build_config(cache_name: Optional[str]):
+                # Cached content already carries the instruction and the tools;
+                # the API rejects them when repeated in the request
+                if cache_name:
+                    return types.GenerateContentConfig(cached_content=cache_name, **base_config)
+                return types.GenerateContentConfig(
+                    tools=tools, system_instruction=system_instruction or None, **base_config
+                )
+
+            cache_name = None
+            if system_instruction:
+                cache_name = await self.context_cache.get(google_store_name, model_name, system_instruction, tools)
+            set_attributes({"chat.message_chars": len(message), "context_cache": cache_name})
+
+            async def generate_with(config):
+                async def generate():
+                    with tracer.span("google.generate_content", {"model": model_name, "cached_content": config.cached_content}):
+                        return await self.client.aio.models.generate_content(
+                            model=model_name,
+                            contents=message,
+                            config=config
+                        )
+
+                if get_settings().chat_hedging_enabled:
+                    # A stalled call is raced by a duplicate; the loser is cancelled
+                    from app.services.hedging import get_chat_hedger
+                    return await get_chat_hedger().run(generate, key=model_name)
+                return await generate()
+
+            try:
+                response = await generate_with(build_config(cache_name))
+            except Exception as e:
+                if not cache_name or "cache" not in str(e).lower():
+                    raise
+                # The cache expired or was deleted behind our back: answer inline
+                logger.info(f"Cached content {cache_name} rejected, retrying inline: {str(e)}")
+                self.context_cache.discard(cache_name)
+                response = await generate_with(build_config(None))
 
             # --- RESPONSE LOGGING ---
             logger.debug("-" * 60)
@@ -369,7 +500,16 @@ class GoogleFileSearchService:
                 prompt_tokens = getattr(response.usage_metadata, 'prompt_token_count', 0)
                 response_tokens = getattr(response.usage_metadata, 'candidates_token_count', 0)
                 total_tokens = getattr(response.usage_metadata, 'total_token_count', 0)
-                logger.debug(f"Tokens: {prompt_tokens} prompt + {response_tokens} response = {total_tokens} total")
+                cached_tokens = getattr(response.usage_metadata, 'cached_content_token_count', 0) or 0
+                logger.debug(f"Tokens: {prompt_tokens} prompt ({cached_tokens} cached) + {response_tokens} response = {total_tokens} total")
+                set_attributes({
+                    "tokens.prompt": prompt_tokens,
+                    "tokens.cached": cached_tokens,
+                    "tokens.response": response_tokens,
+                    "tokens.total": total_tokens,
+                })
+                if cached_tokens:
+                    metrics.inc("chat_cached_tokens_total", cached_tokens)
             
             # Log grounding/citation metadata (this shows which documents were used)
             if hasattr(response, 'candidates') and response.candidates:
@@ -412,6 +552,9 @@ class GoogleFileSearchService:
             logger.debug("="*60 + "\n")
 
             return response.text
+        except asyncio.CancelledError:
+            logger.debug(f"Chat request cancelled: store={google_store_name}")
+            raise
         except Exception as e:
             logger.error(f"Failed to generate content: {str(e)}", exc_info=True)
             raise Exception(f"Failed to generate content: {str(e)}")
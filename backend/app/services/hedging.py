@@ -0,0 +1,173 @@
+"""
+Hedged requests for latency-sensitive upstream calls.
+
+A hedged call starts the primary request and, if it has not answered
+within a high percentile of recent latencies, fires one duplicate. The
+first successful answer wins and the other request is cancelled; the
+latency recorded is the one the caller saw, from the primary's start. A token
+budget earned by every call caps how many calls may be hedged, so a slow
+upstream is not hit with twice the load.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Hashable, Optional, TypeVar
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _LatencyWindow:
+    """Recent successful latencies of one key"""
+
+    def __init__(self, size: int):
+        self.samples: deque = deque(maxlen=size)
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Hedging policy and executor.
+
+    Args:
+        name: Name of the hedged call, used as the metrics label
+        percentile: Hedge once the primary has been running longer than this
+            percentile of recent latencies
+        min_delay: Lower bound of the hedge delay in seconds
+        min_samples: Calls observed before hedging starts
+        budget_ratio: Hedges allowed per call (e.g. 0.05 = at most ~5% hedged)
+        budget_burst: Maximum number of saved-up hedge tokens
+        window: Number of recent latencies kept per key
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float,
+        min_delay: float,
+        min_samples: int,
+        budget_ratio: float,
+        budget_burst: float = 10.0,
+        window: int = 500,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.window = window
+        self._tokens = budget_burst
+        self._latencies: dict[Hashable, _LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "Hedger":
+        return cls(
+            name="chat",
+            percentile=settings.chat_hedge_percentile,
+            min_delay=settings.chat_hedge_min_delay_seconds,
+            min_samples=settings.chat_hedge_min_samples,
+            budget_ratio=settings.chat_hedge_budget_ratio,
+        )
+
+    def hedge_delay(self, key: Hashable) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history"""
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None or len(latencies.samples) < self.min_samples:
+                return None
+            return max(self.min_delay, latencies.percentile(self.percentile))
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = _LatencyWindow(self.window)
+            latencies.samples.append(seconds)
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self.budget_burst, self._tokens + self.budget_ratio)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    async def run(self, call: Callable[[], Awaitable[T]], key: Hashable) -> T:
+        """
+        Run call(), hedging it with a second call() if it is slow.
+
+        Args:
+            call: Factory of the upstream coroutine (called once per attempt)
+            key: Latency statistics key (e.g. the model name)
+
+        Returns:
+            The result of the first attempt that succeeds
+
+        Raises:
+            The error of the last attempt if none succeeds
+        """
+        self._earn()
+        labels = {"call": self.name, "key": str(key)}
+        delay = self.hedge_delay(key)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        hedge: Optional[asyncio.Future] = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    if self._spend():
+                        hedge = asyncio.ensure_future(call())
+                        pending.add(hedge)
+                        metrics.inc("hedge_requests_total", labels=labels)
+                        logger.debug(f"Hedging call for {key} after {delay:.3f}s")
+                    else:
+                        metrics.inc("hedge_budget_exhausted_total", labels=labels)
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is not None:
+                        error = attempt.exception()
+                        continue
+                    # The latency the caller saw, hedge delay included: timing only the
+                    # winning attempt would let the percentile (and the delay) drift down
+                    self.record(key, time.perf_counter() - started)
+                    result = attempt.result()
+                    if attempt is hedge:
+                        metrics.inc("hedge_wins_total", labels=labels)
+                    return result
+            raise error
+        finally:
+            for attempt in (primary, hedge):
+                if attempt is not None and not attempt.done():
+                    attempt.cancel()
+
+
+# Singleton instance
+_hedger_instance: Optional[Hedger] = None
+
+
+def get_chat_hedger() -> Hedger:
+    """Get singleton instance of the Hedger used for chat generations"""
+    global _hedger_instance
+    if _hedger_instance is None:
+        _hedger_instance = Hedger.from_settings(get_settings())
+    return _hedger_instance
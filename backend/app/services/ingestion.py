@@ -0,0 +1,140 @@
+"""
+Pre-ingestion pipeline shared by the upload routes.
+
+Optionally replaces a document with its locally extracted text before it
+is sent to Google, and records per-file ingestion metrics (bytes saved,
+estimated upload time saved).
+"""
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.services.text_extraction import EXTRACTABLE_EXTENSIONS, extract_to_markdown, get_extraction_pool
+from app.services.upload_preflight import PreflightResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedUpload:
+    """The file that will actually be sent to Google"""
+    path: str
+    mime_type: str
+    original_bytes: int
+    upload_bytes: int
+    compacted: bool = False
+    extraction_seconds: float = 0.0
+    temp_paths: list = field(default_factory=list)  # Extra files to remove after the upload
+
+    def cleanup(self) -> None:
+        for path in self.temp_paths:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+@dataclass
+class IngestionStats:
+    bytes_saved: int
+    seconds_saved: float
+
+
+class _ThroughputEstimator:
+    """
+    Exponentially weighted upload throughput (bytes/second).
+    
+    Small uploads are dominated by fixed request latency rather than
+    bandwidth, so only uploads of at least min_sample_bytes update the
+    estimate; until then the configured UPLOAD_BANDWIDTH_ESTIMATE is used.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_sample_bytes: int = 256 * 1024):
+        self.alpha = alpha
+        self.min_sample_bytes = min_sample_bytes
+        self.value: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, size: int, seconds: float) -> float:
+        with self._lock:
+            if seconds > 0 and size >= self.min_sample_bytes:
+                sample = size / seconds
+                self.value = sample if self.value is None else self.alpha * sample + (1 - self.alpha) * self.value
+            return self.value or get_settings().upload_bandwidth_estimate
+
+
+_upload_throughput = _ThroughputEstimator()
+
+
+async def prepare_upload(tmp_path: str, checked: PreflightResult, compact: bool) -> PreparedUpload:
+    """
+    Decide what to upload for a validated file.
+
+    When compaction is requested and the format is supported, text is
+    extracted in the process pool. The compact version is used only if it is
+    non-empty and at most TEXT_EXTRACTION_MAX_RATIO of the original size;
+    otherwise the original is uploaded.
+    """
+    original = PreparedUpload(
+        path=tmp_path,
+        mime_type=checked.mime_type,
+        original_bytes=checked.size_bytes,
+        upload_bytes=checked.size_bytes,
+    )
+    if not compact or checked.extension not in EXTRACTABLE_EXTENSIONS:
+        return original
+
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        get_extraction_pool(settings.text_extraction_workers),
+        extract_to_markdown,
+        tmp_path,
+        checked.extension,
+    )
+    metrics.observe("ingest_extraction_seconds", result.seconds, {"extension": checked.extension})
+    original.extraction_seconds = result.seconds
+
+    if result.path is None:
+        metrics.inc("ingest_extraction_skipped_total", labels={"reason": "no_text"})
+        return original
+    if result.extracted_bytes > checked.size_bytes * settings.text_extraction_max_ratio:
+        metrics.inc("ingest_extraction_skipped_total", labels={"reason": "not_smaller"})
+        os.unlink(result.path)
+        return original
+
+    return PreparedUpload(
+        path=result.path,
+        mime_type="text/markdown",
+        original_bytes=checked.size_bytes,
+        upload_bytes=result.extracted_bytes,
+        compacted=True,
+        extraction_seconds=result.seconds,
+        temp_paths=[result.path],
+    )
+
+
+def record_ingestion(prepared: PreparedUpload, upload_seconds: float, display_name: str) -> IngestionStats:
+    """Record metrics for one ingested file and return what compaction saved"""
+    throughput = _upload_throughput.update(prepared.upload_bytes, upload_seconds)
+    bytes_saved = prepared.original_bytes - prepared.upload_bytes
+    seconds_saved = 0.0
+    if prepared.compacted:
+        seconds_saved = bytes_saved / throughput - prepared.extraction_seconds
+
+    content_format = "text" if prepared.compacted else "original"
+    metrics.inc("ingest_files_total", labels={"format": content_format})
+    metrics.inc("ingest_bytes_original_total", prepared.original_bytes)
+    metrics.inc("ingest_bytes_uploaded_total", prepared.upload_bytes)
+    metrics.observe("ingest_upload_seconds", upload_seconds, {"format": content_format})
+    if prepared.compacted:
+        metrics.observe("ingest_bytes_saved", bytes_saved)
+        metrics.observe("ingest_time_saved_seconds", seconds_saved)
+        logger.info(
+            f"Ingested '{display_name}' as text: {prepared.original_bytes} -> {prepared.upload_bytes} bytes "
+            f"(saved {bytes_saved} bytes, ~{seconds_saved:.2f}s)"
+        )
+    return IngestionStats(bytes_saved=bytes_saved, seconds_saved=seconds_saved)
@@ -0,0 +1,363 @@
+"""
+NDJSON export and import of Store and File metadata.
+
+Moves the local database between environments (or restores it) without
+touching Google: the records keep their Google resource names, hashes and
+statuses. The stream is one JSON object per line:
+
+    {"type": "header", "format": "gfsa-metadata", "version": 1, ...}
+    {"type": "store", "google_store_name": ..., "display_name": ..., ...}
+    {"type": "file", "store": <google_store_name>, "document_id": ..., ...}
+
+Local ids are not exported; files reference their Store by its Google
+name. Export reads in keyset-paginated batches and import upserts in
+batched transactions, so memory stays constant whatever the row count.
+Import lines are split by NDJSONLines, which holds at most one line of
+MAX_LINE_BYTES; longer lines are skipped and reported.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import File, Store
+from app.services import search_index
+from app.services.store_stats import recompute_store_stats
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "gfsa-metadata"
+VERSION = 1
+
+STORE_FIELDS = (
+    "google_store_name", "display_name", "created_at", "updated_at",
+    "system_instruction", "generation_config", "safety_settings",
+)
+FILE_FIELDS = (
+    "document_id", "display_name", "upload_date", "status",
+    "size_bytes", "uploaded_bytes", "content_sha256",
+)
+DATETIME_FIELDS = {"created_at", "updated_at", "upload_date"}
+INTEGER_FIELDS = {"size_bytes", "uploaded_bytes"}
+
+# Errors reported in the import summary (the rest are only counted)
+MAX_REPORTED_ERRORS = 100
+# Longest accepted import line; real records are well under a kilobyte
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class MetadataImportError(ValueError):
+    """The stream is not a metadata export"""
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+
+
+def _loads(line: bytes) -> dict:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _serialize(row, fields: Iterable[str]) -> dict:
+    record = {}
+    for name in fields:
+        value = getattr(row, name)
+        record[name] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+
+def iter_export(db: Session, store_ids: Optional[list] = None, batch_size: int = 5000) -> Iterator[bytes]:
+    """
+    Yield the NDJSON lines of an export.
+
+    Args:
+        db: Session used for the reads (one short query per batch)
+        store_ids: Limit the export to these Stores (all when None)
+        batch_size: Rows read per query
+    """
+    yield _dumps({
+        "type": "header",
+        "format": FORMAT,
+        "version": VERSION,
+        "exported_at": datetime.utcnow().isoformat(),
+    })
+
+    store_query = select(Store.id, *(getattr(Store, name) for name in STORE_FIELDS)).order_by(Store.id)
+    if store_ids:
+        store_query = store_query.where(Store.id.in_(store_ids))
+    store_names = {}
+    for row in db.execute(store_query):
+        store_names[row.id] = row.google_store_name
+        yield _dumps({"type": "store", **_serialize(row, STORE_FIELDS)})
+
+    # Keyset pagination: every batch is an index range scan, never an OFFSET
+    file_query = (
+        select(File.id, File.store_id, *(getattr(File, name) for name in FILE_FIELDS))
+        .where(File.deleted_at.is_(None))  # Deleted files are on their way out of Google
+        .order_by(File.id)
+    )
+    if store_ids:
+        file_query = file_query.where(File.store_id.in_(store_ids))
+    last_id = 0
+    while True:
+        rows = db.execute(file_query.where(File.id > last_id).limit(batch_size)).all()
+        if not rows:
+            break
+        for row in rows:
+            yield _dumps({"type": "file", "store": store_names[row.store_id], **_serialize(row, FILE_FIELDS)})
+        last_id = rows[-1].id
+        db.rollback()  # End the read transaction between batches
+
+
+@dataclass
+class ImportStats:
+    stores_created: int = 0
+    stores_updated: int = 0
+    files_created: int = 0
+    files_updated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+class NDJSONLines:
+    """
+    Splits a byte stream into lines, holding at most one unfinished line.
+
+    Only each new chunk is split. A line longer than max_line_bytes is
+    dropped while it streams in and returned as None, for the importer to
+    report.
+    """
+
+    def __init__(self, max_line_bytes: int = MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._tail: list[bytes] = []  # Pieces of the unfinished line
+        self._tail_bytes = 0
+        self._oversized = False
+
+    def _extend(self, piece: bytes) -> None:
+        if self._oversized:
+            return
+        self._tail_bytes += len(piece)
+        if self._tail_bytes > self.max_line_bytes:
+            self._oversized = True
+            self._tail = []
+        else:
+            self._tail.append(piece)
+
+    def _complete(self, piece: bytes) -> Optional[bytes]:
+        self._extend(piece)
+        line = None if self._oversized else b"".join(self._tail)
+        self._tail, self._tail_bytes, self._oversized = [], 0, False
+        return line
+
+    def feed(self, chunk: bytes) -> list:
+        """Lines completed by the chunk"""
+        *complete, rest = chunk.split(b"\n")
+        lines = [self._complete(piece) for piece in complete]
+        self._extend(rest)
+        return lines
+
+    def finish(self) -> list:
+        """The last line when the stream does not end with a newline"""
+        if not self._tail_bytes and not self._oversized:
+            return []
+        return [self._complete(b"")]
+
+
+def _parse_datetimes(record: dict) -> dict:
+    for name in DATETIME_FIELDS & record.keys():
+        if record[name] is not None:
+            record[name] = datetime.fromisoformat(record[name])
+    return record
+
+
+def _file_row(record: dict) -> dict:
+    """
+    Validated File columns of a file record.
+
+    Raises:
+        ValueError, TypeError: The record cannot be written (only it is skipped)
+    """
+    row = _parse_datetimes({name: record.get(name) for name in FILE_FIELDS if name in record})
+    if not isinstance(row.get("document_id"), str) or not isinstance(row.get("display_name"), str) \
+            or not row["document_id"] or not row["display_name"]:
+        raise ValueError("brak document_id lub display_name")
+    for name in INTEGER_FIELDS & row.keys():
+        if row[name] is not None and (not isinstance(row[name], int) or isinstance(row[name], bool)):
+            raise ValueError(f"{name} nie jest liczbą całkowitą")
+    return row
+
+
+class MetadataImporter:
+    """
+    Upserts an export into the database, batch by batch.
+
+    Stores are matched by google_store_name and files by (Store,
+    document_id); existing rows are updated, missing ones inserted. Feed
+    lines with add() and call finish() at the end; every batch_size files
+    are written in one transaction.
+    """
+
+    def __init__(self, db: Session, batch_size: int = 5000):
+        self.db = db
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        self._store_ids: dict[str, int] = {}
+        self._pending: list[tuple] = []  # (Google Store name, validated File row)
+        self._touched_stores: set = set()
+        self._line = 0
+        self._header_seen = False
+
+    def add(self, line: Optional[bytes]) -> None:
+        """Process one NDJSON line (None: a line NDJSONLines dropped as too long)"""
+        self._line += 1
+        if line is None:
+            message = f"Linia {self._line}: rekord dłuższy niż {MAX_LINE_BYTES} bajtów"
+            if not self._header_seen:
+                raise MetadataImportError(message)
+            self.stats.error(message)
+            return
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = _loads(line)
+        except ValueError as e:
+            if not self._header_seen:
+                raise MetadataImportError(f"Linia {self._line}: niepoprawny JSON")
+            self.stats.error(f"Linia {self._line}: niepoprawny JSON ({e})")
+            return
+
+        record_type = record.pop("type", None) if isinstance(record, dict) else None
+        if not self._header_seen:
+            if record_type != "header" or record.get("format") != FORMAT:
+                raise MetadataImportError("Strumień nie jest eksportem metadanych (brak nagłówka)")
+            if record.get("version") != VERSION:
+                raise MetadataImportError(f"Nieobsługiwana wersja eksportu: {record.get('version')}")
+            self._header_seen = True
+            return
+
+        try:
+            if record_type == "store":
+                self._upsert_store(record)
+            elif record_type == "file":
+                # Validated here, so a bad record is skipped alone and reported with its own line
+                if not isinstance(record.get("store"), str):
+                    raise ValueError("brak nazwy Store'a")
+                self._pending.append((record["store"], _file_row(record)))
+                if len(self._pending) >= self.batch_size:
+                    self.flush()
+            else:
+                self.stats.error(f"Linia {self._line}: nieznany typ rekordu '{record_type}'")
+        except (KeyError, TypeError, ValueError) as e:
+            self.stats.error(f"Linia {self._line}: niepoprawny rekord ({e})")
+
+    def _upsert_store(self, record: dict) -> None:
+        record = _parse_datetimes({name: record.get(name) for name in STORE_FIELDS if name in record})
+        google_store_name = record["google_store_name"]
+        if not isinstance(google_store_name, str) or not isinstance(record.get("display_name"), str):
+            raise ValueError("brak google_store_name lub display_name")
+        self.flush()  # Files of the previous store first
+        store = self.db.query(Store).filter(Store.google_store_name == google_store_name).first()
+        if store is None:
+            clash = self.db.query(Store.id).filter(Store.display_name == record["display_name"]).first()
+            if clash is not None:
+                self.stats.error(f"Linia {self._line}: Store o nazwie '{record['display_name']}' już istnieje")
+                return
+            store = Store(**record)
+            self.db.add(store)
+            self.stats.stores_created += 1
+        else:
+            for name, value in record.items():
+                setattr(store, name, value)
+            self.stats.stores_updated += 1
+        self.db.flush()
+        self._store_ids[google_store_name] = store.id
+        self.db.commit()
+
+    def _resolve_store(self, google_store_name: Optional[str]) -> Optional[int]:
+        # Stores missing from the stream may already exist in the database
+        if google_store_name not in self._store_ids:
+            self._store_ids[google_store_name] = self.db.execute(
+                select(Store.id).where(Store.google_store_name == google_store_name)
+            ).scalar()
+        return self._store_ids[google_store_name]
+
+    def flush(self) -> None:
+        """Write the pending files in one transaction"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+
+        rows = []
+        for google_store_name, row in batch:
+            store_id = self._resolve_store(google_store_name)
+            if store_id is None:
+                self.stats.error(f"Plik '{row['display_name']}': nieznany Store '{google_store_name}'")
+                continue
+            row["store_id"] = store_id
+            rows.append(row)
+        # A document repeated within the batch is written once, from its last record
+        rows = list({(row["store_id"], row["document_id"]): row for row in rows}.values())
+
+        existing = {}
+        by_store: dict[int, list] = {}
+        for row in rows:
+            by_store.setdefault(row["store_id"], []).append(row["document_id"])
+        for store_id, document_ids in by_store.items():
+            for chunk_start in range(0, len(document_ids), 500):  # Stay below SQLite's variable limit
+                chunk = document_ids[chunk_start:chunk_start + 500]
+                for file_id, document_id in self.db.execute(
+                    select(File.id, File.document_id).where(File.store_id == store_id, File.document_id.in_(chunk))
+                ):
+                    existing[(store_id, document_id)] = file_id
+
+        new_rows, updated_rows = [], []
+        for row in rows:
+            file_id = existing.get((row["store_id"], row["document_id"]))
+            if file_id is None:
+                new_rows.append(row)
+            else:
+                # A file deleted locally but present in the export is restored
+                updated_rows.append({"id": file_id, **row, "deleted_at": None})
+            self._touched_stores.add(row["store_id"])
+
+        if new_rows:
+            self.db.execute(insert(File), new_rows)
+        if updated_rows:
+            self.db.execute(update(File), updated_rows)
+        search_index.rename_files(self.db, [(row["id"], row["display_name"]) for row in updated_rows])
+        self.db.commit()
+        self.stats.files_created += len(new_rows)
+        self.stats.files_updated += len(updated_rows)
+
+    def finish(self) -> ImportStats:
+        """Flush the last batch, update the versions and statistics of changed Stores and index new files"""
+        if not self._header_seen:
+            raise MetadataImportError("Strumień nie jest eksportem metadanych (brak nagłówka)")
+        self.flush()
+        for store in self.db.query(Store).filter(Store.id.in_(self._touched_stores)):
+            store.bump_version()
+        recompute_store_stats(self.db, self._touched_stores)
+        self.db.commit()
+        # New files are indexed by name in one pass over the rows the index lacks
+        search_index.index_missing(self.db)
+        self.db.commit()
+        logger.info(f"Metadata import finished: {self.stats}")
+        return self.stats
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core.config import get_settings
+from app.services.google_file_search_service import get_google_file_search_service
+
+logger = logging.getLogger(__name__)
+
+# Specialised variants of those families that cannot run File Search
+NON_CHAT_MARKERS = ("tts", "image", "audio", "live", "embedding", "computer-use")
+
+
+class ModelNotAvailableError(ValueError):
+    """Raised when a requested model is missing from the catalog or cannot be used for chat"""
+
+
+@dataclass
+class ModelInfo:
+    """Catalog entry describing a single model"""
+    name: str  # Short name without the "models/" prefix, as accepted by generate_content
+    display_name: str = ""
+    description: str = ""
+    supported_actions: list = field(default_factory=list)
+    input_token_limit: Optional[int] = None
+    output_token_limit: Optional[int] = None
+    supports_generate_content: bool = False
+    supports_file_search: bool = False
+
+
+def normalize_model_name(model_name: str) -> str:
+    """Strip the "models/" resource prefix so both spellings match"""
+    return model_name.strip().removeprefix("models/")
+
+
+class ModelCatalog:
+    """
+    TTL-cached catalog of Gemini models.
+
+    Lookups never call Google: they read the in-memory snapshot. The snapshot is
+    refreshed by a background loop (see run_refresh_loop) or, when it is stale,
+    by a background thread started on first access.
+    """
+
+    def __init__(
+        self,
+        list_models: Optional[Callable[[], list]] = None,
+        ttl_seconds: Optional[float] = None,
+        file_search_prefixes: Optional[str] = None,
+    ):
+        settings = get_settings()
+        self._list_models = list_models or (lambda: get_google_file_search_service().list_models())
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.model_catalog_ttl_seconds
+        # Model families documented as supporting the File Search tool
+        prefixes = file_search_prefixes or settings.file_search_model_prefixes
+        self.file_search_prefixes = tuple(p.strip() for p in prefixes.split(",") if p.strip())
+        self._models: dict[str, ModelInfo] = {}
+        self._loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[datetime] = None
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False  # A background refresh thread is running
+        self._refreshing_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def _supports_file_search(self, name: str, supports_generate: bool) -> bool:
+        if not supports_generate or any(marker in name for marker in NON_CHAT_MARKERS):
+            return False
+        return name.startswith(self.file_search_prefixes)
+
+    def _to_model_info(self, model) -> ModelInfo:
+        name = normalize_model_name(model.name)
+        # Newer SDKs expose supported_actions; the REST field is supported_generation_methods
+        actions = list(getattr(model, "supported_actions", None) or getattr(model, "supported_generation_methods", None) or [])
+        supports_generate = "generateContent" in actions
+        return ModelInfo(
+            name=name,
+            display_name=getattr(model, "display_name", None) or "",
+            description=getattr(model, "description", None) or "",
+            supported_actions=actions,
+            input_token_limit=getattr(model, "input_token_limit", None),
+            output_token_limit=getattr(model, "output_token_limit", None),
+            supports_generate_content=supports_generate,
+            supports_file_search=self._supports_file_search(name, supports_generate),
+        )
+
+    def refresh(self) -> None:
+        """Reload the catalog from Google (blocking)"""
+        with self._refresh_lock:
+            models = {}
+            for model in self._list_models():
+                info = self._to_model_info(model)
+                if "gemini" in info.name.lower():
+                    models[info.name] = info
+            # Swap the whole snapshot so readers never see a partial catalog
+            self._models = models
+            self._loaded_at = time.monotonic()
+            self.refreshed_at = datetime.utcnow()
+            logger.info(f"Model catalog refreshed: {len(models)} models")
+
+    def _refresh_in_background(self) -> None:
+        # Claimed under a lock so concurrent callers start a single thread
+        with self._refreshing_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def target() -> None:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Model catalog refresh failed: {str(e)}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=target, name="model-catalog-refresh", daemon=True).start()
+
+    def list_models(self) -> list[ModelInfo]:
+        """Return the cached models, loading them synchronously only on first use"""
+        if not self.is_loaded:
+            self.refresh()
+        elif self.is_stale:
+            self._refresh_in_background()
+        return sorted(self._models.values(), key=lambda m: m.name)
+
+    def validate_chat_model(self, model_name: str) -> str:
+        """
+        Check that a model exists and can answer with File Search.
+
+        Never blocks on Google: if the catalog has not been loaded yet the
+        model is accepted as-is (fail open) and a background load is started.
+
+        Args:
+            model_name: Requested model, with or without the "models/" prefix
+
+        Returns:
+            str: Normalized model name
+
+        Raises:
+            ModelNotAvailableError: If the model is unknown or unsuitable for chat
+        """
+        name = normalize_model_name(model_name)
+        if not self.is_loaded:
+            self._refresh_in_background()
+            return name
+        if self.is_stale:
+            self._refresh_in_background()
+
+        info = self._models.get(name)
+        if info is None:
+            raise ModelNotAvailableError(f"Model '{name}' nie jest dostępny")
+        if not info.supports_generate_content:
+            raise ModelNotAvailableError(f"Model '{name}' nie obsługuje generateContent")
+        if not info.supports_file_search:
+            raise ModelNotAvailableError(f"Model '{name}' nie obsługuje File Search")
+        return name
+
+    async def run_refresh_loop(self) -> None:
+        """Keep the catalog fresh; meant to run as a background task for the app lifetime"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+                delay = self.ttl_seconds
+            except Exception as e:
+                logger.warning(f"Model catalog refresh failed: {str(e)}")
+                delay = min(60.0, self.ttl_seconds)
+            await asyncio.sleep(delay)
+
+
+# Singleton instance
+_catalog_instance: Optional[ModelCatalog] = None
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Get singleton instance of ModelCatalog"""
+    global _catalog_instance
+    if _catalog_instance is None:
+        _catalog_instance = ModelCatalog()
+    return _catalog_instance
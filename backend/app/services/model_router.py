@@ -0,0 +1,192 @@
+"""
+Latency-aware model selection for chat requests sent with model="auto".
+
+Short lookup questions go to a fast/lite model, analytical questions, long
+messages and large Stores to a stronger one. The choice is corrected by
+rolling per-model statistics: a model that keeps failing is avoided, and
+the fast model is not preferred when it is currently slower than the strong
+one. Explicit models bypass the router; their latencies still feed the
+statistics.
+
+Samples expire after MODEL_ROUTER_SAMPLE_MAX_AGE_SECONDS, and a share of
+the requests diverted by the statistics (MODEL_ROUTER_PROBE_RATIO) still
+goes to the avoided model, so a transient fault does not keep a model out
+of rotation once it has recovered.
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+AUTO_MODEL = "auto"
+
+# Words that mark a question as analytical rather than a lookup (Polish and English stems)
+ANALYTICAL_PATTERN = re.compile(
+    r"\b(dlaczego|czemu|por[oó]wnaj|przeanalizuj|analiz|wyja[sś]nij|oce[nń]|uzasadnij|podsumuj|"
+    r"streszcz|zaplanuj|zaproponuj|r[oó][zż]nic|wnioski|"
+    r"why|compare|analy[sz]|explain|evaluate|assess|summari[sz]e|differen|pros and cons|trade-?off)",
+    re.IGNORECASE,
+)
+
+# Rolling statistics are ignored until a model has this many samples
+MIN_SAMPLES = 5
+
+
+@dataclass
+class RoutingDecision:
+    model: str
+    reason: str
+
+
+class _ModelStats:
+    """Rolling window of (time, latency, success) samples of one model"""
+
+    def __init__(self, window: int, max_age: float, clock):
+        self.samples: deque = deque(maxlen=window)
+        self.max_age = max_age
+        self._clock = clock
+
+    def add(self, seconds: float, ok: bool) -> None:
+        self.samples.append((self._clock(), seconds, ok))
+
+    def _recent(self) -> list:
+        horizon = self._clock() - self.max_age
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def error_rate(self) -> Optional[float]:
+        samples = self._recent()
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def median_latency(self) -> Optional[float]:
+        latencies = sorted(seconds for _, seconds, ok in self._recent() if ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[len(latencies) // 2]
+
+
+class ModelRouter:
+    """Picks the chat model for model="auto" requests"""
+
+    def __init__(
+        self,
+        fast_model: str,
+        strong_model: str,
+        long_message_chars: int,
+        large_store_files: int,
+        max_error_rate: float,
+        window: int = 100,
+        sample_max_age: float = 300.0,
+        probe_ratio: float = 0.05,
+        clock=time.monotonic,
+    ):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.long_message_chars = long_message_chars
+        self.large_store_files = large_store_files
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.sample_max_age = sample_max_age
+        self.probe_ratio = probe_ratio
+        self._clock = clock
+        self._stats: dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ModelRouter":
+        return cls(
+            fast_model=settings.model_router_fast_model,
+            strong_model=settings.model_router_strong_model,
+            long_message_chars=settings.model_router_long_message_chars,
+            large_store_files=settings.model_router_large_store_files,
+            max_error_rate=settings.model_router_max_error_rate,
+            sample_max_age=settings.model_router_sample_max_age_seconds,
+            probe_ratio=settings.model_router_probe_ratio,
+        )
+
+    def _get_stats(self, model: str) -> _ModelStats:
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                stats = self._stats[model] = _ModelStats(self.window, self.sample_max_age, self._clock)
+            return stats
+
+    def _unhealthy(self, model: str) -> bool:
+        error_rate = self._get_stats(model).error_rate()
+        return error_rate is not None and error_rate > self.max_error_rate
+
+    def route(self, message: str, store_file_count: int) -> RoutingDecision:
+        """
+        Choose a model from cheap features of the request and live statistics.
+
+        Args:
+            message: The user's question
+            store_file_count: Number of files in the Store
+
+        Returns:
+            RoutingDecision: The model and a short machine-readable reason
+        """
+        if len(message) >= self.long_message_chars:
+            preferred, reason = self.strong_model, "long_message"
+        elif ANALYTICAL_PATTERN.search(message):
+            preferred, reason = self.strong_model, "analytical_question"
+        elif store_file_count >= self.large_store_files:
+            preferred, reason = self.strong_model, "large_store"
+        else:
+            preferred, reason = self.fast_model, "short_lookup"
+        chosen_by_features = preferred
+
+        if preferred == self.fast_model:
+            fast_latency = self._get_stats(self.fast_model).median_latency()
+            strong_latency = self._get_stats(self.strong_model).median_latency()
+            if fast_latency is not None and strong_latency is not None and fast_latency > strong_latency:
+                preferred, reason = self.strong_model, "fast_model_slower"
+
+        other = self.fast_model if preferred == self.strong_model else self.strong_model
+        if self._unhealthy(preferred) and not self._unhealthy(other):
+            preferred, reason = other, f"{reason}_fallback_errors"
+
+        if preferred != chosen_by_features and random.random() < self.probe_ratio:
+            # Keep sampling the avoided model so its statistics can recover
+            preferred, reason = chosen_by_features, f"{reason}_probe"
+
+        metrics.inc("chat_route_total", labels={"model": preferred, "reason": reason})
+        return RoutingDecision(preferred, reason)
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        """The other routed model, used when the chosen one is not in the catalog"""
+        if model == self.fast_model:
+            return self.strong_model
+        if model == self.strong_model:
+            return self.fast_model
+        return None
+
+    def record(self, model: str, seconds: float, ok: bool) -> None:
+        """Feed the outcome of a generation into the model's statistics"""
+        self._get_stats(model).add(seconds, ok)
+        labels = {"model": model}
+        if ok:
+            metrics.observe("chat_model_latency_seconds", seconds, labels)
+        else:
+            metrics.inc("chat_model_errors_total", labels=labels)
+
+
+# Singleton instance
+_router_instance: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get singleton instance of ModelRouter"""
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = ModelRouter.from_settings(get_settings())
+    return _router_instance
@@ -0,0 +1,214 @@
+"""
+Local full-text index of uploaded documents (SQLite FTS5).
+
+The text of every uploaded file (the extracted text for PDF/Office/HTML,
+the content itself for text files, otherwise just the name) is indexed in
+the ``file_search`` virtual table, keyed by the file id. Rows are written
+and deleted in the same transaction as the ``files`` rows, so the index
+never drifts from the file list. Searching a Store is a local query: no
+Google call, results in milliseconds.
+"""
+import asyncio
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.services.ingestion import PreparedUpload
+from app.services.text_extraction import EXTRACTABLE_EXTENSIONS, extract_to_markdown, get_extraction_pool
+from app.services.upload_preflight import SUPPORTED_TYPES, PreflightResult
+
+logger = logging.getLogger(__name__)
+
+TABLE = "file_search"
+
+# The name column ranks higher than the content column
+NAME_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+
+_available: Optional[bool] = None
+
+
+class SearchIndexUnavailable(Exception):
+    """SQLite was built without FTS5"""
+
+
+@dataclass
+class SearchHit:
+    file_id: int
+    display_name: str
+    snippet: str
+    score: float
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """
+    Create the FTS5 table if needed and index files that are missing from it.
+
+    Files uploaded before the index existed are indexed by name only.
+
+    Returns:
+        bool: False if FTS5 is not available (search is then disabled)
+    """
+    global _available
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                "display_name, content, store_id UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+        _available = True
+        with Session(engine) as db:
+            index_missing(db)
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Full-text search disabled (FTS5 not available): {e}")
+        _available = False
+    return _available
+
+
+def _read_text_file(path: str, limit: int) -> str:
+    with open(path, "rb") as f:
+        data = f.read(limit)
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return data.decode("utf-16", errors="replace")
+    return data.decode("utf-8", errors="replace")
+
+
+async def load_index_text(tmp_path: str, checked: PreflightResult, prepared: PreparedUpload) -> str:
+    """
+    Get the text to index for an uploaded file.
+
+    Reuses the text produced by pre-ingestion extraction when there was one;
+    otherwise extracts it in the process pool, stopping once
+    search_index_max_chars characters are collected. Formats without an extractor
+    are indexed by name only, and so is any file whose text cannot be read:
+    indexing never fails an upload.
+    """
+    settings = get_settings()
+    if not settings.search_index_enabled:
+        return ""
+    limit = settings.search_index_max_chars
+
+    try:
+        if prepared.compacted:
+            return _read_text_file(prepared.path, limit)
+
+        family = SUPPORTED_TYPES.get(checked.extension, ("", ""))[0]
+        if family == "text" and checked.extension not in EXTRACTABLE_EXTENSIONS:
+            return _read_text_file(tmp_path, limit)
+
+        if checked.extension in EXTRACTABLE_EXTENSIONS:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                get_extraction_pool(settings.text_extraction_workers),
+                extract_to_markdown,
+                tmp_path,
+                checked.extension,
+                limit,
+            )
+            if result.path is not None:
+                try:
+                    return _read_text_file(result.path, limit)
+                finally:
+                    os.unlink(result.path)
+    except Exception as e:
+        logger.warning(f"Could not read text of {tmp_path} for the search index: {e}")
+    return ""
+
+
+def index_file(db: Session, file_id: int, store_id: int, display_name: str, content: str) -> None:
+    """Add or replace a file in the index (part of the caller's transaction)"""
+    if not _available:
+        return
+    db.execute(text(f"DELETE FROM {TABLE} WHERE rowid = :id"), {"id": file_id})
+    db.execute(
+        text(f"INSERT INTO {TABLE} (rowid, display_name, content, store_id) VALUES (:id, :name, :content, :store_id)"),
+        {"id": file_id, "name": display_name, "content": content, "store_id": store_id},
+    )
+
+
+def index_missing(db: Session) -> None:
+    """Index by name the files that have no index row (part of the caller's transaction)"""
+    if _available:
+        db.execute(text(
+            f"INSERT INTO {TABLE} (rowid, display_name, content, store_id) "
+            f"SELECT id, display_name, '', store_id FROM files "
+            f"WHERE deleted_at IS NULL AND id NOT IN (SELECT rowid FROM {TABLE})"
+        ))
+
+
+def rename_files(db: Session, names: list[tuple[int, str]]) -> None:
+    """Update the indexed names of files, keeping their content (part of the caller's transaction)"""
+    if _available and names:
+        db.execute(
+            text(f"UPDATE {TABLE} SET display_name = :name WHERE rowid = :id"),
+            [{"id": file_id, "name": name} for file_id, name in names],
+        )
+
+
+def remove_file(db: Session, file_id: int) -> None:
+    """Remove a file from the index (part of the caller's transaction)"""
+    if _available:
+        db.execute(text(f"DELETE FROM {TABLE} WHERE rowid = :id"), {"id": file_id})
+
+
+def remove_store(db: Session, store_id: int) -> None:
+    """Remove all files of a Store from the index (part of the caller's transaction)"""
+    if _available:
+        db.execute(text(f"DELETE FROM {TABLE} WHERE store_id = :store_id"), {"store_id": store_id})
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted, so FTS5 operators typed by the user are treated as text.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(db: Session, store_id: int, query: str, limit: int = 20, offset: int = 0) -> tuple[list[SearchHit], int]:
+    """
+    Search a Store's documents.
+
+    Returns:
+        tuple: (hits ranked by BM25, total number of matches)
+
+    Raises:
+        SearchIndexUnavailable: If FTS5 is not available
+        ValueError: If the query has no searchable words
+    """
+    if not _available:
+        raise SearchIndexUnavailable("Full-text index is not available")
+    match = build_match_query(query)
+    if match is None:
+        raise ValueError("Zapytanie nie zawiera słów do wyszukania")
+
+    params = {"match": match, "store_id": store_id, "limit": limit, "offset": offset}
+    rows = db.execute(text(
+        f"SELECT rowid, display_name, "
+        f"snippet({TABLE}, 1, '<mark>', '</mark>', '…', 16), "
+        f"bm25({TABLE}, {NAME_WEIGHT}, {CONTENT_WEIGHT}) AS rank "
+        f"FROM {TABLE} WHERE {TABLE} MATCH :match AND store_id = :store_id "
+        f"ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), params).all()
+    total = db.execute(text(
+        f"SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH :match AND store_id = :store_id"
+    ), params).scalar()
+
+    hits = [
+        SearchHit(file_id=row[0], display_name=row[1], snippet=row[2] or "", score=-row[3])
+        for row in rows
+    ]
+    return hits, total
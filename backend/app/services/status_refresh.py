@@ -0,0 +1,335 @@
+"""
+Batched refresh of File statuses against Google.
+
+Uploads whose import was still running when the request ended are stored
+as IMPORTING, usually with the upload operation name as document_id.
+Instead of one get per file, the refresher reads each Store's documents
+with paged list calls and reconciles all of its rows at once:
+
+- a pending row whose operation name matches no document is matched to an
+  unclaimed document of the same display name; only ambiguous names fall
+  back to a get of the operation,
+- document state ACTIVE -> COMPLETED, FAILED -> FAILED, PENDING stays
+  IMPORTING (with the document name recorded),
+- after a full listing, rows whose document is gone are marked MISSING
+  (and become COMPLETED again if it reappears),
+- all changes of a Store are written in one transaction, bump the Store
+  version and are announced as file.status events.
+
+A scheduled pass refreshes the Stores that have IMPORTING files and stops
+listing once every pending row is resolved; an on-demand refresh of one
+Store (POST /stores/{id}/files/refresh-status) lists it completely.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import traced
+from app.database import SessionLocal
+from app.models import File, Store
+from app.schemas import FileResponse
+from app.services import store_events
+from app.services.google_file_search_service import get_google_file_search_service
+from app.services.store_events import get_event_broker
+from app.services.upstream_scheduler import Priority, get_upstream_scheduler
+
+logger = logging.getLogger(__name__)
+
+IMPORTING = "IMPORTING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+MISSING = "MISSING"
+
+# Statuses reconciled against the document listing
+RECONCILED_STATUSES = (IMPORTING, COMPLETED, MISSING)
+
+# Document state -> File status
+DOCUMENT_STATES = {
+    "STATE_ACTIVE": COMPLETED,
+    "STATE_PENDING": IMPORTING,
+    "STATE_FAILED": FAILED,
+}
+
+
+def _is_operation(name: str) -> bool:
+    return "/upload/operations/" in name
+
+
+def _state_name(state) -> str:
+    # The SDK returns an enum; the fake client plain strings
+    return str(getattr(state, "value", state) or "")
+
+
+@dataclass
+class RefreshResult:
+    """Outcome of refreshing one Store"""
+    store_id: int
+    checked: int = 0
+    updated: int = 0
+    api_calls: int = 0
+    listing_complete: bool = False
+    statuses: dict = field(default_factory=dict)  # New status -> number of rows moved to it
+
+
+@dataclass
+class _Row:
+    id: int
+    document_id: str
+    display_name: str
+    status: str
+
+
+class StatusRefresher:
+    """
+    Reconciles File rows with the documents of their FileSearchStore.
+
+    Args:
+        page_size: Documents per list call
+        operation_concurrency: Parallel operation gets for ambiguous rows
+        interval_seconds: Pause between scheduled passes
+    """
+
+    def __init__(self, page_size: int, operation_concurrency: int, interval_seconds: float):
+        self.page_size = page_size
+        self.operation_concurrency = max(1, operation_concurrency)
+        self.interval_seconds = interval_seconds
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "StatusRefresher":
+        return cls(
+            page_size=settings.status_refresh_page_size,
+            operation_concurrency=settings.status_refresh_operation_concurrency,
+            interval_seconds=settings.status_refresh_interval_seconds,
+        )
+
+    @staticmethod
+    def _load_rows(store_id: int, pending_only: bool) -> tuple[Optional[str], list[_Row], set]:
+        """Google name of the Store, rows to refresh and document names already taken by its rows"""
+        with SessionLocal() as db:
+            store = db.get(Store, store_id)
+            if store is None:
+                return None, [], set()
+            statuses = (IMPORTING,) if pending_only else RECONCILED_STATUSES
+            rows = db.query(File.id, File.document_id, File.display_name, File.status).filter(
+                File.store_id == store_id,
+                File.deleted_at.is_(None),
+                File.status.in_(statuses),
+            ).all()
+            claimed = {
+                document_id for (document_id,) in db.query(File.document_id).filter(File.store_id == store_id)
+                if "/documents/" in document_id
+            }
+            return store.google_store_name, [_Row(*row) for row in rows], claimed
+
+    def _list_documents(self, google_store_name: str, wanted: set, stop_early: bool) -> tuple[dict, bool, int]:
+        """
+        Read the Store's documents page by page.
+
+        Returns:
+            tuple: ({name: (display_name, state)}, listing complete, list calls made)
+        """
+        service = get_google_file_search_service()
+        documents = {}
+        remaining = set(wanted)
+        calls = 0
+        for page in service.list_document_pages(google_store_name, self.page_size):
+            calls += 1
+            for document in page:
+                documents[document.name] = (document.display_name, _state_name(document.state))
+                remaining.discard(document.name)
+            if stop_early and not remaining:
+                return documents, False, calls
+        return documents, True, calls
+
+    @traced("status_refresh.store", {"store.id": "store_id", "full": "full"})
+    async def refresh_store(self, store_id: int, full: bool = True) -> RefreshResult:
+        """
+        Refresh the statuses of one Store's files.
+
+        Args:
+            store_id: Local Store id
+            full: Reconcile every row (and detect missing documents); when
+                False only IMPORTING rows are resolved and the listing may stop early
+
+        Returns:
+            RefreshResult: What was checked and changed
+        """
+        result = RefreshResult(store_id=store_id)
+        lock = self._locks.setdefault(store_id, asyncio.Lock())
+        async with lock:
+            google_store_name, rows, claimed = await run_in_threadpool(self._load_rows, store_id, not full)
+            result.checked = len(rows)
+            if google_store_name is None or not rows:
+                return result
+
+            scheduler = get_upstream_scheduler()
+            started = time.perf_counter()
+            wanted = {row.document_id for row in rows if "/documents/" in row.document_id}
+            # Matching operations by name needs the whole listing
+            stop_early = not full and not any(_is_operation(row.document_id) for row in rows)
+            async with scheduler.slot(Priority.BULK, store_id):
+                documents, complete, calls = await run_in_threadpool(
+                    self._list_documents, google_store_name, wanted, stop_early
+                )
+            result.api_calls += calls
+            result.listing_complete = complete
+
+            resolved = await self._resolve_operations(store_id, rows, documents, claimed, result)
+            changes = self._reconcile(rows, documents, resolved, complete)
+            if changes:
+                await run_in_threadpool(self._apply, store_id, changes)
+            result.updated = len(changes)
+            for change in changes:
+                result.statuses[change["status"]] = result.statuses.get(change["status"], 0) + 1
+                metrics.inc("status_refresh_updates_total", labels={"status": change["status"]})
+            metrics.inc("status_refresh_api_calls_total", result.api_calls)
+            metrics.observe("status_refresh_seconds", time.perf_counter() - started)
+            if changes:
+                logger.info(f"Refreshed statuses of store {store_id}: {result}")
+            return result
+
+    async def _resolve_operations(self, store_id: int, rows: list[_Row], documents: dict, claimed: set, result: RefreshResult) -> dict:
+        """
+        Map rows holding an operation name to their document name.
+
+        Rows are matched by display name when exactly one pending row and one
+        document no other row holds share it; the rest get their operation.
+        """
+        pending = [row for row in rows if _is_operation(row.document_id)]
+        by_name: dict[str, list] = {}
+        for name, (display_name, _) in documents.items():
+            if name not in claimed:
+                by_name.setdefault(display_name, []).append(name)
+        pending_names: dict[str, int] = {}
+        for row in pending:
+            pending_names[row.display_name] = pending_names.get(row.display_name, 0) + 1
+
+        resolved: dict[int, str] = {}
+        ambiguous = []
+        for row in pending:
+            candidates = by_name.get(row.display_name, [])
+            if len(candidates) == 1 and pending_names[row.display_name] == 1:
+                resolved[row.id] = candidates[0]
+            else:
+                ambiguous.append(row)
+
+        service = get_google_file_search_service()
+        scheduler = get_upstream_scheduler()
+        slots = asyncio.Semaphore(self.operation_concurrency)
+
+        async def get_operation(row: _Row) -> None:
+            async with slots:
+                try:
+                    async with scheduler.slot(Priority.BULK, store_id):
+                        operation = await run_in_threadpool(service.get_upload_operation, row.document_id)
+                except Exception as e:
+                    logger.info(f"Could not get operation {row.document_id}: {str(e)}")
+                    return
+                finally:
+                    result.api_calls += 1
+                if operation.done and getattr(operation, "error", None):
+                    resolved[row.id] = FAILED
+                elif operation.done and operation.response:
+                    resolved[row.id] = operation.response.document_name
+
+        await asyncio.gather(*(get_operation(row) for row in ambiguous))
+        return resolved
+
+    @staticmethod
+    def _reconcile(rows: list[_Row], documents: dict, resolved: dict, listing_complete: bool) -> list[dict]:
+        changes = []
+        for row in rows:
+            document_id = resolved.get(row.id, row.document_id)
+            if document_id == FAILED:
+                changes.append({"id": row.id, "status": FAILED})
+                continue
+            if "/documents/" not in document_id:
+                continue  # Unresolved operation or Files API name
+            change = {"id": row.id}
+            if document_id != row.document_id:
+                change["document_id"] = document_id
+            if document_id in documents:
+                status = DOCUMENT_STATES.get(documents[document_id][1], row.status)
+            elif listing_complete:
+                status = MISSING
+            else:
+                status = row.status
+            if status != row.status:
+                change["status"] = status
+            if len(change) > 1:
+                change.setdefault("status", row.status)
+                changes.append(change)
+        return changes
+
+    @staticmethod
+    def _apply(store_id: int, changes: list[dict]) -> None:
+        """Write all changes of a Store in one transaction and announce them"""
+        with SessionLocal() as db:
+            # Rows deleted meanwhile keep their deletion state
+            live = {
+                file_id for (file_id,) in db.query(File.id).filter(
+                    File.id.in_([change["id"] for change in changes]), File.deleted_at.is_(None)
+                )
+            }
+            changes = [change for change in changes if change["id"] in live]
+            if not changes:
+                return
+            db.execute(update(File), changes)
+            store = db.get(Store, store_id)
+            store.bump_version()
+            db.commit()
+            broker = get_event_broker()
+            for file in db.query(File).filter(File.id.in_(list(live))):
+                broker.publish(store_id, store_events.FILE_STATUS, {
+                    "upload_id": None,
+                    "file": FileResponse.model_validate(file).model_dump(mode="json"),
+                })
+
+    @staticmethod
+    def _stores_with_pending() -> list[int]:
+        with SessionLocal() as db:
+            return [
+                store_id for (store_id,) in db.query(File.store_id).filter(
+                    File.status == IMPORTING, File.deleted_at.is_(None)
+                ).distinct()
+            ]
+
+    async def refresh_pending(self) -> list[RefreshResult]:
+        """Resolve the IMPORTING files of every Store that has some"""
+        results = []
+        for store_id in await run_in_threadpool(self._stores_with_pending):
+            try:
+                results.append(await self.refresh_store(store_id, full=False))
+            except Exception as e:
+                metrics.inc("status_refresh_failures_total")
+                logger.warning(f"Status refresh of store {store_id} failed: {str(e)}")
+        return results
+
+    async def run_loop(self) -> None:
+        """Refresh pending statuses for the app lifetime (background task)"""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.refresh_pending()
+            except Exception as e:
+                logger.warning(f"Status refresh pass failed: {str(e)}")
+
+
+# Singleton instance
+_refresher_instance: Optional[StatusRefresher] = None
+
+
+def get_status_refresher() -> StatusRefresher:
+    """Get singleton instance of StatusRefresher"""
+    global _refresher_instance
+    if _refresher_instance is None:
+        _refresher_instance = StatusRefresher.from_settings(get_settings())
+    return _refresher_instance
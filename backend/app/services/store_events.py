@@ -0,0 +1,127 @@
+"""
+In-process publish/subscribe of per-store ingestion events.
+
+Upload routes (and the worker threads they start) publish events such as
+upload progress, Google operation state and final file status; the
+``GET /stores/{id}/events`` endpoint streams them to clients as
+Server-Sent Events so the frontend no longer has to re-fetch file lists.
+
+Each store keeps a short history so a reconnecting EventSource can resume
+from its ``Last-Event-ID``. Subscribers that fall behind lose their oldest
+queued events instead of blocking publishers.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.metrics import metrics
+
+# Event types
+UPLOAD_STARTED = "upload.started"
+UPLOAD_PROGRESS = "upload.progress"
+UPLOAD_OPERATION = "upload.operation"
+UPLOAD_FAILED = "upload.failed"
+FILE_STATUS = "file.status"
+FILE_DELETED = "file.deleted"
+
+
+@dataclass
+class StoreEvent:
+    id: int
+    type: str
+    data: dict
+
+    def encode(self) -> str:
+        """Format the event as a Server-Sent Events message"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, event: StoreEvent) -> None:
+        """Enqueue an event (runs on the subscriber's loop), dropping the oldest when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            metrics.inc("store_events_dropped_total")
+        self.queue.put_nowait(event)
+
+
+class StoreEventBroker:
+    """Fan-out of store events to the subscribed SSE streams"""
+
+    def __init__(self, history_size: int = 200, queue_size: int = 500):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history: dict[int, deque] = defaultdict(lambda: deque(maxlen=self.history_size))
+        self._subscribers: dict[int, set] = defaultdict(set)
+
+    def publish(self, store_id: int, event_type: str, data: dict) -> StoreEvent:
+        """
+        Publish an event to every subscriber of a store.
+
+        Safe to call from the event loop and from worker threads.
+        """
+        with self._lock:
+            event = StoreEvent(next(self._ids), event_type, {"store_id": store_id, **data})
+            self._history[store_id].append(event)
+            subscribers = list(self._subscribers.get(store_id, ()))
+        metrics.inc("store_events_published_total", labels={"type": event_type})
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+            except RuntimeError:
+                pass  # Loop already closed; the stream is going away
+        return event
+
+    def subscribe(self, store_id: int, last_event_id: Optional[int] = None) -> tuple[_Subscriber, list]:
+        """
+        Register a subscriber on the running loop.
+
+        Returns:
+            tuple: (subscriber, events after last_event_id still in the history)
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers[store_id].add(subscriber)
+            backlog = []
+            if last_event_id is not None:
+                backlog = [event for event in self._history.get(store_id, ()) if event.id > last_event_id]
+        metrics.add_gauge("store_event_subscribers", 1)
+        return subscriber, backlog
+
+    def unsubscribe(self, store_id: int, subscriber: _Subscriber) -> None:
+        """Remove a subscriber registered with subscribe()"""
+        with self._lock:
+            subscribers = self._subscribers.get(store_id)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[store_id]
+        metrics.add_gauge("store_event_subscribers", -1)
+
+    def forget_store(self, store_id: int) -> None:
+        """Drop the history of a deleted store"""
+        with self._lock:
+            self._history.pop(store_id, None)
+
+
+# Singleton instance
+_broker_instance: Optional[StoreEventBroker] = None
+
+
+def get_event_broker() -> StoreEventBroker:
+    """Get singleton instance of StoreEventBroker"""
+    global _broker_instance
+    if _broker_instance is None:
+        _broker_instance = StoreEventBroker()
+    return _broker_instance
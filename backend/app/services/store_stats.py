@@ -0,0 +1,58 @@
+"""
+Materialized per-Store file statistics.
+
+Store.file_count, total_bytes and last_upload_at describe the visible (not
+deleted) files of a Store. The upload and delete paths update them in the
+transaction that changes the files (Store.record_files_added/removed), so
+listing Stores never aggregates the files table. recompute_store_stats()
+rebuilds them from the files with one grouped query; it backs the
+`repair-stats` command and bulk paths such as the metadata import.
+"""
+import logging
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import File, Store
+
+logger = logging.getLogger(__name__)
+
+
+def recompute_store_stats(db: Session, store_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the statistics of Stores from their files (part of the caller's transaction).
+
+    Args:
+        db: Session; the caller commits
+        store_ids: Stores to repair (all when None)
+
+    Returns:
+        int: Number of Stores whose statistics were wrong and have been fixed
+    """
+    store_ids = list(store_ids) if store_ids is not None else None
+    totals = db.query(
+        File.store_id,
+        func.count(File.id),
+        func.coalesce(func.sum(File.size_bytes), 0),
+        func.max(File.upload_date),
+    ).filter(File.deleted_at.is_(None))
+    stores = db.query(Store)
+    if store_ids is not None:
+        totals = totals.filter(File.store_id.in_(store_ids))
+        stores = stores.filter(Store.id.in_(store_ids))
+    by_store = {store_id: (count, size, last) for store_id, count, size, last in totals.group_by(File.store_id)}
+
+    fixed = 0
+    for store in stores:
+        count, size, last = by_store.get(store.id, (0, 0, None))
+        if (store.file_count, store.total_bytes, store.last_upload_at) == (count, size, last):
+            continue
+        logger.info(
+            f"Store {store.id} statistics: files {store.file_count} -> {count}, "
+            f"bytes {store.total_bytes} -> {size}"
+        )
+        store.file_count, store.total_bytes, store.last_upload_at = count, size, last
+        store.bump_version()  # Changes the Store list ETag
+        fixed += 1
+    return fixed
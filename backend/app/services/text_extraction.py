@@ -0,0 +1,299 @@
+"""
+Local text extraction for pre-ingestion compaction.
+
+Turns PDF, Office/OpenDocument and HTML files into plain text/markdown so
+only the indexable text is shipped to Google. The functions are pure and
+picklable: they run in a process pool so CPU-bound parsing never blocks
+request handling.
+
+PDF extraction needs the optional ``pypdf`` package; without it PDFs are
+uploaded unchanged. Callers that only need the beginning of the text (the
+search index) pass max_chars, and the extractors stop parsing once they
+have collected that much. Zip-based documents whose members would inflate beyond
+MAX_UNCOMPRESSED_BYTES, or compress suspiciously well (zip bombs), are not
+extracted either.
+"""
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import IO, Optional
+from xml.etree import ElementTree
+
+EXTRACTABLE_EXTENSIONS = {".pdf", ".docx", ".pptx", ".xlsx", ".odt", ".html", ".htm"}
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+S_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+ODF_TEXT_NS = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+
+# Limits checked on the zip directory before any member is decompressed
+MAX_UNCOMPRESSED_BYTES = 512 * 1024 * 1024  # Sum of the members' declared sizes
+MAX_COMPRESSION_RATIO = 100  # Office XML compresses ~5-20x; bombs go far beyond
+RATIO_CHECK_MIN_BYTES = 1024 * 1024  # Small members may compress arbitrarily well
+
+
+@dataclass
+class ExtractionResult:
+    """Outcome of extracting one file (returned from the worker process)"""
+    path: Optional[str]  # Path of the compact .md file, None if nothing usable was extracted
+    original_bytes: int
+    extracted_bytes: int
+    seconds: float
+
+
+class _TextBudget:
+    """Characters an extractor may still collect (unlimited when max_chars is None)"""
+
+    def __init__(self, max_chars: Optional[int] = None):
+        self.remaining = max_chars
+
+    def spend(self, text: str) -> str:
+        if self.remaining is not None:
+            self.remaining -= len(text)
+        return text
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining is not None and self.remaining <= 0
+
+
+def _iter_text(stream: IO[bytes], paragraph_tag: str, text_tag: str, budget: Optional[_TextBudget] = None) -> list[str]:
+    """Collect text runs grouped into paragraphs, parsing the XML incrementally"""
+    budget = budget or _TextBudget()
+    paragraphs = []
+    current = []
+    for _, element in ElementTree.iterparse(stream, events=("end",)):
+        if element.tag == text_tag and element.text:
+            current.append(element.text)
+        elif element.tag == paragraph_tag:
+            text = "".join(current).strip()
+            if text:
+                paragraphs.append(budget.spend(text))
+                if budget.exhausted:
+                    break
+            current = []
+            element.clear()
+    return paragraphs
+
+
+def _sort_numbered(names, pattern: str) -> list[str]:
+    """Names matching pattern, ordered by their last number (sheet2 before sheet10)"""
+    return sorted(
+        (name for name in names if re.match(pattern, name)),
+        key=lambda name: int(re.findall(r"\d+", name)[-1]),
+    )
+
+
+def _open_zip(path: str) -> zipfile.ZipFile:
+    """
+    Open a zip-based document after checking its members' declared sizes.
+
+    zipfile never inflates a member past its declared size, so the check
+    bounds what extraction can decompress.
+
+    Raises:
+        ValueError: If the members are too large or compressed too well
+    """
+    archive = zipfile.ZipFile(path)
+    total = 0
+    for info in archive.infolist():
+        total += info.file_size
+        if info.file_size > RATIO_CHECK_MIN_BYTES and info.file_size > info.compress_size * MAX_COMPRESSION_RATIO:
+            archive.close()
+            raise ValueError(f"{info.filename} is compressed more than {MAX_COMPRESSION_RATIO}x")
+    if total > MAX_UNCOMPRESSED_BYTES:
+        archive.close()
+        raise ValueError(f"Members inflate to {total} bytes")
+    return archive
+
+
+def _extract_docx(path: str, max_chars: Optional[int] = None) -> str:
+    with _open_zip(path) as archive:
+        return "\n\n".join(_iter_text(
+            archive.open("word/document.xml"), f"{W_NS}p", f"{W_NS}t", _TextBudget(max_chars)
+        ))
+
+
+def _extract_pptx(path: str, max_chars: Optional[int] = None) -> str:
+    budget = _TextBudget(max_chars)
+    with _open_zip(path) as archive:
+        slides = _sort_numbered(archive.namelist(), r"ppt/slides/slide\d+\.xml$")
+        sections = []
+        for number, name in enumerate(slides, start=1):
+            paragraphs = _iter_text(archive.open(name), f"{A_NS}p", f"{A_NS}t", budget)
+            if paragraphs:
+                sections.append(f"## Slajd {number}\n\n" + "\n".join(paragraphs))
+            if budget.exhausted:
+                break
+        return "\n\n".join(sections)
+
+
+def _extract_xlsx(path: str, max_chars: Optional[int] = None) -> str:
+    budget = _TextBudget(max_chars)
+    with _open_zip(path) as archive:
+        # Cells refer to shared strings by index, so those are always read whole
+        shared = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            shared = _iter_text(archive.open("xl/sharedStrings.xml"), f"{S_NS}si", f"{S_NS}t")
+        sheets = _sort_numbered(archive.namelist(), r"xl/worksheets/sheet\d+\.xml$")
+        sections = []
+        for name in sheets:
+            rows = []
+            for _, row in ElementTree.iterparse(archive.open(name), events=("end",)):
+                if row.tag != f"{S_NS}row":
+                    continue
+                values = []
+                for cell in row.iter(f"{S_NS}c"):
+                    value = cell.find(f"{S_NS}v")
+                    inline = cell.find(f"{S_NS}is/{S_NS}t")
+                    if cell.get("t") == "s" and value is not None and value.text and value.text.isdigit():
+                        index = int(value.text)
+                        values.append(shared[index] if index < len(shared) else "")
+                    elif inline is not None:
+                        values.append(inline.text or "")
+                    elif value is not None:
+                        values.append(value.text or "")
+                if any(values):
+                    rows.append(budget.spend("\t".join(values)))
+                row.clear()
+                if budget.exhausted:
+                    break
+            if rows:
+                sections.append(f"## {os.path.basename(name)[:-4]}\n\n" + "\n".join(rows))
+            if budget.exhausted:
+                break
+        return "\n\n".join(sections)
+
+
+def _extract_odt(path: str, max_chars: Optional[int] = None) -> str:
+    budget = _TextBudget(max_chars)
+    with _open_zip(path) as archive:
+        paragraphs = []
+        for _, element in ElementTree.iterparse(archive.open("content.xml"), events=("end",)):
+            if element.tag in (f"{ODF_TEXT_NS}p", f"{ODF_TEXT_NS}h"):
+                text = "".join(element.itertext()).strip()
+                if text:
+                    paragraphs.append(budget.spend(text))
+                    if budget.exhausted:
+                        break
+                element.clear()
+        return "\n\n".join(paragraphs)
+
+
+class _HTMLTextParser(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template"}
+    BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self, budget: _TextBudget):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.budget = budget
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(self.budget.spend(data))
+
+
+def _extract_html(path: str, max_chars: Optional[int] = None) -> str:
+    parser = _HTMLTextParser(_TextBudget(max_chars))
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parser.feed(line)
+            if parser.budget.exhausted:
+                break
+    parser.close()
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _extract_pdf(path: str, max_chars: Optional[int] = None) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ""
+    budget = _TextBudget(max_chars)
+    reader = PdfReader(path)
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        text = (page.extract_text() or "").strip()
+        if text:
+            pages.append(budget.spend(f"## Strona {number}\n\n{text}"))
+            if budget.exhausted:
+                break
+    return "\n\n".join(pages)
+
+
+EXTRACTORS = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".pptx": _extract_pptx,
+    ".xlsx": _extract_xlsx,
+    ".odt": _extract_odt,
+    ".html": _extract_html,
+    ".htm": _extract_html,
+}
+
+
+def extract_to_markdown(path: str, extension: str, max_chars: Optional[int] = None) -> ExtractionResult:
+    """
+    Extract a file's text into a sibling .md file.
+
+    Runs inside a worker process. Parsing errors and documents without a
+    text layer (e.g. scanned PDFs) yield a result with path=None so the
+    caller falls back to the original. With max_chars only the beginning
+    of the text is extracted (and written).
+    """
+    start = time.perf_counter()
+    original_bytes = os.path.getsize(path)
+    try:
+        text = EXTRACTORS[extension](path, max_chars)
+    except Exception:
+        text = ""
+    if max_chars is not None:
+        text = text[:max_chars]
+    if not text.strip():
+        return ExtractionResult(None, original_bytes, 0, time.perf_counter() - start)
+
+    output_path = f"{path}.md"
+    data = text.encode("utf-8")
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return ExtractionResult(output_path, original_bytes, len(data), time.perf_counter() - start)
+
+
+# Lazily created process pool shared by all requests
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extraction_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get the shared process pool used for extraction"""
+    global _pool
+    if _pool is None:
+        # Workers are spawned, not forked: forking the multithreaded server can
+        # copy locks held by other threads into the child
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the worker processes (called on application shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,262 @@
+"""
+Streaming pre-flight validation of uploads.
+
+Every check runs on the first chunk or incrementally while the upload is
+streamed to the temporary file, so bad files are rejected long before any
+bytes are sent to Google:
+
+- declared (Content-Length) and actual size against the configured limit,
+- supported extension,
+- MIME type sniffed from the leading bytes (the extension is not trusted),
+- encrypted documents (password-protected OOXML, encrypted PDF),
+- empty documents.
+"""
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import status
+
+# Extension -> (content family, MIME type sent to Google)
+SUPPORTED_TYPES = {
+    # Documents
+    ".pdf": ("pdf", "application/pdf"),
+    ".docx": ("ooxml", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ".xlsx": ("ooxml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    ".pptx": ("ooxml", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+    ".odt": ("odf", "application/vnd.oasis.opendocument.text"),
+    ".doc": ("ole2", "application/msword"),
+    ".xls": ("ole2", "application/vnd.ms-excel"),
+    ".ppt": ("ole2", "application/vnd.ms-powerpoint"),
+    ".rtf": ("rtf", "application/rtf"),
+    ".zip": ("zip", "application/zip"),
+    # Text
+    ".txt": ("text", "text/plain"),
+    ".md": ("text", "text/markdown"),
+    ".csv": ("text", "text/csv"),
+    ".tsv": ("text", "text/tab-separated-values"),
+    ".html": ("text", "text/html"),
+    ".htm": ("text", "text/html"),
+    ".log": ("text", "text/plain"),
+    # Code and structured text
+    ".json": ("text", "application/json"),
+    ".xml": ("text", "application/xml"),
+    ".yaml": ("text", "text/yaml"),
+    ".yml": ("text", "text/yaml"),
+    ".py": ("text", "text/x-python"),
+    ".js": ("text", "text/javascript"),
+    ".ts": ("text", "text/x-typescript"),
+    ".java": ("text", "text/x-java"),
+    ".c": ("text", "text/x-c"),
+    ".h": ("text", "text/x-c"),
+    ".cpp": ("text", "text/x-c++"),
+    ".cs": ("text", "text/x-csharp"),
+    ".go": ("text", "text/x-go"),
+    ".rb": ("text", "text/x-ruby"),
+    ".php": ("text", "text/x-php"),
+    ".sh": ("text", "text/x-sh"),
+    ".sql": ("text", "application/sql"),
+    ".css": ("text", "text/css"),
+    ".tex": ("text", "text/x-tex"),
+}
+
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# Binary formats that must never pass as a text or document upload
+FOREIGN_MAGIC = {
+    b"\x89PNG": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"GIF8": "image/gif",
+    b"\x7fELF": "application/x-executable",
+    b"\x1f\x8b": "application/gzip",
+    b"7z\xbc\xaf": "application/x-7z-compressed",
+    b"Rar!": "application/vnd.rar",
+}
+
+PDF_ENCRYPT_MARKER = b"/Encrypt"
+
+# Leading bytes collected before the content is sniffed (covers the PE
+# header offset of ordinary Windows executables)
+HEAD_BYTES = 4096
+
+# Allowance for multipart boundaries and part headers over the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class PreflightError(Exception):
+    """Upload rejected by pre-flight validation"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class PreflightResult:
+    """Facts established while streaming the upload"""
+    size_bytes: int
+    sha256: str
+    mime_type: str
+    extension: str
+
+
+def _is_windows_executable(head: bytes) -> bool:
+    """MZ header whose e_lfanew offset points at a PE signature"""
+    if not head.startswith(b"MZ") or len(head) < 64:
+        return False
+    offset = int.from_bytes(head[60:64], "little")
+    return head[offset:offset + 4] == b"PE\0\0"
+
+
+def _sniff_family(head: bytes) -> Optional[str]:
+    """Identify the content family from the leading bytes"""
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(OLE2_MAGIC):
+        return "ole2"
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return "zip"
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    for magic in FOREIGN_MAGIC:
+        if head.startswith(magic):
+            return "foreign"
+    if _is_windows_executable(head):
+        return "foreign"  # A bare "MZ" is also how plenty of text starts
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "text"  # UTF-16 with BOM
+    if b"\x00" in head:
+        return "binary"
+    return "text"
+
+
+def check_content_length(content_length: Optional[str], max_bytes: int) -> None:
+    """
+    Reject a multipart request whose Content-Length already exceeds the limit.
+
+    Runs before a single byte of the body is read.
+
+    Raises:
+        PreflightError: 413 when the body cannot fit under max_bytes
+    """
+    if content_length is not None and content_length.isdigit():
+        if int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise PreflightError(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"Plik jest za duży (limit: {max_bytes // (1024 * 1024)} MB)"
+            )
+
+
+class UploadPreflight:
+    """
+    Incremental validator fed with the upload's chunks.
+
+    Usage:
+        preflight = UploadPreflight(filename, declared_size, max_bytes)
+        for chunk in stream:
+            preflight.feed(chunk)   # raises PreflightError
+        result = preflight.finish() # raises PreflightError
+    """
+
+    def __init__(self, filename: Optional[str], declared_size: Optional[int], max_bytes: int):
+        if not filename:
+            raise PreflightError(status.HTTP_422_UNPROCESSABLE_ENTITY, "Brak nazwy pliku")
+
+        self.filename = filename
+        self.extension = Path(filename).suffix.lower()
+        if self.extension not in SUPPORTED_TYPES:
+            raise PreflightError(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                f"Nieobsługiwany typ pliku: '{self.extension or filename}'"
+            )
+        self.family, self.mime_type = SUPPORTED_TYPES[self.extension]
+
+        self.max_bytes = max_bytes
+        if declared_size is not None:
+            if declared_size > max_bytes:
+                raise self._too_large()
+            if declared_size == 0:
+                raise PreflightError(status.HTTP_422_UNPROCESSABLE_ENTITY, "Plik jest pusty")
+
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._head = b""  # Leading bytes until the content is sniffed
+        self._head_checked = False
+        self._tail = b""  # Overlap between chunks for marker scanning
+        self._pdf_encrypted = False
+
+    def _too_large(self) -> PreflightError:
+        return PreflightError(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Plik jest za duży (limit: {self.max_bytes // (1024 * 1024)} MB)"
+        )
+
+    def _check_head(self, head: bytes) -> None:
+        sniffed = _sniff_family(head)
+        expected = self.family
+
+        if expected == "ooxml" and sniffed == "ole2":
+            # Password-protected OOXML documents are wrapped in an OLE2 container
+            raise PreflightError(
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+                "Plik jest zaszyfrowany (chroniony hasłem)"
+            )
+
+        compatible = {
+            "ooxml": ("zip",),
+            "odf": ("zip",),
+            "zip": ("zip",),
+        }.get(expected, (expected,))
+        if sniffed not in compatible:
+            raise PreflightError(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                f"Zawartość pliku nie odpowiada rozszerzeniu '{self.extension}'"
+            )
+
+        if expected == "text" and head.lstrip()[:15].lower().startswith((b"<!doctype html", b"<html")):
+            self.mime_type = "text/html"
+
+    def feed(self, chunk: bytes) -> None:
+        """Validate the next chunk of the upload"""
+        if not chunk:
+            return
+        if not self._head_checked:
+            self._head += chunk
+            if len(self._head) >= HEAD_BYTES:
+                self._check_head(self._head)
+                self._head_checked = True
+                self._head = b""
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise self._too_large()
+        self._hash.update(chunk)
+
+        if self.family == "pdf" and not self._pdf_encrypted:
+            # The /Encrypt entry lives in the trailer; scan with overlap so a
+            # marker split between chunks is still found
+            window = self._tail + chunk
+            if PDF_ENCRYPT_MARKER in window:
+                self._pdf_encrypted = True
+            self._tail = window[-len(PDF_ENCRYPT_MARKER):]
+
+    def finish(self) -> PreflightResult:
+        """Run end-of-stream checks and return the validated facts"""
+        if self.size == 0:
+            raise PreflightError(status.HTTP_422_UNPROCESSABLE_ENTITY, "Plik jest pusty")
+        if not self._head_checked:
+            self._check_head(self._head)
+            self._head_checked = True
+        if self._pdf_encrypted:
+            raise PreflightError(
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+                "Plik PDF jest zaszyfrowany (chroniony hasłem)"
+            )
+        return PreflightResult(
+            size_bytes=self.size,
+            sha256=self._hash.hexdigest(),
+            mime_type=self.mime_type,
+            extension=self.extension,
+        )
@@ -0,0 +1,188 @@
+"""
+Priority-aware, fair scheduling of upstream Google calls.
+
+Every generation and upload takes a slot from a shared pool of
+SCHEDULER_MAX_CONCURRENCY before calling Google. Waiting calls are granted
+slots:
+
+- by priority class: interactive chat > single upload > bulk (archive
+  entries and other batch work),
+- within a class, fairly across Stores with start-time fair queuing: each
+  call is tagged with a virtual start time that advances by cost/weight
+  per Store, so one Store's bulk ingest cannot starve another Store,
+- with SCHEDULER_INTERACTIVE_RESERVED slots that only interactive calls may
+  use, so chat keeps a fast path even while long uploads hold the rest.
+
+Each class has a bounded queue; a full queue raises SchedulerQueueFull
+(mapped to 503 by the routes) instead of letting latency grow unbounded.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Hashable, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+
+
+class Priority(IntEnum):
+    """Priority classes, highest first"""
+    INTERACTIVE = 0
+    UPLOAD = 1
+    BULK = 2
+
+
+class SchedulerQueueFull(Exception):
+    """The queue of a priority class is full"""
+
+    def __init__(self, priority: Priority):
+        super().__init__(f"Upstream queue '{priority.name.lower()}' is full")
+        self.priority = priority
+
+
+@dataclass(order=True)
+class _Waiter:
+    start_tag: float
+    seq: int
+    priority: Priority = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class UpstreamScheduler:
+    """Slot pool shared by all upstream Google calls of the process"""
+
+    def __init__(self, max_concurrency: int, interactive_reserved: int, queue_limits: dict):
+        self.max_concurrency = max(1, max_concurrency)
+        self.interactive_reserved = min(max(0, interactive_reserved), self.max_concurrency - 1)
+        self.queue_limits = queue_limits
+        self._seq = itertools.count()
+        self._queues: dict[Priority, list] = {priority: [] for priority in Priority}
+        self._depth = {priority: 0 for priority in Priority}
+        self._in_flight = {priority: 0 for priority in Priority}
+        self._virtual_time = {priority: 0.0 for priority in Priority}
+        self._last_tag: dict[Priority, dict] = {priority: {} for priority in Priority}
+
+    @classmethod
+    def from_settings(cls, settings) -> "UpstreamScheduler":
+        return cls(
+            max_concurrency=settings.scheduler_max_concurrency,
+            interactive_reserved=settings.scheduler_interactive_reserved,
+            queue_limits={
+                Priority.INTERACTIVE: settings.scheduler_queue_limit_interactive,
+                Priority.UPLOAD: settings.scheduler_queue_limit_upload,
+                Priority.BULK: settings.scheduler_queue_limit_bulk,
+            },
+        )
+
+    def _total_in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def _capacity_for(self, priority: Priority) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.max_concurrency
+        return self.max_concurrency - self.interactive_reserved
+
+    def _update_gauges(self, priority: Priority) -> None:
+        labels = {"class": priority.name.lower()}
+        metrics.set_gauge("scheduler_queue_depth", self._depth[priority], labels)
+        metrics.set_gauge("scheduler_in_flight", self._in_flight[priority], labels)
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the best waiting calls"""
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue and self._total_in_flight() < self._capacity_for(priority):
+                waiter = heapq.heappop(queue)
+                if waiter.cancelled:
+                    continue
+                self._depth[priority] -= 1
+                self._in_flight[priority] += 1
+                self._virtual_time[priority] = waiter.start_tag
+                waiter.future.set_result(None)
+                self._update_gauges(priority)
+
+    async def acquire(self, priority: Priority, key: Hashable, cost: float = 1.0, weight: float = 1.0) -> None:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: Priority class of the call
+            key: Fairness key (the Store)
+            cost: Relative cost of the call (e.g. size of an upload)
+            weight: Share of the key within its class
+
+        Raises:
+            SchedulerQueueFull: If the class queue is at its limit
+        """
+        labels = {"class": priority.name.lower()}
+        if self._depth[priority] >= self.queue_limits[priority]:
+            metrics.inc("scheduler_rejected_total", labels=labels)
+            raise SchedulerQueueFull(priority)
+
+        last_tags = self._last_tag[priority]
+        start_tag = max(self._virtual_time[priority], last_tags.get(key, 0.0))
+        last_tags[key] = start_tag + cost / weight
+        waiter = _Waiter(
+            start_tag=start_tag,
+            seq=next(self._seq),
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queues[priority], waiter)
+        self._depth[priority] += 1
+        self._dispatch()
+        self._update_gauges(priority)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(priority)  # Granted just before the cancellation
+            else:
+                waiter.cancelled = True
+                self._depth[priority] -= 1
+                self._update_gauges(priority)
+            raise
+        metrics.observe("scheduler_wait_seconds", time.monotonic() - waiter.enqueued_at, labels)
+
+        if len(last_tags) > 10000:
+            # Forget keys that are behind the virtual clock; their tag would be reset anyway
+            now = self._virtual_time[priority]
+            for stale in [k for k, tag in last_tags.items() if tag <= now]:
+                del last_tags[stale]
+
+    def release(self, priority: Priority) -> None:
+        """Return a slot taken with acquire()"""
+        self._in_flight[priority] -= 1
+        self._update_gauges(priority)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, key: Hashable, cost: float = 1.0, weight: float = 1.0):
+        """Hold a slot for the duration of the block"""
+        with tracer.span("scheduler.wait", {"class": priority.name.lower()}):
+            await self.acquire(priority, key, cost, weight)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+
+# Singleton instance
+_scheduler_instance: Optional[UpstreamScheduler] = None
+
+
+def get_upstream_scheduler() -> UpstreamScheduler:
+    """Get singleton instance of UpstreamScheduler"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = UpstreamScheduler.from_settings(get_settings())
+    return _scheduler_instance
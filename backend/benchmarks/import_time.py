@@ -0,0 +1,116 @@
+"""
+Import-time regression check for the backend.
+
+Measures how long ``import app.main`` takes in a fresh interpreter (using
+``python -X importtime``) and fails when the median exceeds a budget or when
+a module that must stay lazy (the google.genai SDK) is imported eagerly.
+
+Usage (from backend/):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 800 --runs 7 --top 15
+
+tests/test_import_time.py enforces the lazy imports and a budget for the
+app's own modules over the framework baseline (FRAMEWORK_MODULES), which
+unlike the absolute budget does not depend on the machine.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+DEFAULT_BUDGET_MS = 1000.0
+
+# Third-party stack app.main stands on; its import time is the machine baseline
+FRAMEWORK_MODULES = ("fastapi", "fastapi.responses", "sqlalchemy.orm", "pydantic_settings")
+# Import time of the app's own modules over that baseline (machine-independent budget)
+DEFAULT_OVERHEAD_BUDGET_MS = 400.0
+
+# Heavy modules that must only be imported on first use
+LAZY_MODULES = ("google.genai",)
+
+
+def measure_once(module: str) -> tuple[float, list[tuple[int, str]]]:
+    """Import a module in a fresh interpreter; returns (cumulative ms, [(us, name), ...])"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        entries.append((int(cumulative_us), name))
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us / 1000.0, entries
+
+
+def measure_wall(modules: tuple) -> float:
+    """Wall-clock ms of importing the modules in a fresh interpreter"""
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {', '.join(modules)}; print((time.perf_counter() - started) * 1000)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def app_overhead_ms(module: str = "app.main", runs: int = 3) -> float:
+    """Best-of-runs import time of the module minus the best of its framework baseline"""
+    app_ms = min(measure_wall((module,)) for _ in range(runs))
+    framework_ms = min(measure_wall(FRAMEWORK_MODULES) for _ in range(runs))
+    return app_ms - framework_ms
+
+
+def eagerly_imported(module: str) -> list[str]:
+    """Return the LAZY_MODULES that are loaded by importing the module"""
+    code = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    output = result.stdout.strip().splitlines()
+    return [m for m in (output[-1] if output else "").split(",") if m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum median import time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh-interpreter runs")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports of the last run")
+    args = parser.parse_args()
+
+    timings = []
+    entries = []
+    for _ in range(args.runs):
+        elapsed_ms, entries = measure_once(args.module)
+        timings.append(elapsed_ms)
+    median_ms = statistics.median(timings)
+
+    print(f"import {args.module}: median {median_ms:.0f} ms, min {min(timings):.0f} ms, "
+          f"max {max(timings):.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("\nSlowest imports (cumulative, last run):")
+    for cumulative_us, name in sorted(entries, reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    eager = eagerly_imported(args.module)
+    if eager:
+        print(f"\nFAIL: modules that must be lazy were imported: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"\nFAIL: import time {median_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
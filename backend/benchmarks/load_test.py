@@ -0,0 +1,237 @@
+"""
+Concurrent load test for the Gemini RAG Manager API.
+
+Drives the real FastAPI application with a weighted mix of requests and
+reports throughput and p50/p95/p99 latency per route. By default the app is
+run in-process against the offline FakeGenaiClient (GENAI_BACKEND=fake) and a
+throwaway SQLite database, so no API key or quota is needed.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 16 --duration 20
+    python -m benchmarks.load_test --json results.json
+    python -m benchmarks.load_test --compare results.json
+    python -m benchmarks.load_test --base-url http://localhost:8000  # running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+
+DEFAULT_MIX = "chat=4,list_stores=3,list_files=3,upload=1"
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(mix: str) -> dict:
+    """Parse 'chat=4,list_stores=3' into {'chat': 4.0, 'list_stores': 3.0}"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+class LoadTest:
+    """Weighted request mix executed by a pool of concurrent workers"""
+
+    def __init__(self, client: httpx.AsyncClient, stores: int, files_per_store: int, file_size: int, seed: int):
+        self.client = client
+        self.stores_to_seed = stores
+        self.files_per_store = files_per_store
+        self.payload = (b"Dokument testowy Gemini RAG Manager. " * (file_size // 37 + 1))[:file_size]
+        self.random = random.Random(seed)
+        self.store_ids: list[int] = []
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def _request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.samples[route].append(time.perf_counter() - start)
+        if response is None or response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    async def seed(self) -> None:
+        """Create the stores and files used by the request mix"""
+        run_id = int(time.time())
+        for i in range(self.stores_to_seed):
+            response = await self.client.post("/stores/", json={"display_name": f"Bench {run_id} {i}"})
+            response.raise_for_status()
+            self.store_ids.append(response.json()["id"])
+        for store_id in self.store_ids:
+            for j in range(self.files_per_store):
+                response = await self.client.post(
+                    f"/stores/{store_id}/files/",
+                    files={"file": (f"seed_{j}.txt", self.payload, "text/plain")},
+                )
+                response.raise_for_status()
+        self.samples.clear()
+        self.errors.clear()
+
+    async def chat(self) -> None:
+        await self._request("POST /chat/", "POST", "/chat/", json={
+            "store_id": self.random.choice(self.store_ids),
+            "message": "O czym jest ten dokument?",
+        })
+
+    async def list_stores(self) -> None:
+        await self._request("GET /stores/", "GET", "/stores/")
+
+    async def list_files(self) -> None:
+        store_id = self.random.choice(self.store_ids)
+        await self._request("GET /stores/{id}/files/", "GET", f"/stores/{store_id}/files/")
+
+    async def upload(self) -> None:
+        store_id = self.random.choice(self.store_ids)
+        await self._request(
+            "POST /stores/{id}/files/", "POST", f"/stores/{store_id}/files/",
+            files={"file": ("bench.txt", self.payload, "text/plain")},
+        )
+
+    async def run(self, mix: dict, concurrency: int, duration: float) -> float:
+        """Run workers until the duration elapses; returns wall-clock seconds"""
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                scenario = self.random.choices(names, weights)[0]
+                await SCENARIOS[scenario](self)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        """Summarize samples per route"""
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "elapsed_s": elapsed,
+            "total_requests": total,
+            "total_throughput_rps": total / elapsed if elapsed else 0.0,
+            "routes": routes,
+        }
+
+
+SCENARIOS = {
+    "chat": LoadTest.chat,
+    "list_stores": LoadTest.list_stores,
+    "list_files": LoadTest.list_files,
+    "upload": LoadTest.upload,
+}
+
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> None:
+    """Print a per-route table, optionally with deltas against a baseline run"""
+    header = f"{'route':<28}{'reqs':>8}{'errs':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<28}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+        previous = (baseline or {}).get("routes", {}).get(route)
+        if previous:
+            def delta(key: str) -> str:
+                before = previous[key]
+                return f"{(stats[key] - before) / before * 100:+.0f}%" if before else "n/a"
+            print(
+                f"{'  vs baseline':<28}{'':>8}{'':>6}{delta('throughput_rps'):>10}"
+                f"{delta('p50_ms'):>10}{delta('p95_ms'):>10}{delta('p99_ms'):>10}"
+            )
+    print("-" * len(header))
+    print(f"total: {report['total_requests']} requests in {report['elapsed_s']:.1f}s "
+          f"({report['total_throughput_rps']:.1f} req/s)")
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        # The app reads its configuration at import time, so the environment
+        # must be prepared before importing it
+        os.environ.setdefault("GENAI_BACKEND", "fake")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if "DATABASE_URL" not in os.environ:
+            db_dir = tempfile.mkdtemp(prefix="rag_bench_")
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+        from app.database import init_db
+        from app.main import app
+
+        init_db()
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout
+        )
+
+    async with client:
+        test = LoadTest(client, args.stores, args.files_per_store, args.file_size, args.seed)
+        await test.seed()
+        elapsed = await test.run(parse_mix(args.mix), args.concurrency, args.duration)
+        return test.report(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test for the Gemini RAG Manager API")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent workers")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measurement duration in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenario mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--stores", type=int, default=4, help="Stores created before the run")
+    parser.add_argument("--files-per-store", type=int, default=10, help="Files uploaded to each store before the run")
+    parser.add_argument("--file-size", type=int, default=4096, help="Size of uploaded files in bytes")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the request mix")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this JSON file")
+    parser.add_argument("--compare", help="Compare against a previous JSON report")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json_path:
+        report["config"] = {key: value for key, value in vars(args).items() if key not in ("json_path", "compare")}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
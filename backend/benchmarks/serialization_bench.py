@@ -0,0 +1,124 @@
+"""
+Serialization and compression benchmark for listing and chat payloads.
+
+Compares the default JSONResponse with the orjson-based FastJSONResponse and
+shows bytes on the wire uncompressed, gzip-compressed and brotli-compressed
+for representative payload sizes.
+
+Usage (from backend/):
+    python -m benchmarks.serialization_bench
+    python -m benchmarks.serialization_bench --sizes 10,1000,20000 --repeat 50
+"""
+import argparse
+import gzip
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+
+from app.core.responses import FastJSONResponse, orjson
+from app.core.compression import brotli
+from app.schemas import FileListResponse, StoreListResponse
+from app.schemas.chat_schemas import ChatResponse
+
+
+def file_list_payload(count: int) -> dict:
+    start = datetime(2025, 1, 1)
+    files = [
+        {
+            "id": i,
+            "store_id": 1,
+            "document_id": f"fileSearchStores/store-abc123/documents/doc-{i:08d}",
+            "display_name": f"Raport kwartalny dział {i % 17} - wersja {i}.pdf",
+            "upload_date": start + timedelta(minutes=i),
+            "status": "COMPLETED" if i % 10 else "IMPORTING",
+        }
+        for i in range(count)
+    ]
+    return FileListResponse(files=files, total=count).model_dump(mode="json")
+
+
+def store_list_payload(count: int) -> dict:
+    start = datetime(2025, 1, 1)
+    stores = [
+        {
+            "id": i,
+            "display_name": f"Baza wiedzy {i}",
+            "google_store_name": f"fileSearchStores/store-{i:06d}-abcdef",
+            "created_at": start + timedelta(hours=i),
+            "updated_at": start + timedelta(hours=i, minutes=5),
+        }
+        for i in range(count)
+    ]
+    return StoreListResponse(stores=stores, total=count).model_dump(mode="json")
+
+
+def chat_payload(citations: int) -> dict:
+    paragraph = (
+        "Zgodnie z regulaminem pracy zdalnej pracownik może wykonywać pracę poza biurem "
+        "przez maksymalnie trzy dni w tygodniu, po uzgodnieniu z przełożonym. "
+    )
+    return ChatResponse(
+        response=paragraph * max(1, citations),
+        citations=[f"Regulamin_pracy_zdalnej_v{i}.pdf, strona {i % 40 + 1}" for i in range(citations)],
+    ).model_dump(mode="json")
+
+
+def time_render(response_class, payload: dict, repeat: int) -> float:
+    """Average render time in microseconds"""
+    renderer = response_class.__new__(response_class)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        renderer.render(payload)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON serialization and compression benchmark")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated item counts")
+    parser.add_argument("--repeat", type=int, default=20, help="Render repetitions per measurement")
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    args = parser.parse_args()
+
+    if orjson is None:
+        raise SystemExit("orjson is not installed: pip install orjson")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    cases = []
+    for size in sizes:
+        cases.append((f"files x{size}", file_list_payload(size)))
+        cases.append((f"stores x{size}", store_list_payload(size)))
+        cases.append((f"chat x{size} cit.", chat_payload(size)))
+
+    header = (
+        f"{'payload':<20}{'json µs':>11}{'orjson µs':>11}{'speedup':>9}"
+        f"{'raw B':>12}{'gzip B':>11}{'br B':>11}{'gzip µs':>10}{'br µs':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, payload in cases:
+        repeat = max(1, args.repeat if len(str(payload)) < 1_000_000 else args.repeat // 10)
+        std_us = time_render(JSONResponse, payload, repeat)
+        fast_us = time_render(FastJSONResponse, payload, repeat)
+        body = FastJSONResponse.__new__(FastJSONResponse).render(payload)
+
+        start = time.perf_counter()
+        gz = gzip.compress(body, compresslevel=args.gzip_level, mtime=0)
+        gzip_us = (time.perf_counter() - start) * 1e6
+        if brotli is not None:
+            start = time.perf_counter()
+            br_size = len(brotli.compress(body, quality=args.brotli_quality))
+            br_us = (time.perf_counter() - start) * 1e6
+            br_cols = f"{br_size:>11}{br_us:>10.0f}"
+        else:
+            br_cols = f"{'n/a':>11}{'n/a':>10}"
+
+        print(
+            f"{name:<20}{std_us:>11.1f}{fast_us:>11.1f}{std_us / fast_us:>8.1f}x"
+            f"{len(body):>12}{len(gz):>11}{br_cols[:11]}{gzip_us:>10.0f}{br_cols[11:]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
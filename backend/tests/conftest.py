@@ -0,0 +1,35 @@
+"""
+Shared test setup.
+
+Tests run against the fake Google client and a throwaway SQLite database;
+the environment is set before any app module reads the settings.
+
+    cd backend && python -m pytest
+"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="gfsa-tests-")
+os.environ["GENAI_BACKEND"] = "fake"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client of the full application (lifespan included)"""
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def store(client):
+    """A fresh Store; returns its JSON"""
+    response = client.post("/stores/", json={"display_name": f"test-{os.urandom(4).hex()}"})
+    assert response.status_code == 201, response.text
+    return response.json()
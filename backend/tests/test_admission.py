@@ -0,0 +1,98 @@
+"""Admission control (load shedding)"""
+import asyncio
+
+import httpx
+
+from app.core.admission import AdmissionControlMiddleware, RouteClass, admission_classes
+from app.core.config import Settings
+
+
+def _middleware(classes, release: asyncio.Event):
+    """Every request waits for release, so it stays in flight"""
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return AdmissionControlMiddleware(app, classes=classes, min_in_flight=1, retry_after_max=30)
+
+
+def _settings() -> Settings:
+    return Settings(admission_chat_max_in_flight=1, admission_upload_max_in_flight=1, admission_write_max_in_flight=1)
+
+
+async def _hold(client, method, path):
+    """Start a request and let it reach the app"""
+    task = asyncio.ensure_future(client.request(method, path))
+    await asyncio.sleep(0.05)
+    return task
+
+
+def test_saturated_class_is_shed_with_retry_after():
+    async def scenario():
+        release = asyncio.Event()
+        transport = httpx.ASGITransport(_middleware(admission_classes(_settings()), release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await _hold(client, "POST", "/chat/")
+            shed = await client.post("/chat/")
+            assert shed.status_code == 503
+            assert int(shed.headers["Retry-After"]) >= 1
+            # Other classes have their own limits
+            upload = await _hold(client, "POST", "/stores/1/files/")
+            release.set()
+            assert (await first).status_code == 200
+            assert (await upload).status_code == 200
+            assert (await client.post("/chat/")).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_slow_class_limit_shrinks():
+    chat = RouteClass("chat", max_in_flight=8, latency_target=1.0)
+    assert chat.limit(now=0.0, min_in_flight=1) == 8
+    chat.latency = 4.0
+    assert chat.limit(now=0.0, min_in_flight=1) == 2
+    chat.latency = 100.0
+    assert chat.limit(now=0.0, min_in_flight=1) == 1
+
+    async def scenario():
+        release = asyncio.Event()
+        slow = RouteClass("chat", max_in_flight=8, latency_target=1.0, latency=8.0)
+        transport = httpx.ASGITransport(_middleware([("POST", r"/chat/?", slow)], release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await _hold(client, "POST", "/chat/")
+            shed = await client.post("/chat/")
+            assert shed.status_code == 503
+            assert shed.headers["Retry-After"] == "8"  # Follows the class latency
+            release.set()
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_latency_average_follows_completed_requests():
+    chat = RouteClass("chat", max_in_flight=4, latency_target=1.0)
+    chat.leave(chat.enter(0.0), 2.0)
+    assert chat.latency == 2.0
+    chat.leave(chat.enter(10.0), 11.0)
+    assert chat.latency == 0.2 * 1.0 + 0.8 * 2.0
+    # A request stuck in flight counts once it is older than the average
+    chat.enter(20.0)
+    assert chat.recent_latency(30.0) == 10.0
+
+
+def test_listings_events_and_health_are_never_shed():
+    async def scenario():
+        release = asyncio.Event()
+        release.set()
+        classes = admission_classes(_settings())
+        for _, _, route_class in classes:
+            route_class.in_flight = 100  # Every class saturated
+        transport = httpx.ASGITransport(_middleware(classes, release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.post("/chat/")).status_code == 503
+            for path in ("/stores/", "/stores/1/files/", "/stores/1/events", "/health", "/", "/metrics/"):
+                assert (await client.get(path)).status_code == 200, path
+            assert (await client.get("/stores/1/search?q=x")).status_code == 200
+
+    asyncio.run(scenario())
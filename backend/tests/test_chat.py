@@ -0,0 +1,19 @@
+"""Chat endpoint"""
+from sqlalchemy import event
+
+from app.database import engine
+
+
+def test_auto_routing_reads_the_materialized_file_count(client, store):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/chat/", json={"store_id": store["id"], "message": "Co jest w plikach?", "model": "auto"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200, response.text
+    assert not [s for s in statements if "count(" in s.lower()]
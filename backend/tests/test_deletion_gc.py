@@ -0,0 +1,22 @@
+"""Deletion garbage collector"""
+from google.genai.errors import ClientError, ServerError
+
+from app.services.deletion_gc import _is_not_found
+from app.services.fake_genai_client import FakeGenaiError
+
+
+def _wrapped(error: Exception) -> Exception:
+    try:
+        raise Exception(f"Failed to delete file: {error}") from error
+    except Exception as wrapper:
+        return wrapper
+
+
+def test_not_found_is_read_from_the_sdk_error():
+    assert _is_not_found(_wrapped(ClientError(404, {"error": {"status": "NOT_FOUND", "message": "gone"}})))
+    assert _is_not_found(_wrapped(FakeGenaiError(404, "NOT_FOUND: documents/x")))
+
+
+def test_404_in_the_message_is_not_a_not_found():
+    assert not _is_not_found(Exception("Failed to delete file: documents/doc-404 timed out"))
+    assert not _is_not_found(_wrapped(ServerError(503, {"error": {"status": "UNAVAILABLE", "message": "NOT_FOUND 404"}})))
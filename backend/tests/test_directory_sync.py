@@ -0,0 +1,101 @@
+"""Directory sync command (against the app with the fake Google client)"""
+import json
+import os
+
+import httpx
+import pytest
+
+from app.cli.directory_sync import DirectorySync, SyncError
+
+
+class _Sync(DirectorySync):
+    """DirectorySync talking to the in-process app through the test client"""
+
+    def __init__(self, client, root, store_id: int, **kwargs):
+        super().__init__(str(root), "http://testserver", store_id, workers=1, retries=1, **kwargs)
+        self._client = client
+
+    @property
+    def _session(self):
+        return self._client
+
+
+def _write(root, path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(root / path), exist_ok=True)
+    (root / path).write_text(text, encoding="utf-8")
+
+
+def _names(client, store) -> list:
+    response = client.get(f"/stores/{store['id']}/files/")
+    return sorted(file["display_name"] for file in response.json()["files"])
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "docs"
+    _write(root, "a.txt", "alpha")
+    _write(root, "sub/b.md", "# beta")
+    return root
+
+
+def test_unchanged_files_are_skipped(client, store, tree):
+    first = _Sync(client, tree, store["id"]).run()
+    assert (first.scanned, first.uploaded) == (2, 2)
+    second = _Sync(client, tree, store["id"]).run()
+    assert (second.unchanged, second.uploaded, second.replaced) == (2, 0, 0)
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
+
+
+def test_changed_file_is_replaced_then_the_old_version_deleted(client, store, tree):
+    _Sync(client, tree, store["id"]).run()
+    _write(tree, "a.txt", "alpha, second version")
+    stats = _Sync(client, tree, store["id"]).run()
+    assert (stats.replaced, stats.deleted) == (1, 1)
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
+
+
+def test_interrupted_deletes_resume_from_the_manifest(client, store, tree, monkeypatch):
+    _Sync(client, tree, store["id"]).run()
+    _write(tree, "a.txt", "alpha, second version")
+    with monkeypatch.context() as patch:
+        patch.setattr(DirectorySync, "_delete_pending", lambda self: None)  # Dies before deleting
+        _Sync(client, tree, store["id"]).run()
+    manifest = json.loads((tree / f".gfsa-sync-{store['id']}.json").read_text(encoding="utf-8"))
+    assert len(manifest["pending_deletes"]) == 1
+
+    stats = _Sync(client, tree, store["id"]).run()
+    assert (stats.uploaded, stats.replaced, stats.deleted) == (0, 0, 1)
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
+
+
+def test_files_already_in_the_store_are_adopted(client, store, tree):
+    _Sync(client, tree, store["id"]).run()
+    os.remove(tree / f".gfsa-sync-{store['id']}.json")
+    stats = _Sync(client, tree, store["id"]).run()
+    assert (stats.adopted, stats.uploaded) == (2, 0)
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
+
+
+def test_empty_directory_is_not_mirrored(client, store, tree):
+    _Sync(client, tree, store["id"]).run()
+    os.remove(tree / "a.txt")
+    os.remove(tree / "sub/b.md")
+    with pytest.raises(SyncError):
+        _Sync(client, tree, store["id"]).run()
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
+    assert _Sync(client, tree, store["id"], allow_empty=True).run().deleted == 2
+    assert _names(client, store) == []
+
+
+def test_key_still_in_progress_fails_the_file_for_the_next_run(client, store, tree, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            DirectorySync, "_post_file",
+            lambda self, entry, local_path, key: httpx.Response(409, json={"detail": "still running"}),
+        )
+        stats = _Sync(client, tree, store["id"]).run()
+    assert (stats.failed, stats.rejected) == (2, 0)
+
+    stats = _Sync(client, tree, store["id"]).run()
+    assert stats.uploaded == 2
+    assert _names(client, store) == ["a.txt", "sub/b.md"]
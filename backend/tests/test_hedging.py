@@ -0,0 +1,89 @@
+"""Hedged upstream calls"""
+import asyncio
+
+import pytest
+
+from app.services.hedging import Hedger
+
+
+def _hedger(budget_ratio=1.0, budget_burst=10.0):
+    return Hedger("test", percentile=90, min_delay=0.01, min_samples=3,
+                  budget_ratio=budget_ratio, budget_burst=budget_burst)
+
+
+def _warm(hedger, seconds=0.02):
+    for _ in range(3):
+        hedger.record("m", seconds)
+
+
+class Upstream:
+    """Answers after the given delays, one per attempt; records cancellations"""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.started = 0
+        self.cancelled = []
+
+    def call(self):
+        attempt = self.started
+        self.started += 1
+
+        async def answer():
+            try:
+                await asyncio.sleep(self.delays[attempt])
+            except asyncio.CancelledError:
+                self.cancelled.append(attempt)
+                raise
+            return attempt
+        return answer()
+
+
+def test_no_hedge_before_enough_history():
+    hedger = _hedger()
+    upstream = Upstream(0.05)
+    assert asyncio.run(hedger.run(upstream.call, "m")) == 0
+    assert upstream.started == 1
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = _hedger()
+    _warm(hedger)
+    upstream = Upstream(5.0, 0.01)
+    assert asyncio.run(hedger.run(upstream.call, "m")) == 1
+    assert upstream.started == 2
+    assert upstream.cancelled == [0]
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = _hedger()
+    _warm(hedger, seconds=0.2)
+    upstream = Upstream(0.01, 0.01)
+    assert asyncio.run(hedger.run(upstream.call, "m")) == 0
+    assert upstream.started == 1
+
+
+def test_hedge_win_records_the_latency_the_caller_saw():
+    hedger = _hedger()
+    _warm(hedger, seconds=0.05)
+    delay = hedger.hedge_delay("m")
+    asyncio.run(hedger.run(Upstream(5.0, 0.01).call, "m"))
+    assert hedger._latencies["m"].samples[-1] >= delay + 0.01
+
+
+def test_budget_caps_hedges():
+    hedger = _hedger(budget_ratio=0.0, budget_burst=1.0)
+    _warm(hedger)
+    first, second = Upstream(0.2, 0.01), Upstream(0.2, 0.01)
+    asyncio.run(hedger.run(first.call, "m"))
+    asyncio.run(hedger.run(second.call, "m"))
+    assert (first.started, second.started) == (2, 1)
+
+
+def test_error_of_every_attempt_is_raised():
+    hedger = _hedger()
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedger.run(failing, "m"))
@@ -0,0 +1,111 @@
+"""Idempotency-Key middleware"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+
+from app.core.deadlines import CLIENT_CLOSED_REQUEST
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore, _fingerprint
+from app.database import SessionLocal, init_db
+from app.models import IdempotencyKey
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def app_client(calls):
+    import app.models  # noqa: F401  (registers the tables)
+
+    init_db()
+    statuses = {}
+
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        calls.append(body)
+        status_code = statuses.pop("next", 201)
+        await JSONResponse({"call": len(calls)}, status_code=status_code)(scope, receive, send)
+
+    client = TestClient(IdempotencyMiddleware(app, routes=[r"/upload"], wait_seconds=0.2, lease_seconds=60))
+    client.statuses = statuses
+    return client
+
+
+def test_completed_response_is_replayed(app_client, calls):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    first = app_client.post("/upload", json={"a": 1}, headers=headers)
+    second = app_client.post("/upload", json={"a": 1}, headers=headers)
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_aborted_request_is_not_replayed(app_client, calls):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    app_client.statuses["next"] = CLIENT_CLOSED_REQUEST
+    assert app_client.post("/upload", json={"a": 1}, headers=headers).status_code == CLIENT_CLOSED_REQUEST
+    retry = app_client.post("/upload", json={"a": 1}, headers=headers)
+    assert retry.status_code == 201
+    assert "idempotent-replayed" not in retry.headers
+    assert len(calls) == 2
+
+
+def test_upload_retry_with_new_boundary_is_replayed(app_client, calls):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    first = app_client.post("/upload", files={"file": ("a.txt", b"hello")}, headers=headers)
+    second = app_client.post("/upload", files={"file": ("a.txt", b"hello")}, headers=headers)
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+    assert len(calls) == 1
+
+
+def test_key_reused_for_another_upload_is_rejected(app_client, calls):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    assert app_client.post("/upload", files={"file": ("a.txt", b"hello")}, headers=headers).status_code == 201
+    assert app_client.post("/upload", files={"file": ("a.txt", b"other")}, headers=headers).status_code == 422
+    assert app_client.post("/upload", files={"file": ("b.txt", b"hello")}, headers=headers).status_code == 422
+    assert len(calls) == 1
+
+
+def _abandon_claim(key: str, fingerprint: str, age_seconds: float) -> None:
+    """An IN_PROGRESS row left by a process that died mid-request"""
+    claimed_at = datetime.utcnow() - timedelta(seconds=age_seconds)
+    with SessionLocal() as db:
+        db.add(IdempotencyKey(key=key, fingerprint=fingerprint, status="IN_PROGRESS",
+                              created_at=claimed_at, expires_at=claimed_at + timedelta(days=1)))
+        db.commit()
+
+
+def test_claim_older_than_the_lease_is_taken_over(app_client, calls):
+    key = uuid.uuid4().hex
+    _abandon_claim(key, "stale", age_seconds=120)
+    retry = app_client.post("/upload", json={"a": 1}, headers={"Idempotency-Key": key})
+    assert retry.status_code == 201
+    assert len(calls) == 1
+    replay = app_client.post("/upload", json={"a": 1}, headers={"Idempotency-Key": key})
+    assert replay.headers["idempotent-replayed"] == "true"
+
+
+def test_claim_within_the_lease_still_blocks(app_client, calls):
+    key = uuid.uuid4().hex
+    body = b'{"a": 1}'
+    _abandon_claim(key, _fingerprint("POST", "/upload", body), age_seconds=1)
+    headers = {"Idempotency-Key": key, "Content-Type": "application/json"}
+    assert app_client.post("/upload", content=body, headers=headers).status_code == 409
+    assert calls == []
+
+
+def test_in_progress_claims_are_released_at_startup(app_client):
+    key = uuid.uuid4().hex
+    _abandon_claim(key, "stale", age_seconds=1)
+    assert IdempotencyStore(3600).release_in_progress() >= 1
+    assert IdempotencyStore(3600).get(key) is None
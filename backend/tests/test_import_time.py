@@ -0,0 +1,19 @@
+"""Import-time budget of the application (see benchmarks/import_time.py)"""
+import os
+
+from benchmarks.import_time import DEFAULT_OVERHEAD_BUDGET_MS, app_overhead_ms, eagerly_imported
+
+# The absolute time depends on the machine, so the budget covers the app's own
+# modules on top of FastAPI/SQLAlchemy/pydantic-settings imported in the same way
+BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", DEFAULT_OVERHEAD_BUDGET_MS))
+
+
+def test_google_sdk_is_imported_lazily():
+    assert eagerly_imported("app.main") == []
+
+
+def test_import_time_within_budget():
+    overhead_ms = app_overhead_ms("app.main")
+    assert overhead_ms <= BUDGET_MS, (
+        f"app.main adds {overhead_ms:.0f} ms to its framework imports (budget {BUDGET_MS:.0f} ms)"
+    )
@@ -0,0 +1,93 @@
+"""NDJSON metadata import"""
+import json
+import uuid
+
+import pytest
+
+from app.database import SessionLocal, init_db
+from app.models import File, Store
+from app.services.metadata_transfer import FORMAT, VERSION, MetadataImporter, NDJSONLines
+
+
+def _line(record: dict) -> bytes:
+    return json.dumps(record).encode() + b"\n"
+
+
+@pytest.fixture
+def db():
+    init_db()
+    with SessionLocal() as session:
+        yield session
+
+
+def _export(google_store_name: str, files: list) -> list:
+    lines = [
+        _line({"type": "header", "format": FORMAT, "version": VERSION}),
+        _line({"type": "store", "google_store_name": google_store_name, "display_name": google_store_name}),
+    ]
+    for document_id, upload_date in files:
+        lines.append(_line({
+            "type": "file", "store": google_store_name, "document_id": document_id,
+            "display_name": document_id, "upload_date": upload_date, "status": "COMPLETED",
+        }))
+    return lines
+
+
+def test_bad_record_skips_only_itself(db):
+    store_name = f"fileSearchStores/{uuid.uuid4().hex[:12]}"
+    good = "2025-01-01T00:00:00"
+    lines = _export(store_name, [("a", good), ("b", good), ("c", "not a date"), ("d", good), ("e", good)])
+    importer = MetadataImporter(db, batch_size=3)
+    for line in lines:
+        importer.add(line)
+    stats = importer.finish()
+
+    assert stats.files_created == 4
+    assert stats.skipped == 1
+    assert stats.errors[0].startswith("Linia 5:")
+    names = {name for (name,) in db.query(File.display_name).filter(File.document_id.in_(list("abcde")))}
+    assert names == {"a", "b", "d", "e"}
+
+
+def test_store_with_bad_date_is_skipped(db):
+    store_name = f"fileSearchStores/{uuid.uuid4().hex[:12]}"
+    importer = MetadataImporter(db, batch_size=3)
+    importer.add(_line({"type": "header", "format": FORMAT, "version": VERSION}))
+    importer.add(_line({"type": "store", "google_store_name": store_name, "display_name": store_name,
+                        "created_at": "yesterday"}))
+    stats = importer.finish()
+    assert stats.stores_created == 0
+    assert stats.skipped == 1
+
+
+def test_document_repeated_in_a_batch_is_imported_once(db):
+    store_name = f"fileSearchStores/{uuid.uuid4().hex[:12]}"
+    lines = _export(store_name, [("dup", "2025-01-01T00:00:00"), ("dup", "2025-02-01T00:00:00")])
+    lines[-1] = lines[-1].replace(b'"display_name": "dup"', b'"display_name": "dup (latest)"')
+    importer = MetadataImporter(db, batch_size=10)
+    for line in lines:
+        importer.add(line)
+    importer.finish()
+
+    store_id = db.query(Store.id).filter(Store.google_store_name == store_name).scalar()
+    assert [name for (name,) in db.query(File.display_name).filter(File.store_id == store_id)] == ["dup (latest)"]
+
+
+def test_lines_are_split_across_chunks():
+    splitter = NDJSONLines(max_line_bytes=10)
+    assert splitter.feed(b"ab") == []
+    assert splitter.feed(b"c\nde\nf") == [b"abc", b"de"]
+    assert splitter.finish() == [b"f"]
+
+
+def test_overlong_line_is_dropped_and_reported(db):
+    splitter = NDJSONLines(max_line_bytes=10)
+    lines = splitter.feed(b"0123456") + splitter.feed(b"789abc\nok\n")
+    assert lines == [None, b"ok"]
+
+    importer = MetadataImporter(db, batch_size=10)
+    importer.add(_line({"type": "header", "format": FORMAT, "version": VERSION}))
+    importer.add(None)
+    stats = importer.finish()
+    assert stats.skipped == 1
+    assert stats.errors[0].startswith("Linia 2:")
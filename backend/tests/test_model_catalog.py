@@ -0,0 +1,36 @@
+"""Model catalog"""
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services.model_catalog import ModelCatalog
+
+
+def test_concurrent_stale_lookups_start_one_refresh(monkeypatch):
+    calls = []
+    started = []
+
+    class SlowStartThread(threading.Thread):
+        """Widens the gap between deciding to refresh and the refresh running"""
+
+        def start(self):
+            started.append(self)
+            time.sleep(0.01)
+            super().start()
+
+    def list_models():
+        calls.append(1)
+        return [SimpleNamespace(name="models/gemini-2.5-flash", supported_actions=["generateContent"])]
+
+    catalog = ModelCatalog(list_models=list_models, ttl_seconds=60, file_search_prefixes="gemini-2.5")
+    callers = [threading.Thread(target=catalog.validate_chat_model, args=("gemini-2.5-flash",)) for _ in range(20)]
+    monkeypatch.setattr(threading, "Thread", SlowStartThread)
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    for thread in started:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert catalog.validate_chat_model("gemini-2.5-flash") == "gemini-2.5-flash"
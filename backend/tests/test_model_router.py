@@ -0,0 +1,38 @@
+"""Routing of model="auto" chat requests"""
+from app.services.model_router import MIN_SAMPLES, ModelRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _router(clock, probe_ratio=0.0):
+    return ModelRouter("fast", "strong", long_message_chars=400, large_store_files=200,
+                       max_error_rate=0.5, sample_max_age=60.0, probe_ratio=probe_ratio, clock=clock)
+
+
+def test_errors_divert_short_lookups_until_they_expire():
+    clock = FakeClock()
+    router = _router(clock)
+    for _ in range(MIN_SAMPLES):
+        router.record("fast", 1.0, ok=False)
+    assert router.route("What is X?", 1).model == "strong"
+
+    clock.now += 61
+    decision = router.route("What is X?", 1)
+    assert (decision.model, decision.reason) == ("fast", "short_lookup")
+
+
+def test_avoided_model_is_probed():
+    clock = FakeClock()
+    router = _router(clock, probe_ratio=0.2)
+    for _ in range(MIN_SAMPLES):
+        router.record("fast", 1.0, ok=False)
+    decisions = [router.route("What is X?", 1) for _ in range(500)]
+    probes = [d for d in decisions if d.model == "fast"]
+    assert 50 <= len(probes) <= 150
+    assert all(d.reason.endswith("_probe") for d in probes)
@@ -0,0 +1,23 @@
+"""Batched status refresh"""
+import asyncio
+
+import pytest
+
+from app.services.status_refresh import StatusRefresher
+
+
+@pytest.fixture
+def four_files(client, store):
+    for number in range(4):
+        response = client.post(f"/stores/{store['id']}/files/", files={"file": (f"doc{number}.txt", b"text")})
+        assert response.status_code == 201, response.text
+    return store
+
+
+@pytest.mark.parametrize("page_size, calls", [(2, 2), (3, 2), (4, 1), (20, 1)])
+def test_api_calls_are_the_pages_fetched(four_files, page_size, calls):
+    refresher = StatusRefresher(page_size=page_size, operation_concurrency=1, interval_seconds=60)
+    result = asyncio.run(refresher.refresh_store(four_files["id"]))
+    assert result.checked == 4
+    assert result.listing_complete
+    assert result.api_calls == calls
@@ -0,0 +1,70 @@
+"""Local text extraction"""
+import zipfile
+
+from app.services import text_extraction
+from app.services.text_extraction import extract_to_markdown, get_extraction_pool, shutdown_extraction_pool
+
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _sheet(text: str) -> str:
+    return f'<worksheet {S}><sheetData><row><c t="inlineStr"><is><t>{text}</t></is></c></row></sheetData></worksheet>'
+
+
+def _docx(path, body: str) -> str:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/document.xml", f"<w:document {W}><w:body>{body}</w:body></w:document>")
+    return str(path)
+
+
+def test_xlsx_sheets_keep_numeric_order(tmp_path):
+    path = tmp_path / "book.xlsx"
+    with zipfile.ZipFile(path, "w") as archive:
+        for number in (10, 2, 1):
+            archive.writestr(f"xl/worksheets/sheet{number}.xml", _sheet(f"value {number}"))
+    text = text_extraction._extract_xlsx(str(path))
+    assert [line for line in text.splitlines() if line.startswith("## ")] == ["## sheet1", "## sheet2", "## sheet10"]
+
+
+def test_zip_bomb_is_not_decompressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_extraction, "RATIO_CHECK_MIN_BYTES", 1024)
+    padding = "<w:p><w:r><w:t>x</w:t></w:r></w:p>" + " " * 200_000
+    path = _docx(tmp_path / "bomb.docx", padding)
+    assert extract_to_markdown(path, ".docx").path is None
+
+
+def test_oversized_members_are_not_decompressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_extraction, "MAX_UNCOMPRESSED_BYTES", 100)
+    path = _docx(tmp_path / "large.docx", "<w:p><w:r><w:t>" + "word " * 100 + "</w:t></w:r></w:p>")
+    assert extract_to_markdown(path, ".docx").path is None
+
+
+def test_extraction_runs_in_the_process_pool(tmp_path):
+    path = _docx(tmp_path / "doc.docx", "<w:p><w:r><w:t>Hello from a worker</w:t></w:r></w:p>")
+    try:
+        result = get_extraction_pool(1).submit(extract_to_markdown, path, ".docx").result(timeout=60)
+    finally:
+        shutdown_extraction_pool()
+    with open(result.path, encoding="utf-8") as f:
+        assert f.read() == "Hello from a worker"
+
+
+def test_extraction_stops_at_max_chars(tmp_path):
+    paragraphs = "".join(f"<w:p><w:r><w:t>paragraph {number}</w:t></w:r></w:p>" for number in range(2000))
+    # Broken XML far past the limit: extraction only succeeds if it stops parsing before it
+    path = _docx(tmp_path / "long.docx", paragraphs + "<w:p><broken")
+    assert extract_to_markdown(path, ".docx").path is None
+    result = extract_to_markdown(path, ".docx", max_chars=30)
+    with open(result.path, encoding="utf-8") as f:
+        assert f.read() == "paragraph 0\n\nparagraph 1\n\npara"
+
+
+def test_xlsx_rows_stop_at_max_chars(tmp_path):
+    path = tmp_path / "book.xlsx"
+    rows = "".join(f'<row><c t="inlineStr"><is><t>row {number}</t></is></c></row>' for number in range(1000))
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet {S}><sheetData>{rows}</sheetData></worksheet>")
+        archive.writestr("xl/worksheets/sheet2.xml", _sheet("second sheet"))
+    text = text_extraction._extract_xlsx(str(path), max_chars=12)
+    assert text == "## sheet1\n\nrow 0\nrow 1\nrow 2"
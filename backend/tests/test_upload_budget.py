@@ -0,0 +1,75 @@
+"""Upload budget middleware"""
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.config import Settings
+from app.core.upload_budget import UploadBudget, UploadBudgetMiddleware, UploadRoute, upload_routes
+
+
+def _client(budget: UploadBudget, route: UploadRoute) -> TestClient:
+    async def upload(request):
+        await request.body()
+        return JSONResponse({"reserved": budget.in_flight_bytes})
+
+    app = UploadBudgetMiddleware(
+        Starlette(routes=[Route("/upload", upload, methods=["POST"])]),
+        budget=budget, wait_seconds=0.1, retry_after=1,
+        routes={r"/upload": route},
+    )
+    return TestClient(app)
+
+
+def test_reserves_every_copy_on_disk():
+    budget = UploadBudget(max_bytes=1000, max_transfers=4)
+    response = _client(budget, UploadRoute(1000, copies=2, extra_bytes=50)).post("/upload", content=b"x" * 300)
+    assert response.json() == {"reserved": 650}
+    assert budget.in_flight_bytes == 0
+
+
+def test_upload_larger_than_budget_is_rejected():
+    budget = UploadBudget(max_bytes=1000, max_transfers=4)
+    assert _client(budget, UploadRoute(2000)).post("/upload", content=b"x" * 1001).status_code == 413
+
+
+def test_footprint_is_capped_at_the_budget():
+    budget = UploadBudget(max_bytes=1000, max_transfers=4)
+    response = _client(budget, UploadRoute(1000, copies=3)).post("/upload", content=b"x" * 600)
+    assert response.json() == {"reserved": 1000}
+
+
+def _post_archive(settings: Settings, content_length: int = None) -> tuple:
+    """Status of an archive upload under settings, with the reservation seen by the route"""
+    budget = UploadBudget(settings.upload_budget_max_bytes, settings.upload_budget_max_transfers)
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["reserved"] = budget.in_flight_bytes
+        await JSONResponse({})(scope, receive, send)
+
+    middleware = UploadBudgetMiddleware(app, budget, wait_seconds=0.1, retry_after=1, routes=upload_routes(settings))
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    scope = {"type": "http", "method": "POST", "path": "/stores/1/files/archive", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], seen.get("reserved")
+
+
+def test_largest_archive_fits_the_default_budget():
+    for extraction in (False, True):
+        settings = Settings(text_extraction_enabled=extraction)
+        worst = settings.archive_max_bytes + (
+            settings.archive_upload_concurrency * settings.max_upload_bytes * (1 + extraction)
+        )
+        assert _post_archive(settings, settings.archive_max_bytes) == (200, worst)
+        assert _post_archive(settings) == (200, worst)  # Chunked: no Content-Length
@@ -0,0 +1,58 @@
+"""Upload pre-flight validation"""
+import pytest
+
+from app.core.config import get_settings
+from app.services.upload_preflight import PreflightError, UploadPreflight
+
+
+def _windows_executable() -> bytes:
+    header = bytearray(b"MZ" + b"\x00" * 126)
+    header[60:64] = (128).to_bytes(4, "little")
+    return bytes(header) + b"PE\x00\x00" + b"\x00" * 256
+
+
+def _upload(client, store, filename: str, content: bytes):
+    return client.post(f"/stores/{store['id']}/files/", files={"file": (filename, content)})
+
+
+def test_text_starting_with_mz_is_accepted(client, store):
+    response = _upload(client, store, "MZnotes.txt", b"MZ notes: meeting summary\n")
+    assert response.status_code == 201, response.text
+    assert response.json()["display_name"] == "MZnotes.txt"
+
+
+def test_windows_executable_is_rejected():
+    preflight = UploadPreflight("setup.txt", None, 1024 * 1024)
+    with pytest.raises(PreflightError) as error:
+        preflight.feed(_windows_executable())
+        preflight.finish()
+    assert error.value.status_code == 415
+
+
+def test_executable_split_across_small_chunks_is_rejected():
+    preflight = UploadPreflight("setup.txt", None, 1024 * 1024)
+    content = _windows_executable()
+    with pytest.raises(PreflightError):
+        for i in range(0, len(content), 7):
+            preflight.feed(content[i:i + 7])
+        preflight.finish()
+
+
+def test_oversized_content_length_is_rejected_before_reading(client, store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "max_upload_bytes", 1024)
+    response = client.post(
+        f"/stores/{store['id']}/files/",
+        content=b"x" * (256 * 1024),  # Not even valid multipart: it must not be parsed
+        headers={"Content-Type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
+
+
+def test_unsupported_extension_is_rejected(client, store):
+    response = _upload(client, store, "tool.exe", b"MZ")
+    assert response.status_code == 415
+
+
+def test_form_without_file_is_rejected(client, store):
+    response = client.post(f"/stores/{store['id']}/files/", data={"other": "value"}, files={"x": ("a.txt", b"a")})
+    assert response.status_code == 422
@@ -0,0 +1,138 @@
+"""Priority and fair scheduling of upstream calls"""
+import asyncio
+
+import pytest
+
+from app.services.upstream_scheduler import Priority, SchedulerQueueFull, UpstreamScheduler
+
+
+def _scheduler(max_concurrency=1, interactive_reserved=0, queue_limit=100):
+    return UpstreamScheduler(max_concurrency, interactive_reserved, {priority: queue_limit for priority in Priority})
+
+
+async def _queue(scheduler, granted, name, priority, key="s1", cost=1.0):
+    """Start a waiter that appends its name once granted (and keeps the slot)"""
+    async def wait():
+        await scheduler.acquire(priority, key, cost)
+        granted.append(name)
+    task = asyncio.ensure_future(wait())
+    await asyncio.sleep(0)
+    return task
+
+
+async def _release_all(scheduler, granted, expected: int, priority: Priority):
+    """Hand the single slot over waiter by waiter"""
+    while len(granted) < expected:
+        scheduler.release(priority)
+        await asyncio.sleep(0)
+
+
+def test_higher_priority_is_granted_first():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.acquire(Priority.BULK, "s1")
+        granted = []
+        for name, priority in (("bulk", Priority.BULK), ("upload", Priority.UPLOAD), ("chat", Priority.INTERACTIVE)):
+            await _queue(scheduler, granted, name, priority)
+        assert granted == []
+        scheduler.release(Priority.BULK)
+        await asyncio.sleep(0)
+        assert granted == ["chat"]
+        scheduler.release(Priority.INTERACTIVE)
+        await asyncio.sleep(0)
+        scheduler.release(Priority.UPLOAD)
+        await asyncio.sleep(0)
+        assert granted == ["chat", "upload", "bulk"]
+
+    asyncio.run(scenario())
+
+
+def test_stores_share_a_class_fairly():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.acquire(Priority.BULK, "a")
+        granted = []
+        for number in range(2, 5):
+            await _queue(scheduler, granted, f"a{number}", Priority.BULK, key="a")
+        await _queue(scheduler, granted, "b1", Priority.BULK, key="b")
+        await _release_all(scheduler, granted, 4, Priority.BULK)
+        assert granted == ["b1", "a2", "a3", "a4"]
+
+    asyncio.run(scenario())
+
+
+def test_cost_weighs_on_the_store_turn():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.acquire(Priority.UPLOAD, "x")
+        granted = []
+        await _queue(scheduler, granted, "big", Priority.UPLOAD, key="a", cost=10.0)
+        await _queue(scheduler, granted, "big-next", Priority.UPLOAD, key="a", cost=1.0)
+        await _queue(scheduler, granted, "small", Priority.UPLOAD, key="b", cost=1.0)
+        await _queue(scheduler, granted, "small-next", Priority.UPLOAD, key="b", cost=1.0)
+        await _release_all(scheduler, granted, 4, Priority.UPLOAD)
+        assert granted.index("small-next") < granted.index("big-next")
+
+    asyncio.run(scenario())
+
+
+def test_reserved_slots_keep_chat_fast():
+    async def scenario():
+        scheduler = _scheduler(max_concurrency=2, interactive_reserved=1)
+        await scheduler.acquire(Priority.UPLOAD, "s1")
+        granted = []
+        upload = await _queue(scheduler, granted, "upload", Priority.UPLOAD)
+        await asyncio.wait_for(scheduler.acquire(Priority.INTERACTIVE, "s1"), 1)
+        assert granted == []
+        upload.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        scheduler = _scheduler(queue_limit=1)
+        await scheduler.acquire(Priority.BULK, "s1")
+        granted = []
+        waiting = await _queue(scheduler, granted, "queued", Priority.BULK)
+        with pytest.raises(SchedulerQueueFull):
+            await scheduler.acquire(Priority.BULK, "s1")
+        waiting.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_leaves_no_trace():
+    async def scenario():
+        scheduler = _scheduler(queue_limit=1)
+        await scheduler.acquire(Priority.UPLOAD, "s1")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire(Priority.UPLOAD, "s1"), 0.01)
+        assert scheduler._depth[Priority.UPLOAD] == 0
+        scheduler.release(Priority.UPLOAD)
+        # The timed-out waiter neither took the freed slot nor counts against the queue limit
+        await asyncio.wait_for(scheduler.acquire(Priority.UPLOAD, "s1"), 1)
+        assert scheduler._total_in_flight() == 1
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_when_the_holder_is_cancelled():
+    async def scenario():
+        scheduler = _scheduler()
+        holding = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(Priority.INTERACTIVE, "s1"):
+                holding.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(hold())
+        await holding.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler._total_in_flight() == 0
+        await asyncio.wait_for(scheduler.acquire(Priority.BULK, "s1"), 1)
+
+    asyncio.run(scenario())
@@ -8,7 +8,6 @@ import { FileText, MessageSquare } from 'lucide-react';
 function App() {
   const [selectedStore, setSelectedStore] = useState(null);
   const [activeTab, setActiveTab] = useState('files'); // 'files' or 'chat'
-  const [refreshFiles, setRefreshFiles] = useState(0); // Trigger to refresh file list
 
   const handleStoreSelect = (store) => {
     setSelectedStore(store);
@@ -16,10 +15,6 @@ function App() {
     // Let's keep active tab but maybe default to files if it was null
   };
 
-  const handleUploadSuccess = () => {
-    setRefreshFiles(prev => prev + 1);
-  };
-
   return (
     <div className="min-h-screen bg-gray-100 flex flex-col">
       {/* Top Bar */}
@@ -94,14 +89,9 @@ function App() {
               <div className="flex-1">
                 {activeTab === 'files' && (
                   <div className="space-y-6 animate-in fade-in duration-300">
-                    <FileUploader 
-                      storeId={selectedStore.id} 
-                      onUploadSuccess={handleUploadSuccess} 
-                    />
-                    <FileList 
-                      storeId={selectedStore.id} 
-                      refreshTrigger={refreshFiles} 
-                    />
+                    {/* FileList picks up new files from the store's live event stream */}
+                    <FileUploader storeId={selectedStore.id} />
+                    <FileList storeId={selectedStore.id} />
                   </div>
                 )}
 
@@ -28,7 +28,7 @@ export const getFiles = async (storeId) => {
   return response.data;
 };
 
-export const uploadFile = async (storeId, file) => {
+export const uploadFile = async (storeId, file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
   
@@ -36,6 +36,12 @@ export const uploadFile = async (storeId, file) => {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
+    // Browser -> backend transfer; the backend -> Google part arrives as store events
+    onUploadProgress: (event) => {
+      if (onProgress && event.total) {
+        onProgress(event.loaded / event.total);
+      }
+    },
   });
   return response.data;
 };
@@ -53,4 +59,24 @@ export const chatWithStore = async (storeId, message, model = 'gemini-2.5-flash'
   return response.data;
 };
 
+const STORE_EVENT_TYPES = [
+  'upload.started',
+  'upload.progress',
+  'upload.operation',
+  'upload.failed',
+  'file.status',
+  'file.deleted',
+];
+
+// Subscribe to live ingestion events of a store (Server-Sent Events).
+// EventSource reconnects by itself and resumes from the last received event.
+// Returns a function that closes the subscription.
+export const subscribeToStoreEvents = (storeId, onEvent) => {
+  const source = new EventSource(`${API_URL}/stores/${storeId}/events/`);
+  STORE_EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+  });
+  return () => source.close();
+};
+
 export default api;
@@ -4,6 +4,7 @@ import { chatWithStore } from '../api/api';
 import { Send, Bot, User, Loader2, AlertCircle, ChevronDown } from 'lucide-react';
 
 const AVAILABLE_MODELS = [
+  { value: 'auto', label: 'Auto', description: 'Picked per question' },
   { value: 'gemini-2.5-pro', label: 'Gemini 2.5 Pro', description: 'Advanced reasoning' },
   { value: 'gemini-2.5-flash', label: 'Gemini 2.5 Flash', description: 'Balanced (Default)' },
   { value: 'gemini-2.0-flash', label: 'Gemini 2.0 Flash', description: 'Fast' },
@@ -1,11 +1,15 @@
-import React, { useState, useEffect } from 'react';
-import { getFiles, deleteFile } from '../api/api';
-import { FileText, Trash2, Loader2, CheckCircle, AlertCircle } from 'lucide-react';
+import React, { useState, useEffect, useRef } from 'react';
+import { getFiles, deleteFile, subscribeToStoreEvents } from '../api/api';
+import { FileText, Trash2, Loader2, CheckCircle, AlertCircle, X } from 'lucide-react';
+
+const FAILED_UPLOAD_DISPLAY_MS = 30000; // How long a failed upload stays listed
 
 const FileList = ({ storeId, refreshTrigger }) => {
   const [files, setFiles] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [uploads, setUploads] = useState({}); // upload_id -> in-flight upload to Google
+  const dismissTimers = useRef({}); // upload_id -> timeout removing a failed upload
 
   useEffect(() => {
     if (storeId) {
@@ -15,6 +19,72 @@ const FileList = ({ storeId, refreshTrigger }) => {
     }
   }, [storeId, refreshTrigger]);
 
+  // Live updates instead of re-fetching the list
+  useEffect(() => {
+    if (!storeId) return undefined;
+    setUploads({});
+    const unsubscribe = subscribeToStoreEvents(storeId, handleStoreEvent);
+    return () => {
+      unsubscribe();
+      Object.values(dismissTimers.current).forEach(clearTimeout);
+      dismissTimers.current = {};
+    };
+  }, [storeId]);
+
+  const dismissUpload = (uploadId) => {
+    clearTimeout(dismissTimers.current[uploadId]);
+    delete dismissTimers.current[uploadId];
+    setUploads(prev => {
+      const { [uploadId]: _dismissed, ...rest } = prev;
+      return rest;
+    });
+  };
+
+  const handleStoreEvent = (type, data) => {
+    switch (type) {
+      case 'upload.started':
+        setUploads(prev => ({
+          ...prev,
+          [data.upload_id]: { name: data.display_name, sent: 0, total: data.total_bytes, phase: 'Uploading' },
+        }));
+        break;
+      case 'upload.progress':
+        setUploads(prev => prev[data.upload_id] ? ({
+          ...prev,
+          [data.upload_id]: { ...prev[data.upload_id], sent: data.bytes_sent, total: data.total_bytes },
+        }) : prev);
+        break;
+      case 'upload.operation':
+        setUploads(prev => prev[data.upload_id] ? ({
+          ...prev,
+          [data.upload_id]: { ...prev[data.upload_id], phase: data.done ? 'Saving' : 'Indexing' },
+        }) : prev);
+        break;
+      case 'upload.failed':
+        setUploads(prev => prev[data.upload_id] ? ({
+          ...prev,
+          [data.upload_id]: { ...prev[data.upload_id], phase: 'Failed', error: data.detail },
+        }) : prev);
+        clearTimeout(dismissTimers.current[data.upload_id]);
+        dismissTimers.current[data.upload_id] = setTimeout(
+          () => dismissUpload(data.upload_id), FAILED_UPLOAD_DISPLAY_MS,
+        );
+        break;
+      case 'file.status':
+        if (data.upload_id) dismissUpload(data.upload_id);
+        // New files go on top, status changes of listed files keep their place
+        setFiles(prev => prev.some(f => f.id === data.file.id)
+          ? prev.map(f => (f.id === data.file.id ? data.file : f))
+          : [data.file, ...prev]);
+        break;
+      case 'file.deleted':
+        setFiles(prev => prev.filter(f => f.id !== data.file_id));
+        break;
+      default:
+        break;
+    }
+  };
+
   const fetchFiles = async () => {
     try {
       setLoading(true);
@@ -53,6 +123,34 @@ const FileList = ({ storeId, refreshTrigger }) => {
         <span className="text-xs text-gray-500">{files.length} files</span>
       </div>
 
+      {Object.entries(uploads).map(([uploadId, upload]) => (
+        <div key={uploadId} className="px-4 py-2 border-b bg-blue-50 text-xs">
+          <div className="flex justify-between text-gray-700">
+            <span className="truncate" title={upload.name}>{upload.name}</span>
+            <span className="flex items-center gap-1">
+              <span className={upload.error ? 'text-red-600' : 'text-blue-600'} title={upload.error}>
+                {upload.phase}{upload.total ? ` ${Math.round((upload.sent / upload.total) * 100)}%` : ''}
+              </span>
+              {upload.phase === 'Failed' && (
+                <button
+                  onClick={() => dismissUpload(uploadId)}
+                  className="text-gray-400 hover:text-gray-600"
+                  title="Dismiss"
+                >
+                  <X className="w-3 h-3" />
+                </button>
+              )}
+            </span>
+          </div>
+          <div className="mt-1 h-1 bg-blue-100 rounded">
+            <div
+              className={`h-1 rounded ${upload.error ? 'bg-red-500' : 'bg-blue-500'}`}
+              style={{ width: `${upload.total ? (upload.sent / upload.total) * 100 : 0}%` }}
+            />
+          </div>
+        </div>
+      ))}
+
       {loading ? (
         <div className="p-8 text-center text-gray-500">
           <Loader2 className="w-6 h-6 animate-spin mx-auto mb-2" />
@@ -5,6 +5,7 @@ import { Upload, Loader2, FileText } from 'lucide-react';
 const FileUploader = ({ storeId, onUploadSuccess }) => {
   const [uploading, setUploading] = useState(false);
   const [error, setError] = useState(null);
+  const [progress, setProgress] = useState(0);
   const fileInputRef = useRef(null);
 
   const handleFileChange = async (e) => {
@@ -18,10 +19,11 @@ const FileUploader = ({ storeId, onUploadSuccess }) => {
 
     setUploading(true);
     setError(null);
+    setProgress(0);
 
     try {
-      await uploadFile(storeId, file);
-      onUploadSuccess();
+      await uploadFile(storeId, file, setProgress);
+      onUploadSuccess?.();
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
       }
@@ -52,7 +54,9 @@ const FileUploader = ({ storeId, onUploadSuccess }) => {
         {uploading ? (
           <div className="flex flex-col items-center text-blue-600">
             <Loader2 className="w-8 h-8 animate-spin mb-2" />
-            <span className="text-sm font-medium">Uploading & Indexing...</span>
+            <span className="text-sm font-medium">
+              {progress < 1 ? `Uploading... ${Math.round(progress * 100)}%` : 'Indexing...'}
+            </span>
             <span className="text-xs text-gray-500 mt-1">This may take a moment</span>
           </div>
         ) : (
@@ -2,6 +2,13 @@ import React, { useState, useEffect } from 'react';
 import { getStores, createStore, deleteStore } from '../api/api';
 import { Plus, Trash2, Database } from 'lucide-react';
 
+const formatBytes = (bytes) => {
+  if (!bytes) return '0 B';
+  const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+  const exponent = Math.min(Math.floor(Math.log(bytes) / Math.log(1024)), units.length - 1);
+  return `${(bytes / 1024 ** exponent).toFixed(exponent ? 1 : 0)} ${units[exponent]}`;
+};
+
 const StoreSelector = ({ onSelectStore, selectedStore }) => {
   const [stores, setStores] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -123,6 +130,7 @@ const StoreSelector = ({ onSelectStore, selectedStore }) => {
                   <div className="font-medium text-gray-900">{store.display_name}</div>
                   <div className="text-xs text-gray-500">
                     {new Date(store.created_at).toLocaleDateString()}
+                    {' · '}{store.file_count} files · {formatBytes(store.total_bytes)}
                   </div>
                 </div>
                 <button
@@ -1,6 +1,9 @@
 """
 List all available models from Google GenAI API
 to find correct model names and their supported capabilities.
+
+The running backend exposes the same catalog (cached, with File Search
+support flags) under GET /models/.
 """
 import os
 from google import genai